@@ -0,0 +1,73 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+
+# Benchmark of the time the training loop spends in the pyerm calls, with the writes done on the calling thread
+# against `Experiment(async_writes=True)`, which hands them to the background writer thread.
+# usage: python benchmarks/bench_async_writes.py [--runs 200] [--step-ms 5] [--profile writer-heavy]
+
+import argparse
+import os
+import tempfile
+from time import perf_counter, sleep
+from PIL import Image
+
+from pyerm import Experiment
+
+def run(db_path, async_writes, args):
+    exp = Experiment(db_path, profile=args.profile, async_writes=async_writes)
+    exp.task_init('bench')
+    exp.data_init('data', {'size': 1})
+    exp.method_init('method', {'lr': 0.1})
+    image = Image.new('RGB', (256, 256), 'red')
+    stall = 0
+    start = perf_counter()
+    for i in range(args.runs):
+        t = perf_counter()
+        exp.experiment_start('bench')
+        stall += perf_counter() - t
+        # the training itself
+        sleep(args.step_ms / 1000)
+        t = perf_counter()
+        exp.experiment_over({'acc': i / args.runs}, {'image': image})
+        stall += perf_counter() - t
+    total = perf_counter() - start
+    t = perf_counter()
+    exp.close()
+    return stall, total, perf_counter() - t
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the time spent in the pyerm calls of an experiment loop')
+    parser.add_argument('--runs', type=int, default=200, help='The number of experiments')
+    parser.add_argument('--step-ms', type=float, default=5, help='The training time of one experiment, in ms')
+    parser.add_argument('--profile', default='writer-heavy', help='The connection profile')
+    args = parser.parse_args()
+    print(f"{args.runs} runs, profile {args.profile}")
+    for async_writes in (False, True):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stall, total, drain = run(os.path.join(tmp_dir, 'bench.db'), async_writes, args)
+        print(f"{'async' if async_writes else ' sync'}: {stall * 1000 / args.runs:8.2f} ms in pyerm per run, loop {total:6.2f} s, close {drain * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+
+# Stress benchmark of many processes writing experiments to the same database file:
+# the sustained experiments per second, the p50/p99 latency of the writes and the lock contention counters.
+# usage: python benchmarks/bench_contention.py [--processes 32] [--experiments 50] [--profile writer-heavy] [--max-retries 8]
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+from time import perf_counter, time
+import numpy as np
+
+from pyerm import Experiment
+
+def worker(db_path, index, args, ready, go, queue):
+    latencies, errors = [], 0
+    exp = Experiment(db_path, profile=args.profile, busy_timeout=args.busy_timeout, max_retries=args.max_retries)
+    exp.task_init('bench')
+    exp.data_init('data', {'size': 1})
+    exp.method_init('method', {'worker': index})
+    exp._db.lock_stats.reset()
+    ready.release()
+    # all the processes write at the same time
+    go.wait()
+    begin = time()
+    for i in range(args.experiments):
+        try:
+            start = perf_counter()
+            exp.experiment_start('bench')
+            latencies.append(perf_counter() - start)
+            start = perf_counter()
+            exp.experiment_over({'acc': i / args.experiments, 'loss': 1 / (i + 1)})
+            latencies.append(perf_counter() - start)
+        except Exception:
+            errors += 1
+            exp._id = None
+    end = time()
+    queue.put((latencies, errors, exp.lock_stats(), begin, end))
+    exp.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Stress test of many processes writing the same database')
+    parser.add_argument('--processes', type=int, default=32, help='The number of writer processes')
+    parser.add_argument('--experiments', type=int, default=50, help='The number of experiments of each process')
+    parser.add_argument('--profile', default='writer-heavy', help='The connection profile')
+    parser.add_argument('--busy-timeout', type=int, default=None, help='The busy timeout in ms, by default the one of the profile')
+    parser.add_argument('--max-retries', type=int, default=8, help='The retries of a locked out transaction, 0 to see the failures without them')
+    args = parser.parse_args()
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    ready = context.Semaphore(0)
+    go = context.Event()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        # the tables exist before the workers start, the benchmark measures the experiment writes
+        exp = Experiment(db_path, profile=args.profile)
+        exp.task_init('bench', {'acc': 'REAL', 'loss': 'REAL'})
+        exp.close()
+        processes = [context.Process(target=worker, args=(db_path, i, args, ready, go, queue)) for i in range(args.processes)]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.acquire()
+        go.set()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+    latencies = np.array([latency for result in results for latency in result[0]]) * 1000
+    errors = sum(result[1] for result in results)
+    stats = {key: sum(result[2][key] for result in results) for key in results[0][2]}
+    # from the first process starting its experiments to the last one done
+    elapsed = max(result[4] for result in results) - min(result[3] for result in results)
+    print(f"{args.processes} processes x {args.experiments} experiments, profile {args.profile}, max_retries {args.max_retries}")
+    print(f"{len(latencies) // 2 / elapsed:10.1f} experiments/s, {errors} failed")
+    if len(latencies) > 0:
+        print(f"write latency p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms, max {latencies.max():.2f} ms")
+    print(f"transactions {stats['transactions']}, waited for the lock {stats['lock_waits']} ({stats['lock_wait_time']:.2f} s), "
+          f"retries {stats['retries']} ({stats['retry_wait_time']:.2f} s), gave up {stats['failures']}")
+
+if __name__ == "__main__":
+    main()
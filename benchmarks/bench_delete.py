@@ -0,0 +1,86 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Benchmark of deleting experiments: `delete_experiments()`, one set-based DELETE per table in one transaction,
+# against the former row by row deletes, with a result table lookup and a commit per experiment.
+# usage: python benchmarks/bench_delete.py [--experiments 10000] [--delete 1000] [--steps 20]
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+from time import perf_counter
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import ExperimentTable, ResultTable, DetailRecordTable, delete_experiments
+
+def fill(db_path, args):
+    db = Database(db_path, profile='writer-heavy')
+    experiment_table = ExperimentTable(db)
+    result_table = ResultTable(db, 'bench', {'acc': 'REAL'})
+    detail_table = DetailRecordTable(db)
+    with db.transaction():
+        for i in range(args.experiments):
+            experiment_id = experiment_table.experiment_start('bench', 'method', 1, 'data', 1, 'bench')
+            result_table.insert(experiment_id=experiment_id, acc=random.random(), image_0_name='image', image_0=b'\0' * 1024)
+            experiment_table.experiment_over(experiment_id)
+            detail_table.insert_many(experiment_id, ['loss'], [(1 / (step + 1),) for step in range(args.steps)])
+    db.close()
+
+def former_delete(db, experiment_ids):
+    experiment_table = db['experiment_list']
+    for experiment_id in experiment_ids:
+        task = experiment_table.select('task', where=f'id={experiment_id}')[0][0]
+        db[f'result_{task}'].delete(f'experiment_id={experiment_id}')
+        experiment_table.delete(f'id={experiment_id}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark deleting experiments')
+    parser.add_argument('--experiments', type=int, default=10000, help='The number of recorded experiments')
+    parser.add_argument('--delete', type=int, default=1000, help='The number of deleted experiments')
+    parser.add_argument('--steps', type=int, default=20, help='The number of detail steps of one experiment')
+    parser.add_argument('--profile', default='default', help='The connection profile of the deletes')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        fill(db_path, args)
+        shutil.copy(db_path, os.path.join(tmp_dir, 'former.db'))
+        experiment_ids = random.sample(range(1, args.experiments + 1), args.delete)
+        db = Database(os.path.join(tmp_dir, 'former.db'), profile=args.profile)
+        start = perf_counter()
+        former_delete(db, experiment_ids)
+        former = perf_counter() - start
+        db.close()
+        db = Database(db_path, profile=args.profile)
+        start = perf_counter()
+        delete_experiments(db, experiment_ids)
+        current = perf_counter() - start
+        db.close()
+    print(f"{args.delete} of {args.experiments} experiments ({args.steps} detail steps each), profile {args.profile}")
+    print(f"row by row (details left behind): {former * 1000:10.1f} ms")
+    print(f"      delete_experiments(): {current * 1000:10.1f} ms")
+
+if __name__ == "__main__":
+    main()
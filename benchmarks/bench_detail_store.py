@@ -0,0 +1,99 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+
+# Benchmark of the detail storage: one detail_{experiment_id} table per experiment against the single detail_records table,
+# for the time to open the database (load its schema), to fetch the curves of one experiment and one curve of many experiments.
+# usage: python benchmarks/bench_detail_store.py [--experiments 2000] [--steps 500] [--repeat 3]
+
+import argparse
+import os
+import random
+import tempfile
+from time import perf_counter, time
+
+from pyerm.database.dbbase import Database, CATALOG
+from pyerm.database.tables import DetailTable, DetailRecordTable, migrate_detail_tables
+
+KEYS = ['epoch', 'loss', 'accuracy']
+
+def fill(db_path, experiments, steps):
+    db = Database(db_path, profile='writer-heavy', output_info=False)
+    with db.transaction():
+        for experiment_id in range(1, experiments + 1):
+            table = DetailTable(db, experiment_id, {'epoch': 'INTEGER', 'loss': 'REAL', 'accuracy': 'REAL'})
+            table.insert_many(KEYS, ((step, 1 / (step + 1), step / steps) for step in range(steps)))
+    db.close()
+
+def timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best
+
+def open_db(db_path):
+    db = Database(db_path, output_info=False)
+    CATALOG.invalidate(db)
+    db.table_names
+    db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the per experiment detail tables against detail_records')
+    parser.add_argument('--experiments', type=int, default=2000, help='The number of experiments')
+    parser.add_argument('--steps', type=int, default=500, help='The number of detail rows per experiment')
+    parser.add_argument('--repeat', type=int, default=3, help='The best of how many repetitions is reported')
+    args = parser.parse_args()
+    rng = random.Random(0)
+    one_ids = rng.sample(range(1, args.experiments + 1), 20)
+    many_ids = rng.sample(range(1, args.experiments + 1), min(100, args.experiments))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        fill(db_path, args.experiments, args.steps)
+
+        db = Database(db_path, output_info=False)
+        tables_open = timeit(lambda: open_db(db_path), args.repeat)
+        tables_one = timeit(lambda: [db[f'detail_{i}'].to_frame() for i in one_ids], args.repeat) / len(one_ids)
+        tables_many = timeit(lambda: [db[f'detail_{i}'].select_columns('loss') for i in many_ids], args.repeat)
+        db.close()
+
+        db = Database(db_path, output_info=False)
+        start = perf_counter()
+        migrate_detail_tables(db)
+        migrate_time = perf_counter() - start
+        db.conn.execute('VACUUM')
+        records = DetailRecordTable(db)
+        records_open = timeit(lambda: open_db(db_path), args.repeat)
+        records_one = timeit(lambda: [records.get_details(i) for i in one_ids], args.repeat) / len(one_ids)
+        records_many = timeit(lambda: records.get_curves('loss', many_ids), args.repeat)
+        db.close()
+    print(f"{args.experiments} experiments x {args.steps} steps x {len(KEYS)} details, migrated in {migrate_time:.1f} s")
+    print(f"{'':>28}{'detail_{id}':>14}{'detail_records':>16}")
+    print(f"{'open (load the schema)':>28}{tables_open * 1000:11.1f} ms{records_open * 1000:13.1f} ms")
+    print(f"{'curves of one experiment':>28}{tables_one * 1000:11.1f} ms{records_one * 1000:13.1f} ms")
+    print(f"{f'loss of {len(many_ids)} experiments':>28}{tables_many * 1000:11.1f} ms{records_many * 1000:13.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+
+# Benchmark of the detail logging throughput (steps logged per second) of one experiment,
+# with one write per step against the buffered, sampled and aggregated `detail_update()`.
+# usage: python benchmarks/bench_details.py [--steps 200000] [--profile writer-heavy]
+
+import argparse
+import os
+import tempfile
+from time import perf_counter
+
+from pyerm import Experiment
+from pyerm.database.dbbase import Database
+
+CASES = [
+    ('one write per step', dict(flush_rows=1)),
+    ('buffered (1000 rows)', dict(flush_rows=1000)),
+    ('every 10th step', dict(flush_rows=1000, sample_every=10)),
+    ('min/max/mean of 10 steps', dict(flush_rows=1000, sample_every=10, aggregate=True)),
+]
+
+def run(db_path, steps, profile, options):
+    exp = Experiment(db_path, profile=profile)
+    exp.task_init('bench')
+    exp.data_init('data', {'size': 1})
+    exp.method_init('method', {'lr': 0.1})
+    exp.detail_init(**options)
+    experiment_id = exp.experiment_start('bench')
+    start = perf_counter()
+    for step in range(steps):
+        exp.detail_update({'step': step, 'loss': 1 / (step + 1), 'accuracy': step / steps})
+    exp.experiment_over({'acc': 1.0})
+    elapsed = perf_counter() - start
+    exp.close()
+    db = Database(db_path)
+    rows = db.cursor.execute(f"SELECT COUNT(*) FROM detail_{experiment_id}").fetchone()[0]
+    db.close()
+    return elapsed, rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the detail logging throughput')
+    parser.add_argument('--steps', type=int, default=200000, help='The number of logged steps, the unbuffered case logs a tenth of them')
+    parser.add_argument('--profile', default='writer-heavy', help='The connection profile')
+    args = parser.parse_args()
+    print(f"{args.steps} steps, profile {args.profile}")
+    for name, options in CASES:
+        # one commit per step is slow, a tenth of the steps is enough to measure it
+        steps = args.steps // 10 if options['flush_rows'] == 1 else args.steps
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            elapsed, rows = run(os.path.join(tmp_dir, 'bench.db'), steps, args.profile, options)
+        print(f"{name:>26}: {steps / elapsed:12,.0f} steps/s, {rows} rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Benchmark of pyerm_export_zip on a database of results with png images and details: the former export, 
+# every table read with pandas images included and written by xlsxwriter in its normal mode, 
+# against the streaming `export_data()`. Each export runs in its own process to measure its peak RSS.
+# usage: python benchmarks/bench_export.py [--experiments 2000] [--image-px 256] [--steps 200]
+
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import PIL.Image as Image
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import ExperimentTable, MethodTable, ResultTable, DetailRecordTable
+from pyerm.scripts.export_data import export_data, zip_dir
+
+def fill(db_path, args):
+    rng = np.random.default_rng(0)
+    db = Database(db_path)
+    experiment_table = ExperimentTable(db)
+    method_table = MethodTable(db, 'bench', {'lr': 'REAL'})
+    result_table = ResultTable(db, 'bench', {'acc': 'REAL'})
+    detail_table = DetailRecordTable(db)
+    method_id = method_table.insert(lr=0.1)
+    for i in range(args.experiments):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (args.image_px, args.image_px, 3), dtype=np.uint8)).save(buffer, format='png')
+        with db.transaction():
+            experiment_id = experiment_table.experiment_start('bench', 'bench', method_id, 'data', -1, 'bench')
+            result_table.insert(experiment_id=experiment_id, acc=float(rng.random()), image_0_name='noise', image_0=buffer.getvalue())
+            experiment_table.experiment_over(experiment_id)
+            detail_table.insert_many(experiment_id, ['loss'], [(float(step),) for step in range(args.steps)])
+    db.close()
+
+def former_save_image(row, col, output_img_dir, output_path):
+    img_data = getattr(row, col)
+    if img_data is not None:
+        img = Image.open(io.BytesIO(img_data))
+        img_abs_path = os.path.join(output_img_dir, f"ID{row.experiment_id}_{col}.png")
+        img.save(img_abs_path)
+        img_rel_path = os.path.relpath(img_abs_path, os.path.dirname(output_path))
+        return img_rel_path
+    return None
+
+def former_export_data(db_path, output_dir):
+    db_name = os.path.splitext(os.path.basename(db_path))[0]
+    output_path = os.path.join(output_dir, db_name, f"{db_name}.xlsx")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    output_img_dir = os.path.join(os.path.dirname(output_path), "result_imgs")
+    os.makedirs(output_img_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    table_names = pd.read_sql_query("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')", conn)
+    writer = pd.ExcelWriter(output_path, engine='xlsxwriter')
+    for table_name in table_names['name']:
+        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
+        if table_name.startswith("result_"):
+            for col in df.columns:
+                if col.startswith("image_") and not col.endswith("_name") and not df[f"{col}_name"].isnull().all():
+                    with ThreadPoolExecutor() as executor:
+                        img_paths = list(executor.map(lambda row: former_save_image(row, col, output_img_dir, output_path), df.itertuples()))
+                    df[col] = img_paths
+        df.to_excel(writer, sheet_name=table_name, index=False)
+        if table_name.startswith("result_"):
+            worksheet = writer.sheets[table_name]
+            for col_num, col in enumerate(df.columns):
+                if col.startswith("image_") and not col.endswith("_name"):
+                    for row_num, cell_value in enumerate(df[col], start=1):
+                        if cell_value is not None:
+                            # "external:" as in export_data(), xlsxwriter 3.2 rejects a bare relative path
+                            worksheet.write_url(row_num, col_num, f"external:{cell_value}", string=df[f"{col}_name"][row_num-1])
+    writer.close()
+    conn.close()
+    zip_path = os.path.join(output_dir, f"{db_name}.zip")
+    zip_dir(os.path.dirname(output_path), zip_path, remove_original=True)
+    return zip_path
+
+def run(mode, db_path, output_dir):
+    # in the child process
+    start = perf_counter()
+    zip_path = (former_export_data if mode == 'former' else export_data)(db_path, output_dir)
+    elapsed = perf_counter() - start
+    print(f"{elapsed} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss} {os.path.getsize(zip_path)}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the export of a database to a zip of an Excel file and images')
+    parser.add_argument('--experiments', type=int, default=2000, help='The number of experiments, one png image each')
+    parser.add_argument('--image-px', type=int, default=256, help='The width and height of the noise images')
+    parser.add_argument('--steps', type=int, default=200, help='The number of detail steps of one experiment')
+    parser.add_argument('--run', nargs=3, metavar=('MODE', 'DB_PATH', 'OUTPUT_DIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run is not None:
+        run(*args.run)
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        fill(db_path, args)
+        print(f"{args.experiments} experiments, {args.image_px}x{args.image_px} png images, {args.steps} detail steps, database {os.path.getsize(db_path) / 2 ** 20:.0f} MB")
+        for mode in ('former', 'streaming'):
+            output_dir = os.path.join(tmp_dir, mode)
+            out = subprocess.run([sys.executable, __file__, '--run', mode, db_path, output_dir], capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"{mode:>10}: failed\n{out.stderr[-2000:]}")
+                continue
+            elapsed, max_rss, zip_size = out.stdout.split()
+            print(f"{mode:>10}: {float(elapsed):8.2f} s, peak RSS {int(max_rss) / 1024:8.0f} MB, zip {int(zip_size) / 2 ** 20:.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Benchmark of the images exported per second by pyerm_export_zip on a database of results with png images: 
+# the former export decoding and saving every image with PIL in threads, the images written as they are stored, 
+# and the transcode to thumbnails in a process pool.
+# usage: python benchmarks/bench_export_images.py [--experiments 1000] [--image-px 512] [--thumbnail 128] [--workers N]
+
+import argparse
+import os
+import tempfile
+from time import perf_counter
+
+from bench_export import fill, former_export_data
+from pyerm.scripts.export_data import export_data
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the images exported per second')
+    parser.add_argument('--experiments', type=int, default=1000, help='The number of experiments, one png image each')
+    parser.add_argument('--image-px', type=int, default=512, help='The width and height of the noise images')
+    parser.add_argument('--thumbnail', type=int, default=128, help='The size of the thumbnails of the transcode')
+    parser.add_argument('--workers', type=int, default=None, help='The number of processes of the transcode')
+    args = parser.parse_args()
+    args.steps = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        fill(db_path, args)
+        print(f"{args.experiments} {args.image_px}x{args.image_px} png images, database {os.path.getsize(db_path) / 2 ** 20:.0f} MB, {os.cpu_count()} CPUs")
+        runs = [
+            ('former PIL decode/re-encode', lambda output_dir: former_export_data(db_path, output_dir)),
+            ('raw bytes', lambda output_dir: export_data(db_path, output_dir)),
+            (f'JPEG thumbnails {args.thumbnail}px', lambda output_dir: export_data(db_path, output_dir, image_format='JPEG', 
+                                                                                  max_size=(args.thumbnail, args.thumbnail), workers=args.workers)),
+        ]
+        for i, (label, run) in enumerate(runs):
+            start = perf_counter()
+            zip_path = run(os.path.join(tmp_dir, str(i)))
+            elapsed = perf_counter() - start
+            print(f"{label:>28}: {elapsed:8.2f} s, {args.experiments / elapsed:8.1f} images/s, zip {os.path.getsize(zip_path) / 2 ** 20:.0f} MB")
+            os.remove(zip_path)
+
+if __name__ == "__main__":
+    main()
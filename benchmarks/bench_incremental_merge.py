@@ -0,0 +1,97 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Benchmark of the nightly sync of a growing source database: after a first merge, the source grows by --grow experiments.
+# The former full merge reads every row of the source again, the incremental `merge_database()` only the rows after its 
+# high-water marks, and `merge_databases()` skips a source whose file did not change since.
+# usage: python benchmarks/bench_incremental_merge.py [--experiments 20000] [--steps 100] [--image-kb 16] [--grow 100]
+
+import argparse
+import os
+import shutil
+import tempfile
+from time import perf_counter
+
+from bench_merge import fill
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import ExperimentTable, MethodTable, ResultTable, DetailRecordTable
+from pyerm.database.merge import DatabaseMerger, merge_database, merge_databases, drop_mapping_tables
+
+def grow(db_path, args):
+    db = Database(db_path)
+    experiment_table, result_table, detail_table = ExperimentTable(db), ResultTable(db, 'bench', {'acc': 'REAL'}), DetailRecordTable(db)
+    method_id = MethodTable(db, 'bench', {'lr': 'REAL', 'layers': 'INTEGER'}).insert(lr=0.5, layers=1)
+    image = os.urandom(args.image_kb * 1024)
+    with db.transaction():
+        for _ in range(args.grow):
+            experiment_id = experiment_table.experiment_start('bench', 'bench', method_id, 'data', -1, 'bench')
+            result_table.insert(experiment_id=experiment_id, acc=0.5, image_0_name='image', image_0=image)
+            experiment_table.experiment_over(experiment_id)
+            detail_table.insert_many(experiment_id, ['loss'], [(float(step),) for step in range(args.steps)])
+    db.close()
+
+def full_merge(db, source):
+    # the former merge, every row of the source read again
+    merger = DatabaseMerger(db)
+    db.conn.execute("ATTACH DATABASE ? AS merge_source", (source,))
+    try:
+        with db.transaction():
+            return merger.merge_attached()
+    finally:
+        drop_mapping_tables(db)
+        db.conn.execute("DETACH DATABASE merge_source")
+
+def timed(label, fn, *args):
+    start = perf_counter()
+    rows = fn(*args)
+    elapsed = perf_counter() - start
+    print(f"{label:>28}: {elapsed * 1000:10.1f} ms, {rows} rows")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark merging a growing source database again')
+    parser.add_argument('--experiments', type=int, default=20000, help='The number of experiments of the source at the first merge')
+    parser.add_argument('--steps', type=int, default=100, help='The number of detail steps of one experiment')
+    parser.add_argument('--image-kb', type=int, default=16, help='The size of the image of each result, in KB')
+    parser.add_argument('--grow', type=int, default=100, help='The number of experiments added to the source after the first merge')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination, source = os.path.join(tmp_dir, 'destination.db'), os.path.join(tmp_dir, 'source.db')
+        fill(source, args, 1)
+        db = Database(destination)
+        ExperimentTable(db)
+        timed('first merge', lambda: sum(merge_database(db, source).values()))
+        grow(source, args)
+        print(f"source {os.path.getsize(source) / 2 ** 20:.0f} MB, {args.experiments} + {args.grow} experiments x {args.steps} detail steps")
+        former = os.path.join(tmp_dir, 'former.db')
+        db.close()
+        shutil.copy(destination, former)
+        former_db = Database(former)
+        timed('former full merge', lambda: sum(full_merge(former_db, source).values()))
+        former_db.close()
+        db = Database(destination)
+        timed('incremental merge_database', lambda: sum(merge_database(db, source).values()))
+        timed('unchanged merge_databases', lambda: sum(sum(counts.values()) for counts in merge_databases(db, [source], workers=1).values()))
+        db.close()
+
+if __name__ == "__main__":
+    main()
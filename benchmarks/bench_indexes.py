@@ -0,0 +1,101 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+
+# Benchmark of the managed secondary indexes: latency of the typical experiment_list lookups
+# on a large database before and after `pyerm_reindex`.
+# usage: python benchmarks/bench_indexes.py [--experiments 1000000] [--lookups 200]
+
+import argparse
+import os
+import random
+import tempfile
+from time import perf_counter
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import ExperimentTable
+from pyerm.scripts.reindex import reindex
+
+TASKS = [f'task{i}' for i in range(10)]
+METHODS = [f'method{i}' for i in range(20)]
+DATAS = [f'data{i}' for i in range(10)]
+
+def fill(db_path, experiments):
+    db = Database(db_path, profile='writer-heavy')
+    table = ExperimentTable(db)
+    for index_name in table.INDEXES:
+        db.cursor.execute(f'DROP INDEX {index_name}')
+    db.conn.commit()
+    columns = ['method', 'method_id', 'data', 'data_id', 'task', 'start_time', 'end_time', 'status', 'remark']
+    rng = random.Random(0)
+    def rows():
+        for i in range(experiments):
+            day = 1 + i * 28 // experiments
+            yield (rng.choice(METHODS), rng.randint(1, 50), rng.choice(DATAS), rng.randint(1, 5), rng.choice(TASKS),
+                   f'2024-01-{day:02d} 00:00:00', f'2024-01-{day:02d} 01:00:00',
+                   'finished' if rng.random() < 0.9 else 'failed', f'remark_{i}' if i % 100 == 0 else None)
+    with db.transaction():
+        table.insert_many(columns, rows())
+    db.close()
+
+def lookups(db_path, n):
+    db = Database(db_path)
+    rng = random.Random(1)
+    queries = {
+        'same setting': lambda: db.conn.execute(
+            f"SELECT id FROM experiment_list WHERE method='{rng.choice(METHODS)}' AND method_id={rng.randint(1, 50)} AND data='{rng.choice(DATAS)}' "
+            f"AND data_id={rng.randint(1, 5)} AND task='{rng.choice(TASKS)}' AND status='finished'").fetchall(),
+        'remark': lambda: db.conn.execute(f"SELECT id FROM experiment_list WHERE remark='remark_{rng.randrange(0, 100000, 100)}'").fetchall(),
+        'start time range': lambda: db.conn.execute(
+            f"SELECT COUNT(*) FROM experiment_list WHERE start_time BETWEEN '2024-01-{rng.randint(1, 27):02d}' AND '2024-01-28'").fetchall(),
+    }
+    latency = {}
+    for name, query in queries.items():
+        start = perf_counter()
+        for _ in range(n):
+            query()
+        latency[name] = (perf_counter() - start) / n * 1000
+    db.close()
+    return latency
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the experiment_list lookups with and without the managed indexes')
+    parser.add_argument('--experiments', type=int, default=1000000, help='The number of experiments in the database')
+    parser.add_argument('--lookups', type=int, default=200, help='The number of lookups timed for each query')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        start = perf_counter()
+        fill(db_path, args.experiments)
+        print(f"filled {args.experiments} experiments in {perf_counter() - start:.1f}s")
+        before = lookups(db_path, args.lookups)
+        start = perf_counter()
+        reindex(db_path)
+        print(f"pyerm_reindex took {perf_counter() - start:.1f}s")
+        after = lookups(db_path, args.lookups)
+    print(f"{'lookup':>16} {'before (ms)':>12} {'after (ms)':>12}")
+    for name in before:
+        print(f"{name:>16} {before[name]:12.3f} {after[name]:12.3f}")
+
+if __name__ == "__main__":
+    main()
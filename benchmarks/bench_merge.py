@@ -0,0 +1,138 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Benchmark of merging a database into another: `merge_database()`, the set-based merge with the source attached,
+# against the former copy of every row through Python with one `execute` per row.
+# With --sources N, N source databases merged one by one with `merge_database()` (one db_merge run each) 
+# against `merge_databases()`, prepared in a process pool and written in batches.
+# usage: python benchmarks/bench_merge.py [--experiments 20000] [--steps 100] [--image-kb 64] [--skip-former] [--sources 1] [--workers N]
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+from time import perf_counter
+
+from pyerm.database.dbbase import Database, Table
+from pyerm.database.tables import ExperimentTable, MethodTable, ResultTable, DetailRecordTable, param_hash
+from pyerm.database.merge import merge_database, merge_databases
+
+def fill(db_path, args, seed):
+    random.seed(seed)
+    db = Database(db_path, profile='writer-heavy')
+    experiment_table = ExperimentTable(db)
+    method_table = MethodTable(db, 'bench', {'lr': 'REAL', 'layers': 'INTEGER'})
+    result_table = ResultTable(db, 'bench', {'acc': 'REAL'})
+    detail_table = DetailRecordTable(db)
+    image = os.urandom(args.image_kb * 1024)
+    with db.transaction():
+        method_ids = [method_table.insert(lr=10 ** -(1 + i % 4), layers=1 + i // 4) for i in range(40)]
+        for i in range(args.experiments):
+            experiment_id = experiment_table.experiment_start('bench', 'bench', random.choice(method_ids), 'data', -1, 'bench')
+            result_table.insert(experiment_id=experiment_id, acc=random.random(), image_0_name='image', image_0=image)
+            experiment_table.experiment_over(experiment_id)
+            detail_table.insert_many(experiment_id, ['loss'], [(random.random(),) for _ in range(args.steps)])
+    db.close()
+
+def former_copy_table(db1, db2, table_name):
+    # the former db_merge, without the ID remapping
+    table = Table(db2, table_name)
+    columns = [info[1] for info in db2.cursor.execute(f"PRAGMA table_info({table_name})").fetchall() if info[1] not in table.primary_key]
+    insert_stmt = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+    rows = db2.cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name}").fetchall()
+    count = 0
+    for row in rows:
+        try:
+            db1.cursor.execute(insert_stmt, row)
+            count += 1
+        except sqlite3.IntegrityError:
+            pass
+    db1.conn.commit()
+    return count
+
+def bench_sources(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, 'destination.db')
+        fill(destination, args, 0)
+        sources = [os.path.join(tmp_dir, f'source_{k}.db') for k in range(args.sources)]
+        for k, source in enumerate(sources):
+            fill(source, args, k + 1)
+        size = sum(os.path.getsize(source) for source in sources)
+        print(f"{args.sources} sources of {args.experiments} experiments x {args.steps} detail steps, {args.image_kb} KB images, {size / 2 ** 20:.0f} MB")
+        one_by_one = os.path.join(tmp_dir, 'one_by_one.db')
+        shutil.copy(destination, one_by_one)
+        db = Database(one_by_one)
+        start = perf_counter()
+        rows = sum(sum(merge_database(db, source).values()) for source in sources)
+        elapsed = perf_counter() - start
+        db.close()
+        os.remove(one_by_one)
+        print(f"  merge_database() x {args.sources}: {elapsed:8.2f} s, {rows / elapsed:10.0f} rows/s, {size / 2 ** 20 / elapsed:6.1f} MB/s")
+        db = Database(destination)
+        start = perf_counter()
+        rows = sum(sum(counts.values()) for counts in merge_databases(db, sources, workers=args.workers).values())
+        elapsed = perf_counter() - start
+        db.close()
+        print(f"      merge_databases(): {elapsed:8.2f} s, {rows / elapsed:10.0f} rows/s, {size / 2 ** 20 / elapsed:6.1f} MB/s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark merging two databases')
+    parser.add_argument('--experiments', type=int, default=20000, help='The number of experiments of each database')
+    parser.add_argument('--steps', type=int, default=100, help='The number of detail steps of one experiment')
+    parser.add_argument('--image-kb', type=int, default=64, help='The size of the image of each result, in KB')
+    parser.add_argument('--skip-former', action='store_true', help='Skip the former row by row merge')
+    parser.add_argument('--sources', type=int, default=1, help='The number of source databases, more than 1 to benchmark merge_databases()')
+    parser.add_argument('--workers', type=int, default=None, help='The number of worker processes of merge_databases()')
+    args = parser.parse_args()
+    if args.sources > 1:
+        bench_sources(args)
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination, source = os.path.join(tmp_dir, 'destination.db'), os.path.join(tmp_dir, 'source.db')
+        fill(destination, args, 0)
+        fill(source, args, 1)
+        size = os.path.getsize(source)
+        print(f"{args.experiments} experiments x {args.steps} detail steps, {args.image_kb} KB images, source {size / 2 ** 20:.0f} MB")
+        if not args.skip_former:
+            former = os.path.join(tmp_dir, 'former.db')
+            shutil.copy(destination, former)
+            db1, db2 = Database(former), Database(source)
+            start = perf_counter()
+            rows = sum(former_copy_table(db1, db2, table_name) for table_name in db2.table_names)
+            elapsed = perf_counter() - start
+            db1.close()
+            db2.close()
+            os.remove(former)
+            print(f"   former row by row: {elapsed:8.2f} s, {rows / elapsed:10.0f} rows/s, {size / 2 ** 20 / elapsed:6.1f} MB/s (IDs not remapped)")
+        db = Database(destination)
+        start = perf_counter()
+        rows = sum(merge_database(db, source).values())
+        elapsed = perf_counter() - start
+        db.close()
+        print(f"    merge_database(): {elapsed:8.2f} s, {rows / elapsed:10.0f} rows/s, {size / 2 ** 20 / elapsed:6.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
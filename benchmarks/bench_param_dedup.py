@@ -0,0 +1,85 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Benchmark of finding an existing setting of a method table with 100k settings: the `param_hash` lookup of `MethodTable.insert`
+# against the filter on all the parameters of former versions, without and with an index on the parameters.
+# usage: python benchmarks/bench_param_dedup.py [--settings 100000] [--lookups 1000]
+
+import argparse
+import os
+import random
+import tempfile
+from time import perf_counter
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import MethodTable, param_hash
+
+PARAMS = {'lr': 'REAL', 'batch_size': 'INTEGER', 'optimizer': 'TEXT', 'dropout': 'REAL', 'layers': 'INTEGER', 'seed': 'INTEGER'}
+
+def setting(i):
+    return {'lr': 10 ** -(1 + i % 5), 'batch_size': 2 ** (4 + i % 4), 'optimizer': ('sgd', 'adam', 'adamw')[i % 3], 
+            'dropout': (i % 7) / 10, 'layers': 1 + i % 11, 'seed': i}
+
+def scan_lookup(db, params):
+    condition = ' AND '.join(f'{k}=?' for k in params)
+    return db.cursor.execute(f"SELECT method_id FROM method_bench WHERE {condition}", list(params.values())).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the setting lookup of method_init() on a large method table')
+    parser.add_argument('--settings', type=int, default=100000, help='The number of settings in the method table')
+    parser.add_argument('--lookups', type=int, default=1000, help='The number of lookups of existing settings')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, 'bench.db'))
+        table = MethodTable(db, 'bench', dict(PARAMS))
+        column_types = dict(zip(table.columns, table.column_types))
+        rows = [(*setting(i).values(), param_hash(setting(i), column_types)) for i in range(args.settings)]
+        table.insert_many([*PARAMS, 'param_hash'], rows)
+        targets = [setting(random.randrange(args.settings)) for _ in range(args.lookups)]
+        start = perf_counter()
+        for params in targets:
+            db.cursor.execute("SELECT method_id FROM method_bench WHERE param_hash=?", (param_hash(params, column_types),)).fetchall()
+        hashed = perf_counter() - start
+        start = perf_counter()
+        for params in targets:
+            table.insert(**params)
+        inserted = perf_counter() - start
+        start = perf_counter()
+        for params in targets:
+            scan_lookup(db, params)
+        scan = perf_counter() - start
+        table.create_index('index_bench_params', list(PARAMS))
+        start = perf_counter()
+        for params in targets:
+            scan_lookup(db, params)
+        indexed = perf_counter() - start
+        db.close()
+    print(f"{args.settings} settings, {args.lookups} lookups of existing settings")
+    print(f"       param_hash lookup: {hashed * 1e6 / args.lookups:10.1f} us")
+    print(f"   MethodTable.insert(): {inserted * 1e6 / args.lookups:10.1f} us (transaction and schema checks included)")
+    print(f"        filter, no index: {scan * 1e6 / args.lookups:10.1f} us")
+    print(f" filter, parameter index: {indexed * 1e6 / args.lookups:10.1f} us")
+
+if __name__ == "__main__":
+    main()
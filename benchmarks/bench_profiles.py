@@ -0,0 +1,80 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+
+# Benchmark of the connection profiles: experiments logged per second for each profile,
+# optionally with a reader process scanning the database at the same time like the webUI does.
+# usage: python benchmarks/bench_profiles.py [--runs 500] [--reader]
+
+import argparse
+import multiprocessing as mp
+import os
+import sqlite3
+import tempfile
+from time import perf_counter, sleep
+
+from pyerm import Experiment
+from pyerm.database.dbbase import PROFILES
+
+def reader(db_path, stop):
+    while not os.path.exists(db_path):
+        sleep(0.01)
+    conn = sqlite3.connect(db_path, timeout=30)
+    while not stop.is_set():
+        try:
+            conn.execute("SELECT COUNT(*), AVG(score) FROM result_bench").fetchall()
+        except sqlite3.OperationalError:
+            pass
+
+def run(profile, runs, with_reader):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        exp = Experiment(db_path, profile=profile)
+        exp.task_init('bench', {'score': 'REAL'})
+        exp.data_init('data', {'size': 100})
+        if with_reader:
+            stop = mp.Event()
+            proc = mp.Process(target=reader, args=(db_path, stop))
+            proc.start()
+        start = perf_counter()
+        for i in range(runs):
+            exp.method_init('method', {'lr': i % 10 / 10})
+            exp.experiment_start(f'run {i}')
+            exp.experiment_over({'score': i / runs})
+        elapsed = perf_counter() - start
+        if with_reader:
+            stop.set()
+            proc.join()
+    return runs / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the connection profiles of pyerm')
+    parser.add_argument('--runs', type=int, default=500, help='The number of experiments logged for each profile')
+    parser.add_argument('--reader', action='store_true', help='Scan the database from another process while logging')
+    args = parser.parse_args()
+    for profile in PROFILES:
+        print(f"{profile:>12}: {run(profile, args.runs, args.reader):8.1f} experiments/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Benchmark of recording a setting with new parameters in a large method table: `MethodTable.insert` adding the columns 
+# in one transaction against the former `add_column()` + `update(key=None)` per new parameter, which rewrote every row.
+# usage: python benchmarks/bench_schema_evolution.py [--settings 200000] [--new-params 3]
+
+import argparse
+import os
+import tempfile
+from time import perf_counter
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import MethodTable, param_hash
+
+def fill(db, settings):
+    table = MethodTable(db, 'bench', {'lr': 'REAL', 'batch_size': 'INTEGER', 'optimizer': 'TEXT', 'seed': 'INTEGER'})
+    column_types = dict(zip(table.columns, table.column_types))
+    params = ({'lr': 10 ** -(1 + i % 5), 'batch_size': 2 ** (4 + i % 4), 'optimizer': ('sgd', 'adam')[i % 2], 'seed': i} for i in range(settings))
+    table.insert_many(['lr', 'batch_size', 'optimizer', 'seed', 'param_hash'], ((*p.values(), param_hash(p, column_types)) for p in params))
+    return table
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark adding new parameters to a large method table')
+    parser.add_argument('--settings', type=int, default=200000, help='The number of settings in the method table')
+    parser.add_argument('--new-params', type=int, default=3, help='The number of new parameters of the recorded setting')
+    args = parser.parse_args()
+    new_params = {f'new_param_{i}': 0.5 for i in range(args.new_params)}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, 'former.db'))
+        table = fill(db, args.settings)
+        start = perf_counter()
+        for key, value in new_params.items():
+            # the former schema evolution, one full table rewrite and commit per new parameter
+            table.add_column(key, 'REAL')
+            table.update(**{key: None})
+        former = perf_counter() - start
+        db.close()
+        db = Database(os.path.join(tmp_dir, 'bench.db'))
+        table = fill(db, args.settings)
+        start = perf_counter()
+        table.insert(lr=0.1, batch_size=16, optimizer='adam', seed=0, **new_params)
+        current = perf_counter() - start
+        db.close()
+    print(f"{args.settings} settings, {args.new_params} new parameters")
+    print(f" add_column + update: {former * 1000:10.1f} ms")
+    print(f"MethodTable.insert(): {current * 1000:10.1f} ms (new columns and the new setting)")
+
+if __name__ == "__main__":
+    main()
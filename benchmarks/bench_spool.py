@@ -0,0 +1,78 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Benchmark of the time an experiment loop spends in the pyerm calls writing the database directly
+# against `Experiment(spool_dir=...)`, and of loading the spool into the database with `ingest_spools()`.
+# usage: python benchmarks/bench_spool.py [--runs 200] [--steps 100] [--profile writer-heavy]
+
+import argparse
+import os
+import tempfile
+from time import perf_counter
+
+from pyerm import Experiment
+from pyerm.database.dbbase import Database
+from pyerm.database.spool import ingest_spools
+
+def run(exp, args):
+    exp.task_init('bench')
+    exp.data_init('data', {'size': 1})
+    exp.method_init('method', {'lr': 0.1})
+    exp.detail_init(flush_rows=args.steps)
+    start = perf_counter()
+    for i in range(args.runs):
+        exp.experiment_start('bench')
+        for step in range(args.steps):
+            exp.detail_update({'epoch': step, 'loss': 1 / (step + 1)})
+        exp.experiment_over({'acc': i / args.runs})
+    exp.close()
+    return perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the spool mode against writing the database directly')
+    parser.add_argument('--runs', type=int, default=200, help='The number of experiments')
+    parser.add_argument('--steps', type=int, default=100, help='The number of detail steps of one experiment')
+    parser.add_argument('--profile', default='writer-heavy', help='The connection profile of the direct writes and the ingest')
+    args = parser.parse_args()
+    print(f"{args.runs} runs x {args.steps} detail steps, profile {args.profile}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        spool_dir = os.path.join(tmp_dir, 'spool')
+        direct = run(Experiment(db_path, profile=args.profile), args)
+        spool = run(Experiment(spool_dir=spool_dir), args)
+        size = sum(os.path.getsize(os.path.join(spool_dir, name)) for name in os.listdir(spool_dir))
+        db = Database(db_path, profile=args.profile)
+        start = perf_counter()
+        events = sum(ingest_spools(db, [spool_dir]).values())
+        ingest = perf_counter() - start
+        start = perf_counter()
+        ingest_spools(db, [spool_dir])
+        replay = perf_counter() - start
+        db.close()
+    print(f"direct: {direct * 1000 / args.runs:8.2f} ms per run")
+    print(f" spool: {spool * 1000 / args.runs:8.2f} ms per run, {size / 1024:.0f} KB of segments")
+    print(f"ingest: {ingest:8.2f} s for {events} events ({args.runs / ingest:.0f} runs/s), replay of an ingested spool {replay * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Benchmark of finding the stuck experiments among many running ones: `ExperimentTable.stale_experiments()`, 
+# range queries on the partial heartbeat index, against the former scan of the running experiments parsing their start time in Python.
+# usage: python benchmarks/bench_stale.py [--experiments 200000] [--running 5000] [--stale 50]
+
+import argparse
+import os
+import tempfile
+from datetime import datetime
+from time import perf_counter, strftime, localtime, time
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import ExperimentTable
+
+def former_stale(experiment_table):
+    stale = []
+    for experiment_id, start_time in experiment_table.select('id', 'start_time', where="status='running'"):
+        if time() - datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S").timestamp() > 86400:
+            stale.append(experiment_id)
+    return stale
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark finding the stale experiments')
+    parser.add_argument('--experiments', type=int, default=200000, help='The number of recorded experiments')
+    parser.add_argument('--running', type=int, default=5000, help='The number of running experiments')
+    parser.add_argument('--stale', type=int, default=50, help='The number of stale running experiments')
+    parser.add_argument('--repeat', type=int, default=20, help='The number of timed lookups')
+    args = parser.parse_args()
+    now = time()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, 'bench.db'))
+        table = ExperimentTable(db)
+        rows = []
+        for i in range(args.experiments):
+            running = i >= args.experiments - args.running
+            stale = running and i < args.experiments - args.running + args.stale
+            start = now - (2 * 86400 if stale else 3600)
+            rows.append(('method', 1, 'data', 1, 'bench', strftime("%Y-%m-%d %H:%M:%S", localtime(start)), 
+                         'running' if running else 'finished', (now - 3600 if stale else now - 10) if running else None))
+        table.insert_many(['method', 'method_id', 'data', 'data_id', 'task', 'start_time', 'status', 'last_heartbeat'], rows)
+        db.conn.execute('ANALYZE')
+        start = perf_counter()
+        for _ in range(args.repeat):
+            found = table.stale_experiments(timeout=300)
+        current = (perf_counter() - start) / args.repeat
+        start = perf_counter()
+        for _ in range(args.repeat):
+            former = former_stale(table)
+        former_time = (perf_counter() - start) / args.repeat
+        db.close()
+    print(f"{args.running} running of {args.experiments} experiments, {args.stale} stale")
+    print(f"start time parsed in Python: {former_time * 1000:8.2f} ms, {len(former)} found")
+    print(f"  heartbeat index range scan: {current * 1000:8.2f} ms, {len(found)} found")
+
+if __name__ == "__main__":
+    main()
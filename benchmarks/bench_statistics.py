@@ -0,0 +1,112 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+
+# Benchmark of the result statistics: the former pure SQL implementation (5 + 3 x metrics scans)
+# against the single fetch + NumPy `get_result_statistics_by_ids`.
+# usage: python benchmarks/bench_statistics.py [--runs 10000] [--metrics 50] [--repeat 3]
+
+import argparse
+import os
+import random
+import tempfile
+from time import perf_counter
+import numpy as np
+import pandas as pd
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import ResultTable
+from pyerm.database.utils import get_result_statistics_by_ids
+
+def sql_statistics(db, task, same_setting_id):
+    # the implementation replaced by the NumPy one, kept here as the baseline
+    result_table = db[f'result_{task}']
+    score_columns = [col for col in result_table.columns if not col.startswith("image_") and not col=="experiment_id"]
+    same_setting_id_sql = ','.join(same_setting_id)
+    max_score = pd.read_sql_query(f"SELECT {','.join([f'MAX({col}) AS {col}' for col in score_columns])} FROM result_{task} WHERE experiment_id IN ({same_setting_id_sql})", db.conn)
+    min_score = pd.read_sql_query(f"SELECT {','.join([f'MIN({col}) AS {col}' for col in score_columns])} FROM result_{task} WHERE experiment_id IN ({same_setting_id_sql})", db.conn)
+    avg_score = pd.read_sql_query(f"SELECT {','.join([f'AVG({col}) AS {col}' for col in score_columns])} FROM result_{task} WHERE experiment_id IN ({same_setting_id_sql})", db.conn)
+    std_queries = [
+        f"""(SELECT AVG(({col} - sub.avg_{col}) * ({col} - sub.avg_{col})) AS var_{col}
+             FROM result_{task}, 
+             (SELECT AVG({col}) AS avg_{col} FROM result_{task} WHERE experiment_id IN ({same_setting_id_sql})) AS sub
+             WHERE experiment_id IN ({same_setting_id_sql})) AS var_{col}"""
+        for col in score_columns
+    ]
+    var_score = pd.read_sql_query(f"SELECT {', '.join(std_queries)}", db.conn).astype('float64')
+    std_score = var_score.apply(np.sqrt)
+    std_score.columns = [col.replace('var_', '') for col in std_score.columns]
+    median_queries = [
+        f"""(SELECT AVG({col}) FROM 
+            (SELECT {col} FROM result_{task} 
+             WHERE experiment_id IN ({same_setting_id_sql}) 
+             ORDER BY {col} 
+             LIMIT 2 - (SELECT COUNT(*) FROM result_{task} 
+                        WHERE experiment_id IN ({same_setting_id_sql})) % 2 
+             OFFSET (SELECT (COUNT(*) - 1) / 2 FROM result_{task} 
+                     WHERE experiment_id IN ({same_setting_id_sql}))) AS median_{col}) AS {col}"""
+        for col in score_columns
+    ]
+    median_score = pd.read_sql_query(f"SELECT {', '.join(median_queries)}", db.conn)
+    rst = pd.concat([max_score, min_score, avg_score, std_score, median_score], axis=0)
+    rst.index = ['Max', 'Min', 'Avg', 'Std', 'Median']
+    return rst
+
+def fill(db_path, runs, metrics):
+    db = Database(db_path, profile='writer-heavy')
+    columns = [f'metric_{i}' for i in range(metrics)]
+    table = ResultTable(db, 'bench', {col: 'REAL' for col in columns})
+    rng = random.Random(0)
+    with db.transaction():
+        table.insert_many(['experiment_id', *columns], ([i + 1, *[rng.random() for _ in columns]] for i in range(runs)))
+    db.close()
+
+def timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        rst = func()
+        best = min(best, perf_counter() - start)
+    return best, rst
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the result statistics of one setting')
+    parser.add_argument('--runs', type=int, default=10000, help='The number of runs of the setting')
+    parser.add_argument('--metrics', type=int, default=50, help='The number of metric columns')
+    parser.add_argument('--repeat', type=int, default=3, help='The best of how many repetitions is reported')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        fill(db_path, args.runs, args.metrics)
+        db = Database(db_path)
+        ids = [str(i + 1) for i in range(args.runs)]
+        sql_time, sql_rst = timeit(lambda: sql_statistics(db, 'bench', ids), args.repeat)
+        np_time, np_rst = timeit(lambda: get_result_statistics_by_ids(db, 'bench', ids), args.repeat)
+        db.close()
+    assert np.allclose(sql_rst.to_numpy(dtype=np.float64), np_rst.to_numpy()), 'The statistics differ'
+    print(f"{args.runs} runs x {args.metrics} metrics")
+    print(f"   SQL: {sql_time * 1000:10.1f} ms")
+    print(f" NumPy: {np_time * 1000:10.1f} ms ({sql_time / np_time:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -24,44 +24,544 @@
 
 import sqlite3
 import re
+import os
+import typing
+import threading
+import random
+from time import monotonic, sleep
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+from .trace import QueryTracer, TracingConnection
+
+# connection profiles, PRAGMA name -> value, applied in this order right after connecting
+PROFILES = {
+    # SQLite defaults: rollback journal, synchronous=FULL
+    'default': {},
+    # many short experiment writes while readers (e.g. the webUI) keep working
+    'writer-heavy': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+    },
+    # analysis and the webUI, large scans over an existing database
+    'read-mostly': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,
+        'cache_size': -262144,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+}
+
+# milliseconds, the busy_timeout of `sqlite3.connect(timeout=5.0)`, for the profiles without one
+DEFAULT_BUSY_TIMEOUT = 5000
+
+def resolve_profile(profile:typing.Union[str, dict, None]) -> dict:
+    # a copy, the caller may change it without changing the profile of the process
+    if profile is None:
+        return dict(PROFILES['default'])
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f'Unknown connection profile {profile}, choose from {list(PROFILES.keys())}')
+        return dict(PROFILES[profile])
+    return dict(profile)
+
+def is_lock_error(error:Exception) -> bool:
+    """
+    Whether the error is SQLITE_BUSY/SQLITE_LOCKED ("database is locked"), which a retry of the transaction may resolve
+    """
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return 'locked' in str(error) or 'busy' in str(error)
+
+class LockStats:
+    """
+    Counters of the write lock contention of a `Database`, shared by its threads
+
+    Attributes
+    ----------
+    transactions : int
+        The write transactions begun
+    lock_waits : int
+        The transactions that waited more than `WAIT_THRESHOLD` seconds for the write lock in SQLite's busy handler
+    lock_wait_time : float
+        The seconds spent waiting for the write lock in the busy handler
+    retries : int
+        The transactions retried after "database is locked"
+    retry_wait_time : float
+        The seconds slept between the retries
+    failures : int
+        The transactions given up after the last retry
+    """
+    WAIT_THRESHOLD = 0.001
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.transactions = 0
+            self.lock_waits = 0
+            self.lock_wait_time = 0.0
+            self.retries = 0
+            self.retry_wait_time = 0.0
+            self.failures = 0
+
+    def record_begin(self, waited:float) -> None:
+        with self._lock:
+            self.transactions += 1
+            if waited > self.WAIT_THRESHOLD:
+                self.lock_waits += 1
+                self.lock_wait_time += waited
+
+    def record_retry(self, delay:float) -> None:
+        with self._lock:
+            self.retries += 1
+            self.retry_wait_time += delay
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {'transactions': self.transactions, 'lock_waits': self.lock_waits, 'lock_wait_time': self.lock_wait_time,
+                    'retries': self.retries, 'retry_wait_time': self.retry_wait_time, 'failures': self.failures}
+
+class ConnectionPool:
+    """
+    Process-wide pool of idle SQLite connections, keyed by database path and connection profile
+
+    A pooled `Database` borrows one connection per thread from the pool and gives them back when it is closed,
+    so later `Database` objects on the same file reuse warm connections and their page cache instead of reconnecting.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        The maximum number of idle connections kept for each database, by default 8
+    idle_timeout : float, optional
+        The seconds after which an idle connection is closed, by default 300
+    """
+    def __init__(self, max_size:int=8, idle_timeout:float=300) -> None:
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    @staticmethod
+    def _key(db_path:str, profile:dict, factory:type):
+        return os.path.abspath(db_path), tuple(profile.items()), factory
+
+    def acquire(self, db_path:str, profile:dict, factory:type=sqlite3.Connection) -> sqlite3.Connection:
+        key = self._key(db_path, profile, factory)
+        with self._lock:
+            self._evict()
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()[0]
+        conn = sqlite3.connect(db_path, check_same_thread=False, factory=factory)
+        Database.apply_profile(conn, profile)
+        return conn
+
+    def release(self, db_path:str, profile:dict, conn:sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        if isinstance(conn, TracingConnection):
+            conn.tracer = None
+        # the busy_timeout of a `Database` overriding the one of the profile is not passed on to the next borrower
+        conn.execute(f"PRAGMA busy_timeout={int(profile.get('busy_timeout', DEFAULT_BUSY_TIMEOUT))}")
+        key = self._key(db_path, profile, type(conn))
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_size:
+                idle.append((conn, monotonic()))
+                return
+        conn.close()
+
+    def _evict(self):
+        deadline = monotonic() - self.idle_timeout
+        for key, idle in list(self._idle.items()):
+            alive = []
+            for conn, last_used in idle:
+                if last_used < deadline:
+                    conn.close()
+                else:
+                    alive.append((conn, last_used))
+            if alive:
+                self._idle[key] = alive
+            else:
+                del self._idle[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+POOL = ConnectionPool()
+
+class Schema:
+    """
+    Snapshot of the schema of one database file at a given `PRAGMA schema_version`,
+    the column information of each table or view is read lazily and kept until the schema changes
+    """
+    def __init__(self, conn:sqlite3.Connection, version:int) -> None:
+        self.version = version
+        rows = conn.execute("SELECT type, name, sql FROM sqlite_master WHERE type IN ('table', 'view', 'index')").fetchall()
+        self.table_names = [name for type_, name, _ in rows if type_ == 'table' and not name.startswith('sqlite')]
+        self.view_names = [name for type_, name, _ in rows if type_ == 'view']
+        # index name -> CREATE statement, automatic indexes of UNIQUE/PRIMARY KEY constraints have no statement
+        self.indexes = {name: sql for type_, name, sql in rows if type_ == 'index'}
+        # the tables whose upgrades and managed indexes were checked at this version, see `ExperimentTable`
+        self.checked = set()
+        self._columns = {}
+
+    def column_info(self, conn:sqlite3.Connection, name:str) -> typing.List[tuple]:
+        # (name, type, primary key index, hidden), hidden is 2 or 3 for generated columns
+        info = self._columns.get(name)
+        if info is None:
+            info = [(column[1], column[2], column[5], column[6]) for column in conn.execute(f'PRAGMA table_xinfo({name})').fetchall() if column[6] != 1]
+            self._columns[name] = info
+        return info
+
+class SchemaCatalog:
+    """
+    Process-wide cache of the `Schema` of each database file, checked against `PRAGMA schema_version`
+    on every access and reloaded only when the schema has changed (by any connection or process)
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._schemas = {}
+
+    @staticmethod
+    def _key(db:'Database'):
+        if db.db_path in ('', ':memory:') or db.db_path.startswith('file:'):
+            return id(db)
+        return os.path.abspath(db.db_path)
+
+    def get(self, db:'Database') -> Schema:
+        key = self._key(db)
+        version = db.conn.execute('PRAGMA schema_version').fetchone()[0]
+        with self._lock:
+            schema = self._schemas.get(key)
+        if schema is None or schema.version != version:
+            schema = Schema(db.conn, version)
+            with self._lock:
+                self._schemas[key] = schema
+        return schema
+
+    def invalidate(self, db:'Database') -> None:
+        with self._lock:
+            self._schemas.pop(self._key(db), None)
+
+CATALOG = SchemaCatalog()
 
 class Database:
-    def __init__(self, db_path:str, output_info=False) -> None:
+    """
+    SQLite database wrapper
+
+    Every thread using the database gets its own connection and cursor, opened on first use,
+    so one `Database` can be shared by worker threads.
+
+    Parameters
+    ----------
+    db_path : str
+        The path of the database file
+    output_info : bool, optional
+        Whether to print the table creating information, by default False
+    profile : typing.Union[str, dict], optional
+        The connection profile, a name in `PROFILES` ('default', 'writer-heavy', 'read-mostly') or a dict of PRAGMA name -> value,
+        by default None, which means the SQLite defaults. Notice that 'journal_mode=WAL' is persistent in the database file.
+    pooled : bool, optional
+        Whether to borrow the connections from the process-wide `POOL` and give them back on close instead of closing them,
+        by default False
+    trace : typing.Union[bool, QueryTracer], optional
+        Whether to record every statement (fingerprint, duration, rows, caller) and log the slow ones with their query plan,
+        True creates a new `QueryTracer`, a `QueryTracer` can also be given to share it between databases, by default False.
+        The results are available from `stats()` and `tracer`.
+    busy_timeout : int, optional
+        The milliseconds SQLite waits for a lock held by another connection before "database is locked", 
+        by default None, which means the `busy_timeout` of the profile, or 5000
+    max_retries : int, optional
+        How many times `run_transaction()` and the table writes retry a transaction which still failed with "database is locked",
+        with a jittered exponential backoff, by default 8
+    retry_delay : float, optional
+        The base seconds of the backoff, doubled at every retry (up to 1 second) and randomized between half and all of it, by default 0.01
+
+    The lock contention is counted in `lock_stats`, see `LockStats`.
+    """
+    def __init__(self, db_path:str, output_info=False, profile:typing.Union[str, dict]=None, pooled:bool=False, 
+                 trace:typing.Union[bool, QueryTracer]=False, busy_timeout:int=None, max_retries:int=8, retry_delay:float=0.01) -> None:
         self.db_path = db_path
         self.info = output_info
-        self.conn = sqlite3.connect(db_path)
-        self.cursor = self.conn.cursor()
-        self.table_names = [table_name[0] for table_name in self.cursor.execute('SELECT name FROM sqlite_master WHERE type="table"').fetchall() if not table_name[0].startswith('sqlite')]
-        self.view_names = [view_name[0] for view_name in self.cursor.execute('SELECT name FROM sqlite_master WHERE type="view"').fetchall()]
+        self.profile = resolve_profile(profile)
+        self.pooled = pooled
+        if isinstance(trace, QueryTracer):
+            self.tracer = trace
+        else:
+            self.tracer = QueryTracer() if trace else None
+        self.busy_timeout = busy_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.lock_stats = LockStats()
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self._tables = {}
+        self._tables_version = None
 
+    def _connect(self):
+        factory = TracingConnection if self.tracer is not None else sqlite3.Connection
+        if self.pooled:
+            conn = POOL.acquire(self.db_path, self.profile, factory)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=factory)
+            self.apply_profile(conn, self.profile)
+        if self.busy_timeout is not None:
+            conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+        if self.tracer is not None:
+            conn.tracer = self.tracer
+        self._local.conn = conn
+        self._local.cursor = conn.cursor()
+        self._local.transaction_depth = 0
+        with self._conns_lock:
+            self._conns.append(conn)
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+        return conn
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        if getattr(self._local, 'conn', None) is None:
+            self._connect()
+        return self._local.cursor
+
+    @property
+    def _transaction_depth(self) -> int:
+        return getattr(self._local, 'transaction_depth', 0)
+
+    @_transaction_depth.setter
+    def _transaction_depth(self, depth:int):
+        self._local.transaction_depth = depth
+
+    @property
+    def schema(self) -> Schema:
+        return CATALOG.get(self)
+
+    @property
+    def table_names(self) -> typing.List[str]:
+        return self.schema.table_names
+
+    @property
+    def view_names(self) -> typing.List[str]:
+        return self.schema.view_names
+
+    @property
+    def index_names(self) -> typing.List[str]:
+        return list(self.schema.indexes.keys())
 
     def __getitem__(self, name:str):
-        if name in self.table_names:
-            return Table(self, name)
-        elif name in self.view_names:
+        schema = self.schema
+        if name in schema.table_names:
+            # table handles are reused until the schema changes
+            if self._tables_version != schema.version:
+                self._tables = {}
+                self._tables_version = schema.version
+            if name not in self._tables:
+                self._tables[name] = Table(self, name)
+            return self._tables[name]
+        elif name in schema.view_names:
             return View(self, name)
         else:
             raise ValueError(f'Table or View {name} does not exist')
         
     def __delitem__(self, name:str):
         if name in self.table_names:
-            self.cursor.execute(f'DROP TABLE {name}')
-            self.table_names.remove(name)
+            self.write(f'DROP TABLE {name}')
         elif name in self.view_names:
-            self.cursor.execute(f'DROP VIEW {name}')
-            self.view_names.remove(name)
-        self.conn.commit()
+            self.write(f'DROP VIEW {name}')
 
     def __len__(self):
         return len(self.table_names)
     
     def __del__(self):
         try:
-            self.cursor.close()
+            self.close()
         except:
             pass
-        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        # a pooled database gives its connections back here instead of whenever it is garbage collected
+        self.close()
     
+    @contextmanager
+    def transaction(self, immediate:bool=True):
+        """
+        Group the writes inside the block into a single transaction
+
+        Table writes inside the block skip their own commit, the outermost block commits once when it exits
+        and rolls everything back if an exception is raised. Nested blocks join the outermost one.
+        The block is not retried when the database is locked, see `run_transaction()` for that.
+
+        Parameters
+        ----------
+        immediate : bool, optional
+            Take the write lock when the transaction begins (`BEGIN IMMEDIATE`), waiting for the other writers in the busy handler,
+            by default True. With False it is taken at the first write, and a transaction that read before 
+            fails at once with "database is locked" when another connection wrote in the meantime.
+
+        Usage
+        -----
+        >>> with db.transaction():
+        ...     db['result_task'].insert(experiment_id=1, score=0.9)
+        ...     db['experiment_list'].update('id=1', status='finished')
+        """
+        if self._transaction_depth == 0:
+            self._local.rollback_callbacks = []
+        if self._transaction_depth == 0 and not self.conn.in_transaction:
+            # explicit BEGIN, so that schema changes (CREATE/ALTER TABLE) are part of the transaction as well
+            if immediate:
+                start = monotonic()
+                self.conn.execute('BEGIN IMMEDIATE')
+                self.lock_stats.record_begin(monotonic() - start)
+            else:
+                self.conn.execute('BEGIN')
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.conn.rollback()
+                # the cached schema may include tables created by the rolled back transaction
+                CATALOG.invalidate(self)
+                self._run_rollback_callbacks()
+            raise
+        else:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                try:
+                    self.conn.commit()
+                except BaseException:
+                    # e.g. "database is locked" by a reader in rollback journal mode, 
+                    # the transaction would stay open and a retry would run again on top of its writes
+                    self.conn.rollback()
+                    CATALOG.invalidate(self)
+                    self._run_rollback_callbacks()
+                    raise
+                self._local.rollback_callbacks = []
+
+    def on_rollback(self, callback:typing.Callable[[], None]) -> None:
+        """
+        Call `callback` if the transaction block of this thread is rolled back, 
+        for the caches advanced by its writes before they commit. Outside of a transaction block it does nothing
+        """
+        if self._transaction_depth > 0:
+            self._local.rollback_callbacks.append(callback)
+
+    def _run_rollback_callbacks(self) -> None:
+        callbacks, self._local.rollback_callbacks = getattr(self._local, 'rollback_callbacks', []), []
+        for callback in callbacks:
+            callback()
+
+    def run_transaction(self, fn:typing.Callable, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` in a `transaction()` and return its result, 
+        retrying the whole transaction with a jittered exponential backoff while it fails with "database is locked",
+        at most `max_retries` times. Inside a transaction block it just runs `fn`, the outermost one is the one to retry.
+        `fn` may run several times, so it should have no effect outside of the database until it returns.
+        """
+        if self._transaction_depth > 0:
+            return fn(*args, **kwargs)
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.transaction():
+                    return fn(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                if attempt == self.max_retries:
+                    self.lock_stats.record_failure()
+                    raise
+            # the random part spreads the retries of the processes which failed together
+            wait = delay * random.uniform(0.5, 1)
+            self.lock_stats.record_retry(wait)
+            sleep(wait)
+            delay = min(delay * 2, 1.0)
+
+    def write(self, query:str, params:typing.Union[typing.Sequence, typing.Iterable[typing.Sequence]]=(), many:bool=False) -> sqlite3.Cursor:
+        """
+        Run one write statement (`executemany` with `many`), committed and retried like `run_transaction()`,
+        or as part of the current transaction block
+
+        Returns
+        -------
+        sqlite3.Cursor
+            The cursor, for its `lastrowid` and `rowcount`
+        """
+        if many and self._transaction_depth == 0 and not isinstance(params, (list, tuple)):
+            # a retry needs the rows again
+            params = list(params)
+        def execute():
+            cursor = self.cursor
+            if many:
+                cursor.executemany(query, params)
+            else:
+                cursor.execute(query, params)
+            return cursor
+        return self.run_transaction(execute)
+
+    def batch(self):
+        """
+        Alias of `transaction()`, defers the commits of many small writes to the end of the block
+        """
+        return self.transaction()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._transaction_depth > 0
+
+    def commit(self):
+        # commits are deferred to the end of the outermost transaction block
+        if self._transaction_depth == 0:
+            self.conn.commit()
+
+    @staticmethod
+    def apply_profile(conn:sqlite3.Connection, profile:dict) -> None:
+        for pragma, value in profile.items():
+            conn.execute(f'PRAGMA {pragma}={value}')
+
+    def stats(self) -> pd.DataFrame:
+        """
+        The per statement fingerprint statistics of the query tracer, see `QueryTracer.stats()`
+        """
+        if self.tracer is None:
+            raise RuntimeError('Query tracing is not enabled, open the database with trace=True')
+        return self.tracer.stats()
+
     def get_table(self, table_name:str):
         return self[table_name]
 
@@ -71,7 +571,14 @@ class Database:
         return version
     
     def close(self):
-        self.__del__()
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+            self._local = threading.local()
+        for conn in conns:
+            if self.pooled:
+                POOL.release(self.db_path, self.profile, conn)
+            else:
+                conn.close()
 
 
 class Table:
@@ -79,14 +586,10 @@ class Table:
         self.db = db
         table_name = table_name.strip().replace(' ', '_')
         self.table_name = table_name
-        self._column = None
-        self._primary_key = None
         if not table_exists(db, table_name):
             assert columns, 'Columns must be provided when creating a new table'
             columns_str = ', '.join([f"{key.strip().replace(' ', '_')} {value}" for key, value in columns.items()])
-            self.db.cursor.execute(f'CREATE TABLE IF NOT EXISTS {table_name} ({columns_str})')
-            self.db.conn.commit()
-            self.db.table_names.append(table_name)
+            self.db.write(f'CREATE TABLE IF NOT EXISTS {table_name} ({columns_str})')
             if self.db.info:
                 print(f'Table {table_name} created')
         else:
@@ -95,7 +598,7 @@ class Table:
                     if 'VIRTUAL' in definition:
                         del columns[column.replace(' ', '_')]
             assert columns is None or set([col for col in columns.keys() if not str(col).startswith("image_")]) == \
-                set([column[1] for column in self.db.cursor.execute(f'PRAGMA table_info({table_name})').fetchall() if not str(column[1]).startswith("image_")]), \
+                set([column[0] for column in self.column_info if column[3] == 0 and not str(column[0]).startswith("image_")]), \
                     f'Columns(except images) do not match for table {table_name}, consider to check or change table name'
             if self.db.info:
                 print(f'Table {table_name} already exists')
@@ -105,14 +608,33 @@ class Table:
         columns = ', '.join([key.replace(' ', '_') for key in kwargs.keys()])
         values = ', '.join(['?' for _ in kwargs])
         query = f'INSERT INTO {self.table_name} ({columns}) VALUES ({values})'
-        self.db.cursor.execute(query, tuple(kwargs.values()))
-        self.db.conn.commit()
-        return self.db.cursor.lastrowid
+        return self.db.write(query, tuple(kwargs.values())).lastrowid
+
+    def insert_many(self, columns:typing.List[str], rows:typing.Iterable[typing.Sequence]) -> int:
+        """
+        Insert many rows with one `executemany` call and a single commit
+
+        Parameters
+        ----------
+        columns : typing.List[str]
+            The column names, shared by all rows
+        rows : typing.Iterable[typing.Sequence]
+            The row values, each one ordered as `columns`
+
+        Returns
+        -------
+        int
+            The number of inserted rows
+        """
+        assert len(columns) <= len(self.columns), 'Parameter inputted too much'
+        columns_str = ', '.join([key.replace(' ', '_') for key in columns])
+        values = ', '.join(['?' for _ in columns])
+        query = f'INSERT INTO {self.table_name} ({columns_str}) VALUES ({values})'
+        return self.db.write(query, rows, many=True).rowcount
 
     def delete(self, where:str) -> None:
         query = f'DELETE FROM {self.table_name} WHERE {where}'
-        self.db.cursor.execute(query)
-        self.db.conn.commit()
+        self.db.write(query)
 
     def update(self, where:str=None, **kwargs) -> None:
         set_values = ', '.join([f'{key.replace(" ", "_")}=?' for key in kwargs])
@@ -120,8 +642,7 @@ class Table:
             query = f'UPDATE {self.table_name} SET {set_values}'
         else:
             query = f'UPDATE {self.table_name} SET {set_values} WHERE {where}'
-        self.db.cursor.execute(query, tuple(kwargs.values()))
-        self.db.conn.commit()
+        self.db.write(query, tuple(kwargs.values()))
 
     def select(self, *columns:str, where:str=None, other:str=None) -> list:
         columns_str = ', '.join([col.replace(' ', '_') for col in columns]) if columns else '*'
@@ -129,37 +650,145 @@ class Table:
         other_clause = f'{other}' if other else ''
         query = f'SELECT {columns_str} FROM {self.table_name} {where_clause} {other_clause}'
         return self.db.cursor.execute(query).fetchall()
+
+    def select_iter(self, *columns:str, where:str=None, other:str=None, chunk_size:int=1000) -> typing.Iterator[tuple]:
+        """
+        Same as `select()`, but yields the rows lazily, fetching `chunk_size` rows at a time,
+        so that large tables (e.g. result tables with images) can be scanned in constant memory
+        """
+        columns_str = ', '.join([col.replace(' ', '_') for col in columns]) if columns else '*'
+        where_clause = f'WHERE {where}' if where else ''
+        other_clause = f'{other}' if other else ''
+        query = f'SELECT {columns_str} FROM {self.table_name} {where_clause} {other_clause}'
+        yield from _iter_query(self.db, query, chunk_size)
     
+    def select_columns(self, *columns:str, where:str=None, other:str=None, include_blobs:bool=False, chunk_size:int=10000) -> typing.Dict[str, np.ndarray]:
+        """
+        Columnar select, fetches the rows in chunks straight into one typed NumPy array per column 
+        (int64/float64 for INTEGER/REAL columns, object otherwise) instead of a list of row tuples
+
+        Parameters
+        ----------
+        columns : str
+            The columns to select, by default all columns
+        where : str, optional
+            The WHERE condition, by default None
+        other : str, optional
+            Other clauses such as ORDER BY or LIMIT, by default None
+        include_blobs : bool, optional
+            Whether to select BLOB columns (e.g. images) when `columns` is not given, by default False
+        chunk_size : int, optional
+            The number of rows fetched at a time, by default 10000
+
+        Returns
+        -------
+        typing.Dict[str, np.ndarray]
+            Column name -> values
+        """
+        return _select_columns(self.db, self.table_name, self.column_info, columns, where, other, include_blobs, chunk_size)
+
+    def to_frame(self, *columns:str, where:str=None, other:str=None, include_blobs:bool=False, chunk_size:int=10000) -> pd.DataFrame:
+        """
+        Same as `select_columns()`, but returns a DataFrame
+        """
+        return pd.DataFrame(self.select_columns(*columns, where=where, other=other, include_blobs=include_blobs, chunk_size=chunk_size))
+
     def add_column(self, column_name:str, column_definition:str) -> None:
         column_name = column_name.replace(' ', '_')
-        self.db.cursor.execute(f'ALTER TABLE {self.table_name} ADD COLUMN {column_name} {column_definition}')
-        self.db.conn.commit()
+        self.db.write(f'ALTER TABLE {self.table_name} ADD COLUMN {column_name} {column_definition}')
+
+    def add_columns(self, columns:typing.Dict[str, str]) -> typing.List[str]:
+        """
+        Add the columns missing from the table in one transaction. `ADD COLUMN` only changes the schema, 
+        the existing rows read the default of the column (NULL unless the definition gives one) without being rewritten
+
+        Parameters
+        ----------
+        columns : typing.Dict[str, str]
+            The column names and definitions, the existing columns (e.g. just added by another process) are skipped
+
+        Returns
+        -------
+        typing.List[str]
+            The names of the added columns
+        """
+        with self.db.transaction():
+            existing = set(self.columns)
+            added = [(name.replace(' ', '_'), definition) for name, definition in columns.items() if name.replace(' ', '_') not in existing]
+            for column_name, column_definition in added:
+                self.db.write(f'ALTER TABLE {self.table_name} ADD COLUMN {column_name} {column_definition}')
+        return [column_name for column_name, _ in added]
+
+    def create_index(self, index_name:str, columns:typing.List[str], where:str=None, unique:bool=False) -> bool:
+        """
+        Create an index on the table, an existing index with the same name but a different definition is rebuilt
+
+        Parameters
+        ----------
+        index_name : str
+            The name of the index
+        columns : typing.List[str]
+            The indexed columns
+        where : str, optional
+            The condition of a partial index, by default None
+        unique : bool, optional
+            Whether to create a unique index, by default False
+
+        Returns
+        -------
+        bool
+            Whether the index was created or rebuilt
+        """
+        columns = [col.replace(' ', '_') for col in columns]
+        where_clause = f' WHERE {where}' if where else ''
+        query = f"CREATE {'UNIQUE ' if unique else ''}INDEX {index_name} ON {self.table_name}({', '.join(columns)}){where_clause}"
+        existing = self.db.schema.indexes.get(index_name)
+        if existing == query:
+            return False
+        with self.db.transaction():
+            if existing is not None:
+                self.db.cursor.execute(f'DROP INDEX {index_name}')
+            self.db.cursor.execute(query)
+        if self.db.info:
+            print(f'Index {index_name} on {self.table_name} created')
+        return True
+
+    @property
+    def column_info(self) -> typing.List[tuple]:
+        return self.db.schema.column_info(self.db.conn, self.table_name)
 
     @property
     def columns(self):
-        if self._column is None:
-            self._column = self.db.cursor.execute(f"SELECT * FROM {self.table_name}").description
-            self._column = [column[0] for column in self._column]
-        return self._column
+        return [column[0] for column in self.column_info]
+
+    @property
+    def column_types(self):
+        return [column[1] for column in self.column_info]
 
     @property
     def primary_key(self):
-        if self._primary_key is None:
-            self._primary_key = [column[1] for column in self.db.cursor.execute(f'PRAGMA table_info({self.table_name})').fetchall() if column[5] == 1]
-        return self._primary_key
+        return [column[0] for column in self.column_info if column[2] == 1]
     
     def __len__(self):
-        return len(self.select())
+        return self.db.cursor.execute(f'SELECT COUNT(*) FROM {self.table_name}').fetchone()[0]
     
-    def __getitem__(self, index:int):
-        return self.select()[index]
+    def __getitem__(self, index:typing.Union[int, slice]):
+        if isinstance(index, slice):
+            return _select_slice(self, index, 'ORDER BY rowid')
+        if index < 0:
+            index += len(self)
+        rows = self.select(other=f'ORDER BY rowid LIMIT 1 OFFSET {index}') if index >= 0 else []
+        if len(rows) == 0:
+            raise IndexError(f'Table {self.table_name} index out of range')
+        return rows[0]
     
     def __iter__(self):
-        return iter(self.select())
+        # in the order of the indexing, free on a rowid table
+        return self.select_iter(other='ORDER BY rowid')
     
     def __str__(self) -> str:
-        return str([column[1] for column in self.db.cursor.execute(f'PRAGMA table_info({self.table_name})').fetchall()]) + '\n' + \
-                str([column[2] for column in self.db.cursor.execute(f'PRAGMA table_info({self.table_name})').fetchall()]) + '\n' + \
+        return str(self.columns) + '\n' + \
+                str(self.column_types) + '\n' + \
                 str(self.select())
 
 class View:
@@ -169,10 +798,8 @@ class View:
         self.view_name = view_name
         if not view_exists(db, view_name):
             assert query, 'Query must be provided when creating a new view'
-            self.db.cursor.execute(f'CREATE VIEW IF NOT EXISTS {view_name} AS {query}')
+            self.db.write(f'CREATE VIEW IF NOT EXISTS {view_name} AS {query}')
             self.query = query
-            self.db.conn.commit()
-            self.db.view_names.append(view_name)
             if self.db.info:
                 print(f'View {view_name} created')
         else:
@@ -186,7 +813,20 @@ class View:
         where = f'WHERE {where}' if where else ''
         other = f'{other}' if other else ''
         return self.db.cursor.execute(f'SELECT {columns} FROM {self.view_name} {where} {other}').fetchall()
+
+    def select_iter(self, *columns:str, where:str=None, other:str=None, chunk_size:int=1000) -> typing.Iterator[tuple]:
+        columns = ', '.join([col.replace(' ', '_') for col in columns]) if columns else '*'
+        where = f'WHERE {where}' if where else ''
+        other = f'{other}' if other else ''
+        yield from _iter_query(self.db, f'SELECT {columns} FROM {self.view_name} {where} {other}', chunk_size)
     
+    def select_columns(self, *columns:str, where:str=None, other:str=None, include_blobs:bool=False, chunk_size:int=10000) -> typing.Dict[str, np.ndarray]:
+        column_info = self.db.schema.column_info(self.db.conn, self.view_name)
+        return _select_columns(self.db, self.view_name, column_info, columns, where, other, include_blobs, chunk_size)
+
+    def to_frame(self, *columns:str, where:str=None, other:str=None, include_blobs:bool=False, chunk_size:int=10000) -> pd.DataFrame:
+        return pd.DataFrame(self.select_columns(*columns, where=where, other=other, include_blobs=include_blobs, chunk_size=chunk_size))
+
     @property
     def columns(self):
         columns = self.query.split('SELECT ')[1].split(' FROM')[0].split(',')
@@ -194,44 +834,112 @@ class View:
 
         return column_names
 
-    def __getitem__(self, index:int):
-        return self.select()[index]
+    @property
+    def _order(self) -> str:
+        # a view has no rowid, its rows are indexed and iterated in the order of all their columns, 
+        # the only order defined whatever the query plan (equal rows are interchangeable)
+        return 'ORDER BY ' + ', '.join([str(i + 1) for i in range(len(self.db.schema.column_info(self.db.conn, self.view_name)))])
+
+    def __getitem__(self, index:typing.Union[int, slice]):
+        if isinstance(index, slice):
+            return _select_slice(self, index, self._order)
+        if index < 0:
+            index += len(self)
+        rows = self.select(other=f'{self._order} LIMIT 1 OFFSET {index}') if index >= 0 else []
+        if len(rows) == 0:
+            raise IndexError(f'View {self.view_name} index out of range')
+        return rows[0]
 
     def __len__(self):
-        return len(self.select())
+        return self.db.cursor.execute(f'SELECT COUNT(*) FROM {self.view_name}').fetchone()[0]
     
     def __iter__(self):
-        return iter(self.select())
+        return self.select_iter(other=self._order)
 
     def __del__(self):
-        self.db.cursor.execute(f'DROP VIEW {self.view_name}')
-        self.db.conn.commit()
+        self.db.write(f'DROP VIEW {self.view_name}')
 
     def __str__(self) -> str:
         return str([column for column in self.columns]) + '\n' + \
                 str(self.select())
     
-def table_exists(db:Database, table_name:str):
-    cursor = db.cursor
+def _select_slice(source:typing.Union[Table, View], index:slice, order:str) -> list:
+    # the rows of a slice from one LIMIT/OFFSET query over the positions it spans
+    positions = range(*index.indices(len(source)))
+    if len(positions) == 0:
+        return []
+    first, last = min(positions), max(positions)
+    rows = source.select(other=f'{order} LIMIT {last - first + 1} OFFSET {first}')
+    return [rows[i - first] for i in positions]
 
-    cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
-    result = cursor.fetchone()
+def _iter_query(db:Database, query:str, chunk_size:int) -> typing.Iterator[tuple]:
+    # a private cursor, so other queries on the shared cursor do not reset the iteration
+    cursor = db.conn.cursor()
+    try:
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
 
-    if result:
-        return True
-    else:
-        return False
-    
-def view_exists(db:Database, view_name:str):
-    cursor = db.cursor
+def _column_dtype(declared_type:str):
+    # follows the SQLite type affinity rules, NUMERIC affinity (e.g. DATETIME) may hold text so it stays object
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return np.int64
+    if 'REAL' in declared_type or 'FLOA' in declared_type or 'DOUB' in declared_type:
+        return np.float64
+    return object
 
-    cursor.execute(f"SELECT name FROM sqlite_master WHERE type='view' AND name='{view_name}'")
-    result = cursor.fetchone()
+def _to_array(values:tuple, dtype) -> np.ndarray:
+    if dtype is not object:
+        try:
+            return np.array(values, dtype=dtype)
+        except (TypeError, ValueError):
+            pass
+        if dtype is np.int64:
+            # NULL in an integer column
+            try:
+                return np.array(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                pass
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
 
-    if result:
-        return True
+def _select_columns(db:Database, source:str, column_info:typing.List[tuple], columns:typing.Sequence[str], 
+                    where:str, other:str, include_blobs:bool, chunk_size:int) -> typing.Dict[str, np.ndarray]:
+    declared_types = {column[0]: column[1] for column in column_info}
+    if columns:
+        columns = [col.replace(' ', '_') for col in columns]
     else:
-        return False
+        columns = [column[0] for column in column_info if include_blobs or 'BLOB' not in (column[1] or '').upper()]
+    dtypes = [_column_dtype(declared_types.get(col)) for col in columns]
+    where_clause = f'WHERE {where}' if where else ''
+    other_clause = f'{other}' if other else ''
+    query = f'SELECT {", ".join(columns)} FROM {source} {where_clause} {other_clause}'
+    chunks = [[] for _ in columns]
+    cursor = db.conn.cursor()
+    try:
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for i, values in enumerate(zip(*rows)):
+                chunks[i].append(_to_array(values, dtypes[i]))
+    finally:
+        cursor.close()
+    return {col: np.concatenate(parts) if parts else np.array([], dtype=dtype) for col, dtype, parts in zip(columns, dtypes, chunks)}
+
+def table_exists(db:Database, table_name:str):
+    return table_name in db.table_names
+    
+def view_exists(db:Database, view_name:str):
+    return view_name in db.view_names
 
 def extract_names(sql_statement):
     pattern = r'(?:FROM|JOIN|UPDATE|INSERT INTO)\s+(\w+)'
@@ -27,10 +27,15 @@ import typing
 from PIL import Image
 import traceback
 import sys
+from time import time
 from copy import deepcopy
+from functools import partial
 
 from .dbbase import Database
-from .tables import ExperimentTable, MethodTable, ResultTable, DetailTable, DataTable
+from .writer import AsyncWriter, Heartbeat
+from .spool import SpoolWriter
+from .logger import DetailLogger
+from .tables import ExperimentTable, MethodTable, ResultTable, DetailRecordTable, DataTable, SettingStatsTable, encode_image
 from .utils import auto_detect_def
 
 PYERM_HOME = os.path.join(os.path.expanduser('~'), 'pyerm')
@@ -45,6 +50,33 @@ class Experiment:
     ----------
     db_path : str, optional
         The path of the database file, by default None, which means the database file will be saved in the user's home directory
+    profile : typing.Union[str, dict], optional
+        The connection profile of the database, such as 'writer-heavy' for many short experiments or 'read-mostly' for analysis, 
+        by default None, which means the SQLite defaults, see `pyerm.database.dbbase.PROFILES` for details
+    setting_stats : bool, optional
+        Whether to create the table setting_stats_{task} of the running statistics of the scores per setting, by default False.
+        Once the table exists it is updated in the same transaction as the results whatever the flag, as by the other writers of the task
+    async_writes : bool, optional
+        Whether to hand the writes (results, images, details) to a background writer thread, which batches them into transactions,
+        so the calling thread does not wait for SQLite, by default False. The calls returning an ID (experiment_start(), data_init(), 
+        method_init()) and task_init() still wait for their write. Errors of the queued writes are raised by `flush()` or `close()`.
+        Best with the 'writer-heavy' profile, whose WAL mode keeps the commits of the writer thread from blocking the calling thread.
+    max_queue : int, optional
+        The maximum number of queued writes when `async_writes` is True, further writes wait for the queue, by default 1024
+    busy_timeout : int, optional
+        The milliseconds a write waits for the other processes writing the same database, by default None, 
+        which means the one of the profile (or 5000). A write still locked out is retried with a jittered backoff, see `lock_stats()`
+    max_retries : int, optional
+        The number of retries of a locked out write, by default 8
+    spool_dir : str, optional
+        Append the records to a segment file in this directory instead of writing the database, by default None.
+        For nodes where the database is on a shared file system (e.g. NFS) on which SQLite locking is unsafe or slow, 
+        the database is not opened and `db_path` is ignored (nor heartbeats recorded). The segments are loaded into the database later by `pyerm_ingest`,
+        which assigns the IDs, so data_init() and method_init() return None and experiment_start() returns an ID local to the segment.
+    heartbeat_interval : float, optional
+        Update `last_heartbeat` of the running experiment every `heartbeat_interval` seconds from a background thread, by default None (no heartbeat).
+        Then the run is found stale (and deleted with the failed ones in the WebUI) once its process is gone for 
+        several intervals (5 minutes by default, see `ExperimentTable.stale_experiments()`) instead of after 24 hours
         
     Attributes
     ----------
@@ -54,10 +86,14 @@ class Experiment:
         The parameter table object, saves the parameters of the method
     rst_table : ResultTable
         The result table object, saves the results of the method
-    detail_table : DetailTable  
-        The detail table object, saves the details of the method
+    detail_table : DetailRecordTable  
+        The detail table object, saves the details of all experiments in the table detail_records
+    detail_logger : DetailLogger
+        The buffer of the details of the current experiment, see `detail_init()`
     data_table : DataTable
         The data table object, saves the dataset information and parameters of the method
+    stats_table : SettingStatsTable
+        The setting statistics table object, when `setting_stats` is True or the table setting_stats_{task} exists
     run_times : int
         The number of experiments that have been run for the current 'Experiment' instance
 
@@ -70,19 +106,26 @@ class Experiment:
     >>> exp.experiment_start('description')
     >>> exp.detail_update({'detail_info1': 7, 'detail_info2': 8})
     >>> exp.experiment_over(rst_dict={'result_score1': 9, 'result_score2': 10}, image_dict={'image1': Image.open('1.png'), 'image2': '2.png'})
+    >>> exp.close()
 
     For more detailed example, please refer to the 'examples' directory
 
     """
-    def __init__(self, db_path:str=None):
+    def __init__(self, db_path:str=None, profile:typing.Union[str, dict]=None, setting_stats:bool=False, 
+                 async_writes:bool=False, max_queue:int=1024, busy_timeout:int=None, max_retries:int=8, spool_dir:str=None, 
+                 heartbeat_interval:float=None):
         if db_path is None:
             db_path = os.path.join(PYERM_HOME, 'experiment.db')
-        self._db = Database(db_path)
-        self.experiment_table = ExperimentTable(self._db)
+        self._spool = SpoolWriter(spool_dir) if spool_dir is not None else None
+        self._db = Database(db_path, profile=profile, busy_timeout=busy_timeout, max_retries=max_retries) if self._spool is None else None
+        self.experiment_table = ExperimentTable(self._db) if self._spool is None else None
         self.parameter_table = None
         self.rst_table = None
         self.detail_table = None
+        self.detail_logger = None
         self.data_table = None
+        self.stats_table = None
+        self.setting_stats = setting_stats
         self.run_times = 0
 
         self._id = None
@@ -91,6 +134,50 @@ class Experiment:
         self._method = None
         self._method_id = None
         self._task = None
+        self._detail_def_dict = None
+        self._detail_options = {}
+        self._writer = AsyncWriter(self._db, max_queue=max_queue) if async_writes and self._spool is None else None
+        self._heartbeat = Heartbeat(self._db, lambda: self._id, heartbeat_interval) if heartbeat_interval and self._spool is None else None
+
+    def _submit(self, fn:typing.Callable, *args, wait:bool=False):
+        # runs on the writer thread when async_writes is on, `wait` for the writes whose result is needed now
+        if self._writer is None:
+            return self._db.run_transaction(fn, *args)
+        if wait:
+            return self._writer.call(fn, *args)
+        self._writer.submit(fn, *args)
+
+    def flush(self) -> None:
+        """
+        Wait until all queued writes are committed, raises the first error of the failed writes, no-op without `async_writes`
+        """
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self) -> None:
+        """
+        Commit all queued writes, stop the writer thread and close the database connections
+        """
+        if self._heartbeat is not None:
+            self._heartbeat.close()
+        if self._writer is not None:
+            self._writer.close()
+        if self._spool is not None:
+            self._spool.close()
+        else:
+            self._db.close()
+
+    def lock_stats(self) -> dict:
+        """
+        The write lock contention counters of the database connection, see `pyerm.database.dbbase.LockStats`, empty in spool mode
+        """
+        return self._db.lock_stats.as_dict() if self._db is not None else {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
 
     def experiment_start(self, description:str=None, start_time:float=None, tags:typing.Union[typing.List[str], str]=None, experimenters:typing.Union[typing.List[str], str]=None, remark:str=None) -> int:
         """
@@ -121,7 +208,12 @@ class Experiment:
         """
         def handle_exception(exc_type, exc_value, exc_traceback):
             error_info = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
-            self.experiment_table.experiment_failed(self._id, error_info)
+            try:
+                self._flush_details()
+                self._record_failed(self._id, error_info, time())
+            except Exception as e:
+                # e.g. the database is still locked after the retries, the original error is reported anyway
+                print(f"pyerm: failed to record the failure of experiment {self._id}: {e}", file=sys.stderr)
             sys.__excepthook__(exc_type, exc_value, exc_traceback)
         assert self._data is not None, 'Data not initialized, run data_init() first'
         assert self._method is not None, 'Method not initialized, run method_init() first'
@@ -131,7 +223,13 @@ class Experiment:
             tags = ','.join(tags)
         if experimenters is not None and isinstance(experimenters, typing.List):
             experimenters = ','.join(experimenters)
-        self._id = self.experiment_table.experiment_start(description, self._method, self._method_id, self._data, self._data_id, self._task, start_time, tags, experimenters, remark)
+        if self._spool is not None:
+            self._id = self._spool.start(description=description, start_time=start_time if start_time is not None else time(), 
+                                         tags=tags, experimenters=experimenters, remark=remark)
+        else:
+            # written right away on the calling thread, the ID is needed now and the row does not depend on the queued writes
+            self._id = self._db.run_transaction(self.experiment_table.experiment_start, description, self._method, self._method_id, self._data, self._data_id, self._task, start_time, tags, experimenters, remark, 
+                                                time() if self._heartbeat is not None else None)
         self.run_times += 1
         sys.excepthook = handle_exception
         return self._id
@@ -158,16 +256,46 @@ class Experiment:
 
         """
         assert self._id is not None, 'Experiment not started, run experiment_start() first'
-        assert self.rst_table is None or set(rst_dict.keys()).issubset(set(self.rst_table.non_img_columns)), 'Result definition mismatch'
+        self._flush_details()
         rst_dict = deepcopy(rst_dict)
-        if self.rst_table is None:
-            rst_def_dict = auto_detect_def(rst_dict)
-            self.rst_table = ResultTable(self._db, self._task, rst_def_dict)
-        self.rst_table.record_rst(experiment_id=self._id, **rst_dict)
-        self.rst_table.record_image(self._id, **image_dict)
-        self.experiment_table.experiment_over(self._id, end_time=end_time, useful_time_cost=useful_time_cost)
+        args = (self._id, self._task, self._method, self._method_id, self._data, self._data_id, 
+                rst_dict, image_dict, end_time if end_time is not None else time(), useful_time_cost)
+        if self._spool is not None:
+            self._spool.write('over', id=self._id, rst=rst_dict, images={k: encode_image(v) for k, v in image_dict.items()}, 
+                              end_time=args[8], useful_time_cost=useful_time_cost)
+        elif self._writer is None:
+            self._db.run_transaction(self._experiment_over, *args)
+        else:
+            # the images are encoded on the writer thread before its transaction, copied here so the caller may keep modifying them
+            args = (*args[:7], {k: v.copy() if isinstance(v, Image.Image) else bytes(v) if isinstance(v, bytearray) else v for k, v in image_dict.items()}, *args[8:])
+            self._writer.submit(self._experiment_over, *args, prepare=self._encode_images)
         self._id = None
         sys.excepthook = sys.__excepthook__
+
+    @staticmethod
+    def _encode_images(*args):
+        return (*args[:7], {k: encode_image(v) for k, v in args[7].items()}, *args[8:])
+
+    def _experiment_over(self, experiment_id, task, method, method_id, data, data_id, rst_dict, image_dict, end_time, useful_time_cost):
+        assert self.rst_table is None or set(rst_dict.keys()).issubset(set(self.rst_table.non_img_columns)), 'Result definition mismatch'
+        with self._db.transaction():
+            # a table created by a rolled back (e.g. retried) transaction is gone
+            table_names = self._db.table_names
+            if self.rst_table is not None and self.rst_table.table_name not in table_names:
+                self.rst_table = None
+            if self.stats_table is not None and self.stats_table.table_name not in table_names:
+                self.stats_table = None
+            if self.rst_table is None:
+                rst_def_dict = auto_detect_def(rst_dict)
+                self.rst_table = ResultTable(self._db, task, rst_def_dict)
+            # a table created by another writer of the task is kept up to date as well, `setting_stats` only creates it
+            if self.stats_table is None and (self.setting_stats or f"setting_stats_{task}" in table_names):
+                self.stats_table = SettingStatsTable(self._db, task)
+            self.rst_table.record_rst(experiment_id=experiment_id, **rst_dict)
+            self.rst_table.record_image(experiment_id, **image_dict)
+            self.experiment_table.experiment_over(experiment_id, end_time=end_time, useful_time_cost=useful_time_cost)
+            if self.stats_table is not None:
+                self.stats_table.add(method, method_id, data, data_id, rst_dict)
         
 
     def experiment_failed(self, error_info:str, end_time:float=None) -> None:
@@ -188,14 +316,49 @@ class Experiment:
 
         """
         assert self._id is not None, 'Experiment not started, run experiment_start() first'
-        self.experiment_table.experiment_failed(self._id, error_info, end_time=end_time)
+        self._flush_details()
+        self._record_failed(self._id, error_info, end_time if end_time is not None else time())
         self._id = None
+        sys.excepthook = sys.__excepthook__
+
+    def _record_failed(self, experiment_id, error_info, end_time):
+        if self._spool is not None:
+            self._spool.write('failed', id=experiment_id, error_info=error_info, end_time=end_time)
+        else:
+            self._submit(self.experiment_table.experiment_failed, experiment_id, error_info, end_time)
         
 
-    def detail_update(self, detail_dict:typing.Dict[str, typing.Any]):
+    def detail_init(self, detail_def_dict:typing.Dict[str, str]=None, flush_rows:int=1000, flush_interval:float=5.0, sample_every:int=1, aggregate:bool=False) -> None:
+        """
+        Configure how the details of the following experiments are logged, the details are buffered and written 
+        in one batch every `flush_rows` rows or `flush_interval` seconds, and when the experiment is over or failed
+
+        optional function of the Experiment class, use it before experiment_start() for high frequency details such as the loss of every step
+
+        Parameters
+        ----------
+        detail_def_dict : typing.Dict[str, str], optional
+            The detail definition dictionary, by default None, which means the definition will be automatically detected from the first detail
+        flush_rows : int, optional
+            The number of buffered detail rows written in one batch, by default 1000, 1 writes every row at once
+        flush_interval : float, optional
+            The seconds after which the buffered rows are written at the next detail_update(), by default 5.0, None for no time limit
+        sample_every : int, optional
+            Keep one detail row every `sample_every` detail_update() calls, by default 1 (every call)
+        aggregate : bool, optional
+            Instead of the first call of every `sample_every` calls, keep the mean of the numeric details over them 
+            with their minimum and maximum in the columns `{detail}_min` and `{detail}_max`, by default False
+
+        """
+        if detail_def_dict is not None:
+            self._detail_def_dict = detail_def_dict
+        self._detail_options = dict(flush_rows=flush_rows, flush_interval=flush_interval, sample_every=sample_every, aggregate=aggregate)
+
+    def detail_update(self, detail_dict:typing.Dict[str, typing.Any], record_time:float=None):
         """
         Update the detail information what you need of the experiment, such as the ML training process, etc.
         It will automatically record the time when the detail information is updated
+        The details are buffered and written in batches, see `detail_init()` for the buffering and sampling
         
         optional function of the Experiment class, use it for better tracking the experiment
         make sure the detail_dict has consistent format
@@ -206,16 +369,31 @@ class Experiment:
         ----------
         detail_dict : typing.Dict[str, typing.Any]
             The detail dictionary, contains the detail information of the experiment, such as {'epoch': 100, 'loss': 0.1, 'accuracy': 0.9}
+        record_time : float, optional
+            The timestamp of the detail, by default None, which means the current time
 
 
         """
         assert self._id is not None, 'Experiment not started, run experiment_start() first'
-        assert len(detail_dict) == len(self.detail_table.columns) - 2, 'Detail definition and detail dict length mismatch'
-        detail_dict = deepcopy(detail_dict)
-        if self.detail_table is None:
-            detail_def_dict = auto_detect_def(detail_dict)
-            self.detail_table = DetailTable(self._db, self._id, detail_def_dict)
-        self.detail_table.insert(experiment_id=self._id, **detail_dict)
+        if self.detail_logger is None:
+            detail_def_dict = self._detail_def_dict if self._detail_def_dict is not None else auto_detect_def(dict(detail_dict))
+            self.detail_logger = DetailLogger(detail_def_dict, None, **self._detail_options)
+            if self._spool is not None:
+                self.detail_logger.sink = partial(self._spool.details, self._id)
+            else:
+                # every flush is one insert_many into detail_records, queued to the writer thread when async_writes is on
+                self.detail_logger.sink = partial(self._submit, self._write_details, self._id)
+        self.detail_logger.log(detail_dict, record_time)
+
+    def _flush_details(self) -> None:
+        if self.detail_logger is not None:
+            self.detail_logger.flush()
+            self.detail_logger = None
+
+    def _write_details(self, experiment_id, columns, rows):
+        if self.detail_table is None or self.detail_table.table_name not in self._db.table_names:
+            self.detail_table = DetailRecordTable(self._db)
+        self.detail_table.insert_many(experiment_id, columns, rows)
 
     def data_init(self, data_name:str, param_dict:typing.Dict[str, typing.Any]={}, param_def_dict:typing.Dict[str, str]=None, remark:str=None):
         """
@@ -249,12 +427,20 @@ class Experiment:
         if len(param_dict) == 0:
             self._data_id = -1
             print(f"No parameter for table data_{data_name}, table creating canceled")
+            if self._spool is not None:
+                self._spool.write('data', name=data_name, params={}, defs=None)
             return
         param_dict['remark'] = remark
         if param_def_dict is None:
             param_def_dict = auto_detect_def(param_dict)
-        self.data_table = DataTable(self._db, data_name, param_def_dict)
-        self._data_id = self.data_table.insert(**param_dict)
+        if self._spool is not None:
+            self._spool.write('data', name=data_name, params=param_dict, defs=param_def_dict)
+            self._data_id = None
+            return None
+        def init_data():
+            self.data_table = DataTable(self._db, data_name, param_def_dict)
+            return self.data_table.insert(**param_dict)
+        self._data_id = self._submit(init_data, wait=True)
         return self._data_id
     
     def method_init(self, method_name:str, param_dict:typing.Dict[str, typing.Any]={}, param_def_dict:typing.Dict[str, str]=None, detail_def_dict:typing.Dict[str, str]=None, remark:str=None) -> int:
@@ -272,7 +458,7 @@ class Experiment:
         param_def_dict : typing.Dict[str, str], optional
             The parameter definition dictionary, contains the method parameter definition, by default None, which means the parameter definition will be automatically detected
         detail_def_dict : typing.Dict[str, str], optional
-            The detail definition dictionary, contains the detail parameter definition, by default None
+            The detail definition dictionary, contains the detail parameter definition, by default None, same as `detail_init(detail_def_dict)`
         remark : str, optional
             The remark of the method setting, by default None, can't be positive int number
             
@@ -289,16 +475,25 @@ class Experiment:
         self._method = method_name
         param_dict = deepcopy(param_dict)
         if detail_def_dict is not None:
-            self.detail_table = DetailTable(self._db, method_name, detail_def_dict)
+            # the types of the details, used by the detail buffer of each experiment
+            self._detail_def_dict = detail_def_dict
         if len(param_dict) == 0:
             self._method_id = -1
             print(f"No parameter for table method_{method_name}, table creating canceled")
+            if self._spool is not None:
+                self._spool.write('method', name=method_name, params={}, defs=None)
             return
         param_dict['remark'] = remark
         if param_def_dict is None:
             param_def_dict = auto_detect_def(param_dict)
-        self.method_table = MethodTable(self._db, method_name, param_def_dict)
-        self._method_id = self.method_table.insert(**param_dict)
+        if self._spool is not None:
+            self._spool.write('method', name=method_name, params=param_dict, defs=param_def_dict)
+            self._method_id = None
+            return None
+        def init_method():
+            self.method_table = MethodTable(self._db, method_name, param_def_dict)
+            return self.method_table.insert(**param_dict)
+        self._method_id = self._submit(init_method, wait=True)
         return self._method_id
 
 
@@ -319,8 +514,16 @@ class Experiment:
         # assert " " not in task_name, 'Task name cannot contain space'
         task_name = task_name.replace(' ', '_')
         self._task = task_name
-        if rst_def_dict is not None:
-            self.rst_table = ResultTable(self._db, task_name, rst_def_dict)
+        if self._spool is not None:
+            self._spool.write('task', name=task_name, defs=rst_def_dict)
+            return
+        def init_task():
+            self.stats_table = None
+            if rst_def_dict is not None:
+                self.rst_table = ResultTable(self._db, task_name, rst_def_dict)
+                if self.setting_stats or f"setting_stats_{task_name}" in self._db.table_names:
+                    self.stats_table = SettingStatsTable(self._db, task_name)
+        self._submit(init_task, wait=True)
 
 
 
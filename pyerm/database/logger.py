@@ -0,0 +1,174 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+
+import typing
+from time import time
+import numpy as np
+
+NUMERIC_DEFS = ('INTEGER', 'REAL')
+
+class DetailLogger:
+    """
+    Buffer of the high frequency details of one experiment (e.g. the loss of every training step).
+    The rows are kept in preallocated columnar arrays and handed to `sink` in one batch (written with one `executemany`)
+    every `flush_rows` rows or `flush_interval` seconds, instead of one INSERT and commit per row.
+
+    Parameters
+    ----------
+    detail_def_dict : typing.Dict[str, str]
+        The definition of the detail columns, column name -> SQL type
+    sink : typing.Callable[[typing.List[str], typing.List[tuple]], typing.Any]
+        Called with the column names and the rows of every flush, the last column is `record_time` (the UNIX time)
+    flush_rows : int, optional
+        The number of rows buffered before a flush, by default 1000
+    flush_interval : float, optional
+        The seconds after which the buffered rows are flushed at the next `log()`, None for no time limit, by default 5.0
+    sample_every : int, optional
+        Keep one row every `sample_every` steps, by default 1 (every step)
+    aggregate : bool, optional
+        Instead of keeping the first step of every `sample_every` steps, keep the mean of the numeric columns over the window,
+        with their minimum and maximum in the extra columns `{column}_min` and `{column}_max`. 
+        The other columns and `record_time` take the last value of the window. By default False
+    """
+    def __init__(self, detail_def_dict:typing.Dict[str, str], sink:typing.Callable[[typing.List[str], typing.List[tuple]], typing.Any], 
+                 flush_rows:int=1000, flush_interval:float=5.0, sample_every:int=1, aggregate:bool=False) -> None:
+        assert flush_rows >= 1, 'flush_rows must be positive'
+        assert sample_every >= 1, 'sample_every must be positive'
+        self.detail_def_dict = detail_def_dict
+        self.columns = list(detail_def_dict.keys())
+        self.sink = sink
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.sample_every = sample_every
+        self.aggregate = aggregate and sample_every > 1
+        self.numeric = [detail_def_dict[col].upper().startswith(NUMERIC_DEFS) for col in self.columns]
+        self.text = [detail_def_dict[col].upper().startswith('TEXT') for col in self.columns]
+        # aggregated, every step is buffered and whole windows are reduced when flushing
+        capacity = flush_rows * sample_every if self.aggregate else flush_rows
+        # REAL columns (and the aggregated ones) are float64 arrays, the others keep the Python objects, so integers stay exact
+        self._buffers = [np.empty(capacity, dtype=np.float64 if numeric and (self.aggregate or detail_def_dict[col].upper().startswith('REAL')) else object) 
+                         for col, numeric in zip(self.columns, self.numeric)]
+        self._times = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+        self._step = 0
+        self._last_flush = time()
+        self.rows_written = 0
+
+    @property
+    def table_def_dict(self) -> typing.Dict[str, str]:
+        """
+        The definition of the detail table the rows are written to, including the `_min`/`_max` columns when aggregating
+        """
+        if not self.aggregate:
+            return dict(self.detail_def_dict)
+        table_def_dict = {}
+        for col, numeric in zip(self.columns, self.numeric):
+            table_def_dict[col] = 'REAL' if numeric else self.detail_def_dict[col]
+            if numeric:
+                table_def_dict[f'{col}_min'] = 'REAL'
+                table_def_dict[f'{col}_max'] = 'REAL'
+        return table_def_dict
+
+    def log(self, detail_dict:typing.Dict[str, typing.Any], record_time:float=None) -> None:
+        """
+        Log the details of one step, flushes the buffer when it is full or `flush_interval` has passed
+        """
+        assert len(detail_dict) == len(self.columns), 'Detail definition and detail dict length mismatch'
+        step = self._step
+        self._step += 1
+        if not self.aggregate and step % self.sample_every != 0:
+            return
+        now = time()
+        size = self._size
+        for buffer, col in zip(self._buffers, self.columns):
+            value = detail_dict[col]
+            buffer[size] = np.nan if value is None and buffer.dtype == np.float64 else value
+        self._times[size] = record_time if record_time is not None else now
+        self._size = size + 1
+        if self._size == len(self._times) or (self.flush_interval is not None and now - self._last_flush >= self.flush_interval):
+            self.flush(final=False)
+
+    def flush(self, final:bool=True) -> int:
+        """
+        Hand the buffered rows to the sink
+
+        Parameters
+        ----------
+        final : bool, optional
+            When aggregating, also reduce the last incomplete window, otherwise it stays in the buffer, by default True
+
+        Returns
+        -------
+        int
+            The number of rows handed to the sink
+        """
+        self._last_flush = time()
+        size = self._size
+        if self.aggregate and not final:
+            # the buffer starts at a window, the incomplete last window waits for its remaining steps
+            size = size // self.sample_every * self.sample_every
+        if size == 0:
+            return 0
+        if self.aggregate:
+            columns, values = self._reduce(size)
+            times = self._window_last(self._times[:size])
+        else:
+            columns = self.columns
+            values = [self._text(buffer[:size].tolist()) if text else buffer[:size].tolist() for buffer, text in zip(self._buffers, self.text)]
+            times = self._times[:size]
+        rows = list(zip(*values, times.tolist()))
+        remaining = self._size - size
+        for buffer in (*self._buffers, self._times):
+            buffer[:remaining] = buffer[size:self._size]
+        self._size = remaining
+        self.sink([*columns, 'record_time'], rows)
+        self.rows_written += len(rows)
+        return len(rows)
+
+    @staticmethod
+    def _text(values:list) -> list:
+        # as auto_detect_def does, the other objects of TEXT columns are saved as their str
+        return [v if v is None or isinstance(v, str) else str(v) for v in values]
+
+    def _window_last(self, values:np.ndarray) -> np.ndarray:
+        # the last value of every window, the last window may be incomplete
+        return values[np.minimum(np.arange(self.sample_every - 1, len(values) + self.sample_every - 1, self.sample_every), len(values) - 1)]
+
+    def _reduce(self, size:int) -> typing.Tuple[typing.List[str], typing.List[list]]:
+        window = self.sample_every
+        starts = np.arange(0, size, window)
+        columns, values = [], []
+        for col, numeric, text, buffer in zip(self.columns, self.numeric, self.text, self._buffers):
+            if not numeric:
+                columns.append(col)
+                last = self._window_last(buffer[:size]).tolist()
+                values.append(self._text(last) if text else last)
+                continue
+            data = buffer[:size]
+            counts = np.diff(np.append(starts, size))
+            columns.extend([col, f'{col}_min', f'{col}_max'])
+            values.extend([(np.add.reduceat(data, starts) / counts).tolist(), 
+                           np.minimum.reduceat(data, starts).tolist(), np.maximum.reduceat(data, starts).tolist()])
+        return columns, values
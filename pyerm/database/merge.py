@@ -0,0 +1,692 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+
+import os
+import re
+import sqlite3
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from time import time
+from urllib.request import pathname2url
+
+from .dbbase import Database, Table
+from .tables import ExperimentTable, DataTable, MethodTable, DetailRecordTable, SettingStatsTable, param_hash
+
+SOURCE = 'merge_source'
+# bookkeeping of the database itself, not merged
+SKIPPED_TABLES = ('spool_segments', 'spool_experiments', 'merge_sources', 'merge_watermarks', 'merge_experiment_ids')
+SETTING_TABLES = {'method': MethodTable, 'data': DataTable}
+# the temporary tables mapping the IDs of a source to the destination
+MAPPING_TABLES = ('merge_settings', 'merge_experiments', 'merge_changed')
+
+def _columns(db:Database, schema:str, table_name:str) -> typing.Dict[str, str]:
+    # the stored columns (not the generated ones) and their declared types
+    return {column[1]: column[2] for column in db.cursor.execute(f"PRAGMA {schema}.table_xinfo({table_name})").fetchall() if column[6] == 0}
+
+def _source_tables(db:Database, schema:str) -> typing.List[str]:
+    return [row[0] for row in db.cursor.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite%'")]
+
+def _create_like(db:Database, schema:str, table_name:str, new_name:str=None) -> None:
+    # a table missing in the destination is created with the definition of the source
+    sql = db.cursor.execute(f"SELECT sql FROM {schema}.sqlite_master WHERE type='table' AND name=?", (table_name,)).fetchone()[0]
+    if new_name is not None:
+        sql = re.sub(rf'^CREATE TABLE\s+("?){table_name}\1', f'CREATE TABLE {new_name}', sql)
+    db.write(sql)
+
+def _add_missing_columns(db:Database, table_name:str, source_columns:typing.Dict[str, str]) -> None:
+    # the columns of the source missing in the destination, e.g. parameters or scores recorded only in the source
+    columns = _columns(db, 'main', table_name)
+    for column, column_type in source_columns.items():
+        if column not in columns:
+            db.write(f"ALTER TABLE {table_name} ADD COLUMN {column} {column_type} DEFAULT NULL")
+
+def _setting_kind(table_name:str) -> typing.Optional[str]:
+    for kind in SETTING_TABLES:
+        if table_name.startswith(f'{kind}_'):
+            return kind
+    return None
+
+def hash_settings(cursor:sqlite3.Cursor, schema:str, table_name:str, column_types:typing.Dict[str, str]) -> typing.List[typing.Tuple[int, str]]:
+    """
+    The `(setting_id, param_hash)` of the settings of the table `table_name` of `schema`, 
+    hashed in Python with the column types of the destination, the source may be of a former version or its types differ
+    """
+    id_column = f'{_setting_kind(table_name)}_id'
+    param_columns = [column[1] for column in cursor.execute(f"PRAGMA {schema}.table_xinfo({table_name})").fetchall() 
+                     if column[6] == 0 and column[1] not in (id_column, 'remark', 'param_hash')]
+    rows = cursor.execute(f"SELECT {', '.join([id_column, *param_columns])} FROM {schema}.{table_name}").fetchall()
+    return [(row[0], param_hash(dict(zip(param_columns, row[1:])), column_types)) for row in rows]
+
+def next_experiment_base(db:Database) -> int:
+    """
+    The largest experiment ID ever used in the destination, the merged experiments are numbered after it
+    """
+    return db.cursor.execute("SELECT MAX(COALESCE((SELECT MAX(id) FROM main.experiment_list), 0), COALESCE((SELECT seq FROM main.sqlite_sequence WHERE name='experiment_list'), 0))").fetchone()[0]
+
+def drop_mapping_tables(db:Database) -> None:
+    for table in MAPPING_TABLES:
+        db.conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+
+class DatabaseMerger:
+    """
+    Set-based merge of a source database into a destination database, in one transaction of the destination: 
+    the source is attached and every table is copied with one `INSERT ... SELECT`, 
+    joined with temporary tables mapping the IDs of the source to the IDs in the destination.
+
+    - method_{name} / data_{name}: a setting already in the destination (same `param_hash`) is reused, the others are added
+    - experiment_list: every experiment is added with a new ID, its `method_id` and `data_id` mapped
+    - result_{task}, detail_records, detail_{experiment_id} of former versions: added with the new experiment IDs
+    - setting_stats_{task}: rebuilt from the merged results
+    - any other table: its rows are added except the ones conflicting with a UNIQUE constraint
+
+    A remark of the source already used in the destination is dropped, the remarks are unique.
+
+    A source merged with a `source_key` (the absolute path of the file for `merge()`) is merged incrementally the next times: 
+    the high-water marks of its tables (the last experiment ID, detail record ID and row ID of the other tables merged) 
+    and the IDs given to its experiments are recorded in the destination, only the rows after the marks are copied 
+    and the experiments still running in the destination are updated from the source, with their results.
+
+    Parameters
+    ----------
+    db : Database
+        The destination database
+    source : str, optional
+        The schema name the source is attached as, by default 'merge_source'
+    """
+    def __init__(self, db:Database, source:str=SOURCE) -> None:
+        self.db = db
+        self.source = source
+        # task -> whether a source had its statistics table, the statistics to rebuild
+        self.stats_tasks = {}
+
+    def merge(self, source_path:str) -> typing.Dict[str, int]:
+        """
+        Merge the database file `source_path` into the destination
+
+        Returns
+        -------
+        typing.Dict[str, int]
+            The number of rows added to each table of the destination
+        """
+        db = self.db
+        source_key = os.path.abspath(source_path)
+        # taken before reading, a source written meanwhile is different the next time
+        fingerprint = source_fingerprint(source_path)
+        db.conn.execute(f"ATTACH DATABASE ? AS {self.source}", (source_path,))
+        try:
+            with db.transaction():
+                counts = self.merge_attached(source_key=source_key)
+                stat = os.stat(source_path)
+                MergeSourceTable(db).add(source_key, fingerprint, stat.st_size, stat.st_mtime, counts.get('experiment_list', 0), sum(counts.values()))
+        finally:
+            drop_mapping_tables(db)
+            db.conn.execute(f"DETACH DATABASE {self.source}")
+        return counts
+
+    def merge_attached(self, setting_hashes:typing.Dict[str, typing.List[typing.Tuple[int, str]]]=None, base:int=None, 
+                       rebuild_stats:bool=True, source_key:str=None) -> typing.Dict[str, int]:
+        """
+        Merge the source already attached as `source`, in the transaction of the caller
+
+        Parameters
+        ----------
+        setting_hashes : typing.Dict[str, typing.List[typing.Tuple[int, str]]], optional
+            The `(setting_id, param_hash)` of the setting tables of the source computed beforehand, 
+            by default None to compute them here
+        base : int, optional
+            The experiments of the source get the IDs `base + 1, base + 2, ...` in the order of their IDs, 
+            by default None to follow the IDs ever used in the destination
+        rebuild_stats : bool, optional
+            Rebuild the statistics of the merged tasks, by default True. 
+            With False they are rebuilt by the next `rebuild_stats()`, once for all the sources of a transaction
+        source_key : str, optional
+            The key of the high-water marks of the source to merge it incrementally, by default None to merge all its rows
+
+        Returns
+        -------
+        typing.Dict[str, int]
+            The number of rows added to each table of the destination
+        """
+        db = self.db
+        source_tables = _source_tables(db, self.source)
+        setting_hashes = setting_hashes or {}
+        counts = {}
+        handled = set(SKIPPED_TABLES)
+        self.source_key = source_key
+        self.watermarks = MergeWatermarkTable(db).get(source_key) if source_key is not None else {}
+        self.new_watermarks = {}
+        db.write("CREATE TEMP TABLE IF NOT EXISTS merge_settings (kind TEXT, name TEXT, old_id INTEGER, param_hash TEXT, new_id INTEGER, PRIMARY KEY (kind, name, old_id))")
+        db.write("CREATE TEMP TABLE IF NOT EXISTS merge_experiments (old_id INTEGER PRIMARY KEY, new_id INTEGER)")
+        # the experiments merged before and running then, updated from the source
+        db.write("CREATE TEMP TABLE IF NOT EXISTS merge_changed (old_id INTEGER PRIMARY KEY)")
+        # left by the previous source of the same transaction
+        for table in MAPPING_TABLES:
+            db.write(f"DELETE FROM temp.{table}")
+        # the settings first, then the experiments mapped to them, then the rest mapped to the experiments
+        for table_name in source_tables:
+            kind = _setting_kind(table_name)
+            if kind is not None:
+                counts[table_name] = self._merge_settings(kind, table_name, setting_hashes.get(table_name))
+                handled.add(table_name)
+        if 'experiment_list' in source_tables:
+            counts['experiment_list'] = self._merge_experiments(base)
+            handled.add('experiment_list')
+        tasks = set()
+        for table_name in source_tables:
+            if table_name in handled or table_name.startswith('setting_stats_'):
+                continue
+            if table_name.startswith('result_'):
+                tasks.add(table_name[len('result_'):])
+                counts[table_name] = self._merge_results(table_name)
+            elif table_name == 'detail_records':
+                counts[table_name] = self._merge_detail_records()
+            elif re.fullmatch(r'detail_\d+', table_name):
+                counts.update(self._merge_detail_table(table_name))
+            else:
+                counts[table_name] = self._merge_other(table_name)
+        for task in tasks:
+            self.stats_tasks[task] = self.stats_tasks.get(task, False) or f'setting_stats_{task}' in source_tables
+        if source_key is not None:
+            MergeWatermarkTable(db).set(source_key, self.new_watermarks)
+        if rebuild_stats:
+            self.rebuild_stats()
+        return counts
+
+    def rebuild_stats(self) -> None:
+        """
+        Rebuild the statistics of the tasks merged since the last call, 
+        the statistics are sums over the results, rebuilt instead of merged
+        """
+        db = self.db
+        for task, source_stats in self.stats_tasks.items():
+            if f'setting_stats_{task}' in db.table_names:
+                SettingStatsTable(db, task).rebuild()
+            elif source_stats:
+                SettingStatsTable(db, task)
+        self.stats_tasks = {}
+
+    def _merge_settings(self, kind:str, table_name:str, hashes:typing.List[typing.Tuple[int, str]]=None) -> int:
+        db = self.db
+        id_column = f'{kind}_id'
+        name = table_name[len(kind) + 1:]
+        source_columns = _columns(db, self.source, table_name)
+        if table_name not in db.table_names:
+            _create_like(db, self.source, table_name)
+        _add_missing_columns(db, table_name, source_columns)
+        table = SETTING_TABLES[kind](db, name)
+        if 'param_hash' not in table.columns:
+            # a destination of a former version
+            table.create_indexes()
+        param_columns = [column for column in source_columns if column not in (id_column, 'remark', 'param_hash')]
+        if hashes is None:
+            hashes = hash_settings(db.cursor, self.source, table_name, dict(zip(table.columns, table.column_types)))
+        db.write("INSERT INTO temp.merge_settings (kind, name, old_id, param_hash) VALUES (?, ?, ?, ?)", 
+                 [(kind, name, old_id, hash_value) for old_id, hash_value in hashes], many=True)
+        # the new settings, the first one of the duplicates of the source, with the remarks still free
+        columns = ', '.join(param_columns)
+        source_columns_str = ', '.join([f's.{column}' for column in param_columns])
+        added = db.write(f"""INSERT INTO {table_name} ({columns}{', ' if columns else ''}remark, param_hash)
+            SELECT {source_columns_str}{', ' if columns else ''}CASE WHEN s.remark IN (SELECT remark FROM main.{table_name} WHERE remark IS NOT NULL) THEN NULL ELSE s.remark END, m.param_hash
+            FROM {self.source}.{table_name} AS s INNER JOIN temp.merge_settings AS m ON m.kind=? AND m.name=? AND m.old_id=s.{id_column}
+            WHERE m.param_hash NOT IN (SELECT param_hash FROM main.{table_name} WHERE param_hash IS NOT NULL)
+            AND s.{id_column} = (SELECT MIN(m2.old_id) FROM temp.merge_settings AS m2 WHERE m2.kind=m.kind AND m2.name=m.name AND m2.param_hash=m.param_hash)
+            ORDER BY s.{id_column}""", (kind, name)).rowcount
+        db.write(f"""UPDATE temp.merge_settings SET new_id=(SELECT t.{id_column} FROM main.{table_name} AS t WHERE t.param_hash=merge_settings.param_hash)
+            WHERE kind=? AND name=?""", (kind, name))
+        return added
+
+    def _merge_experiments(self, base:int=None) -> int:
+        db = self.db
+        experiment_table = ExperimentTable(db)
+        source_columns = _columns(db, self.source, 'experiment_list')
+        columns = [column for column in _columns(db, 'main', 'experiment_list') if column in source_columns and column not in ('id', 'remark', 'method_id', 'data_id')]
+        last_id = self.watermarks.get('experiment_list', 0)
+        max_id = db.cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.source}.experiment_list").fetchone()[0]
+        if max_id < last_id:
+            raise ValueError(f"The last experiment of the source {self.source_key} is {max_id} but {last_id} was merged before, the source was recreated since")
+        if self.source_key is not None:
+            # only the experiments of the source running in the destination, not all the ones merged before
+            id_table = MergeExperimentIdTable(db)
+            db.write(f"""INSERT INTO temp.merge_experiments (old_id, new_id) SELECT i.old_id, i.new_id FROM main.experiment_list AS e 
+                INNER JOIN main.{id_table.table_name} AS i ON i.new_id = e.id AND i.source = ? WHERE e.status='running'""", (self.source_key,))
+            db.write("INSERT INTO temp.merge_changed (old_id) SELECT old_id FROM temp.merge_experiments")
+        # new IDs after the ones ever used in the destination, in the order of the source
+        if base is None:
+            base = next_experiment_base(db)
+        db.write(f"INSERT INTO temp.merge_experiments (old_id, new_id) SELECT id, ? + ROW_NUMBER() OVER (ORDER BY id) FROM {self.source}.experiment_list WHERE id > ?", (base, last_id))
+        added = db.write(f"""INSERT INTO {experiment_table.table_name} (id, remark, method_id, data_id, {', '.join(columns)})
+            SELECT m.new_id, CASE WHEN e.remark IN (SELECT remark FROM main.experiment_list WHERE remark IS NOT NULL) THEN NULL ELSE e.remark END,
+                COALESCE(mm.new_id, e.method_id), COALESCE(dm.new_id, e.data_id), {', '.join([f'e.{column}' for column in columns])}
+            FROM {self.source}.experiment_list AS e INNER JOIN temp.merge_experiments AS m ON m.old_id = e.id
+            LEFT JOIN temp.merge_settings AS mm ON mm.kind='method' AND mm.name=e.method AND mm.old_id=e.method_id
+            LEFT JOIN temp.merge_settings AS dm ON dm.kind='data' AND dm.name=e.data AND dm.old_id=e.data_id
+            WHERE e.id > ?
+            ORDER BY e.id""", (last_id,)).rowcount
+        if self.source_key is not None:
+            # the status, end time, heartbeat... of the experiments running at the last merge
+            db.write(f"""UPDATE {experiment_table.table_name} SET ({', '.join(columns)}) = 
+                (SELECT {', '.join([f'e.{column}' for column in columns])} FROM {self.source}.experiment_list AS e 
+                 INNER JOIN temp.merge_experiments AS m ON m.old_id = e.id WHERE m.new_id = {experiment_table.table_name}.id)
+                WHERE id IN (SELECT m.new_id FROM temp.merge_changed AS c INNER JOIN temp.merge_experiments AS m ON m.old_id = c.old_id
+                    INNER JOIN {self.source}.experiment_list AS e ON e.id = c.old_id)""")
+            db.write(f"INSERT INTO main.{id_table.table_name} (source, old_id, new_id) SELECT ?, old_id, new_id FROM temp.merge_experiments WHERE old_id > ?", 
+                     (self.source_key, last_id))
+        self.new_watermarks['experiment_list'] = max_id
+        return added
+
+    def _merge_results(self, table_name:str) -> int:
+        db = self.db
+        source_columns = _columns(db, self.source, table_name)
+        if table_name not in db.table_names:
+            _create_like(db, self.source, table_name)
+        _add_missing_columns(db, table_name, source_columns)
+        columns = [column for column in source_columns if column != 'experiment_id']
+        # the results of the new experiments and the ones of the experiments running at the last merge, recorded since
+        return db.write(f"""INSERT OR REPLACE INTO {table_name} (experiment_id{''.join([f', {column}' for column in columns])})
+            SELECT m.new_id{''.join([f', r.{column}' for column in columns])}
+            FROM {self.source}.{table_name} AS r INNER JOIN temp.merge_experiments AS m ON m.old_id = r.experiment_id
+            WHERE r.experiment_id > ? OR r.experiment_id IN (SELECT old_id FROM temp.merge_changed)
+            ORDER BY r.experiment_id""", (self.watermarks.get('experiment_list', 0),)).rowcount
+
+    def _merge_detail_records(self) -> int:
+        db = self.db
+        detail_table = DetailRecordTable(db)
+        self.new_watermarks['detail_records'] = db.cursor.execute(f"SELECT COALESCE(MAX(record_id), 0) FROM {self.source}.detail_records").fetchone()[0]
+        if self.source_key is not None:
+            # the experiments merged before and not running in the destination anymore, e.g. marked failed by its heartbeat
+            db.write(f"""INSERT OR IGNORE INTO temp.merge_experiments (old_id, new_id) SELECT i.old_id, i.new_id FROM main.{MergeExperimentIdTable(db).table_name} AS i
+                WHERE i.source = ? AND i.old_id IN (SELECT DISTINCT experiment_id FROM {self.source}.detail_records WHERE record_id > ?)""", 
+                (self.source_key, self.watermarks.get('detail_records', 0)))
+        return db.write(f"""INSERT INTO {detail_table.table_name} (experiment_id, step, key, value, record_time)
+            SELECT m.new_id, d.step, d.key, d.value, d.record_time
+            FROM {self.source}.detail_records AS d INNER JOIN temp.merge_experiments AS m ON m.old_id = d.experiment_id
+            WHERE d.record_id > ? AND d.record_id <= ?
+            ORDER BY d.record_id""", (self.watermarks.get('detail_records', 0), self.new_watermarks['detail_records'])).rowcount
+
+    def _merge_detail_table(self, table_name:str) -> typing.Dict[str, int]:
+        db = self.db
+        old_id = int(table_name[len('detail_'):])
+        row = db.cursor.execute("SELECT new_id FROM temp.merge_experiments WHERE old_id=?", (old_id,)).fetchone()
+        # the tables of former versions are not written anymore, merged once with their experiment
+        if row is None or old_id <= self.watermarks.get('experiment_list', 0):
+            return {}
+        new_name = f'detail_{row[0]}'
+        _create_like(db, self.source, table_name, new_name)
+        return {new_name: db.write(f"INSERT INTO {new_name} SELECT * FROM {self.source}.{table_name}").rowcount}
+
+    def _merge_other(self, table_name:str) -> int:
+        db = self.db
+        source_columns = _columns(db, self.source, table_name)
+        if table_name not in db.table_names:
+            _create_like(db, self.source, table_name)
+        _add_missing_columns(db, table_name, source_columns)
+        # an INTEGER PRIMARY KEY is the row ID, assigned again
+        primary_key = [(column[1], column[2]) for column in db.cursor.execute(f"PRAGMA {self.source}.table_info({table_name})").fetchall() if column[5] > 0]
+        row_id = primary_key[0][0] if len(primary_key) == 1 and primary_key[0][1].upper() == 'INTEGER' else None
+        columns = [column for column in source_columns if column != row_id]
+        columns_str = ', '.join(columns)
+        sql = db.cursor.execute(f"SELECT sql FROM {self.source}.sqlite_master WHERE type='table' AND name=?", (table_name,)).fetchone()[0]
+        if re.search(r'WITHOUT\s+ROWID', sql, re.IGNORECASE):
+            return db.write(f"INSERT OR IGNORE INTO {table_name} ({columns_str}) SELECT {columns_str} FROM {self.source}.{table_name}").rowcount
+        # the rows added since the last merge, the row IDs grow
+        self.new_watermarks[table_name] = db.cursor.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {self.source}.{table_name}").fetchone()[0]
+        return db.write(f"INSERT OR IGNORE INTO {table_name} ({columns_str}) SELECT {columns_str} FROM {self.source}.{table_name} WHERE rowid > ? AND rowid <= ? ORDER BY rowid", 
+                        (self.watermarks.get(table_name, 0), self.new_watermarks[table_name])).rowcount
+
+
+def merge_database(db:Database, source_path:str) -> typing.Dict[str, int]:
+    """
+    Merge the database file `source_path` into `db` in one transaction, see `DatabaseMerger`
+
+    Returns
+    -------
+    typing.Dict[str, int]
+        The number of rows added to each table of `db`
+    """
+    return DatabaseMerger(db).merge(source_path)
+
+
+class MergeSourceTable(Table):
+    """
+    The source databases merged, their file fingerprint at the last merge and the rows merged from them in total. 
+    Written in the transaction merging them, the checkpoint `ParallelMerger` resumes an interrupted merge from
+    """
+    def __init__(self, db:Database) -> None:
+        columns = {
+            'source': 'TEXT PRIMARY KEY',
+            'fingerprint': 'TEXT',
+            'size': 'INTEGER',
+            'mtime': 'REAL',
+            'experiments': 'INTEGER NOT NULL',
+            'merge_rows': 'INTEGER NOT NULL',
+            'merge_time': 'REAL',
+        }
+        super().__init__(db, 'merge_sources', columns)
+
+    def fingerprints(self) -> typing.Dict[str, str]:
+        return dict(self.db.cursor.execute(f"SELECT source, fingerprint FROM {self.table_name}").fetchall())
+
+    def add(self, source:str, fingerprint:str, size:int, mtime:float, experiments:int, merge_rows:int) -> None:
+        self.db.write(f"""INSERT INTO {self.table_name} (source, fingerprint, size, mtime, experiments, merge_rows, merge_time) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(source) DO UPDATE SET fingerprint=excluded.fingerprint, size=excluded.size, mtime=excluded.mtime, 
+            experiments=experiments + excluded.experiments, merge_rows=merge_rows + excluded.merge_rows, merge_time=excluded.merge_time""", 
+                      (source, fingerprint, size, mtime, experiments, merge_rows, time()))
+
+
+class MergeWatermarkTable(Table):
+    """
+    The high-water marks of the tables of the source databases merged: the last experiment ID, detail record ID 
+    or row ID merged, the rows after it are the ones to merge the next time
+    """
+    def __init__(self, db:Database) -> None:
+        columns = {
+            'watermark_id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+            'source': 'TEXT NOT NULL',
+            'table_name': 'TEXT NOT NULL',
+            'last_rowid': 'INTEGER NOT NULL',
+        }
+        super().__init__(db, 'merge_watermarks', columns)
+        self.create_index('index_merge_watermarks_source', ['source', 'table_name'], unique=True)
+
+    def get(self, source:str) -> typing.Dict[str, int]:
+        return dict(self.db.cursor.execute(f"SELECT table_name, last_rowid FROM {self.table_name} WHERE source=?", (source,)).fetchall())
+
+    def set(self, source:str, watermarks:typing.Dict[str, int]) -> None:
+        self.db.write(f"""INSERT INTO {self.table_name} (source, table_name, last_rowid) VALUES (?, ?, ?)
+            ON CONFLICT(source, table_name) DO UPDATE SET last_rowid=excluded.last_rowid""", 
+                      [(source, table_name, last_rowid) for table_name, last_rowid in watermarks.items()], many=True)
+
+
+class MergeExperimentIdTable(Table):
+    """
+    The IDs given in the destination to the experiments of the source databases merged, 
+    for their changes and details merged after them
+    """
+    def __init__(self, db:Database) -> None:
+        columns = {
+            'map_id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+            'source': 'TEXT NOT NULL',
+            'old_id': 'INTEGER NOT NULL',
+            'new_id': 'INTEGER NOT NULL',
+        }
+        super().__init__(db, 'merge_experiment_ids', columns)
+        self.create_index('index_merge_experiment_ids_source', ['source', 'old_id'], unique=True)
+        self.create_index('index_merge_experiment_ids_new_id', ['new_id'])
+
+
+def source_fingerprint(path:str) -> str:
+    """
+    The fingerprint of the database file `path` and its write-ahead log: their sizes, modification times 
+    and the file change counter of the header, different once the source is written. 
+    `PRAGMA data_version` only tells the changes seen by one connection, it is not kept between merges
+    """
+    parts = []
+    for file_path in (path, f'{path}-wal'):
+        # an empty log is left or removed by the readers, it holds no change
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            stat = os.stat(file_path)
+            parts.append(f'{stat.st_size}:{stat.st_mtime_ns}')
+    with open(path, 'rb') as f:
+        parts.append(f.read(100)[24:28].hex())
+    return '/'.join(parts)
+
+def _connect_read_only(path:str) -> sqlite3.Connection:
+    if not os.path.isfile(path):
+        raise sqlite3.DatabaseError('no such file')
+    return sqlite3.connect(f'file:{pathname2url(path)}?mode=ro', uri=True)
+
+def inspect_source(path:str) -> dict:
+    """
+    Validate the source database `path` and read its schema and its experiments, in a worker process of `ParallelMerger`
+
+    Returns
+    -------
+    dict
+        'path', 'fingerprint', 'size', 'mtime', 'error' (None if valid), 'tables' (name -> (sql, {column: type})), 
+        'experiments', 'min_id' and 'max_id' of its experiments
+    """
+    info = {'path': path, 'fingerprint': None, 'size': None, 'mtime': None, 'error': None, 'tables': {}, 'experiments': 0, 'min_id': None, 'max_id': None}
+    try:
+        conn = _connect_read_only(path)
+        try:
+            # taken before reading, a source written meanwhile is different the next time
+            info['fingerprint'] = source_fingerprint(path)
+            stat = os.stat(path)
+            info['size'], info['mtime'] = stat.st_size, stat.st_mtime
+            for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite%'").fetchall():
+                columns = {column[1]: column[2] for column in conn.execute(f"PRAGMA table_xinfo({name})").fetchall() if column[6] == 0}
+                info['tables'][name] = (sql, columns)
+            if 'experiment_list' not in info['tables']:
+                info['error'] = 'no table experiment_list, not a pyerm database'
+            else:
+                info['experiments'], info['min_id'], info['max_id'] = conn.execute("SELECT COUNT(*), MIN(id), MAX(id) FROM experiment_list").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        info['error'] = str(e)
+    return info
+
+def hash_source(path:str, column_types:typing.Dict[str, typing.Dict[str, str]]) -> typing.Dict[str, typing.List[typing.Tuple[int, str]]]:
+    """
+    The `(setting_id, param_hash)` of the setting tables of the source database `path`, 
+    with the column types of the destination `column_types` (table name -> column -> type), in a worker process of `ParallelMerger`
+    """
+    conn = _connect_read_only(path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()}
+        cursor = conn.cursor()
+        return {table_name: hash_settings(cursor, 'main', table_name, types) for table_name, types in column_types.items() if table_name in tables}
+    finally:
+        conn.close()
+
+
+class ParallelMerger:
+    """
+    Merge many source databases, e.g. the databases of the nodes of a sweep, into a destination database.
+
+    1. The sources are validated and their schemas and experiments read in a process pool (`inspect_source()`).
+    2. The schemas are reconciled in the destination in one transaction: the missing tables and columns are created, 
+       a column declared with another type in a source is kept as in the destination and reported in `conflicts`.
+    3. The `param_hash` of the settings of the sources are computed in the process pool (`hash_source()`).
+    4. The sources are merged by the single writer in batches, the sources of a batch attached together 
+       and merged in one transaction with `DatabaseMerger`, their experiments numbered in consecutive ID ranges. 
+       Every source merged is recorded in the table `merge_sources` with its high-water marks in the same transaction, 
+       so an interrupted merge resumes after the last batch committed.
+
+    A source merged before is skipped when its file fingerprint did not change and merged incrementally otherwise, 
+    only its rows after the high-water marks, see `DatabaseMerger`.
+
+    Parameters
+    ----------
+    db : Database
+        The destination database
+    workers : int, optional
+        The number of worker processes, by default None for the number of CPUs. With 1 it all runs in this process
+    batch_size : int, optional
+        The bytes of source files merged in one transaction at most, by default 1 GiB. 
+        The number of sources of a batch is also limited by the databases SQLite can attach
+    progress : typing.Callable[[int, int, str, typing.Dict[str, int]], None], optional
+        Called with (sources done, sources to merge, source path, rows added to each table) after every batch, by default None
+    """
+    def __init__(self, db:Database, workers:int=None, batch_size:int=2 ** 30, 
+                 progress:typing.Callable[[int, int, str, typing.Dict[str, int]], None]=None) -> None:
+        self.db = db
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.batch_size = batch_size
+        self.progress = progress
+        self.conflicts = []
+        self.invalid = {}
+        self.skipped = []
+
+    def merge(self, source_paths:typing.Iterable[str], skip_invalid:bool=False) -> typing.Dict[str, typing.Dict[str, int]]:
+        """
+        Merge the database files `source_paths` into the destination
+
+        Parameters
+        ----------
+        source_paths : typing.Iterable[str]
+            The source database files, the ones merged before and unchanged since are skipped (in `skipped`)
+        skip_invalid : bool, optional
+            Merge the valid sources when some are invalid (in `invalid`, path -> error), by default False to raise a ValueError before any write
+
+        Returns
+        -------
+        typing.Dict[str, typing.Dict[str, int]]
+            The number of rows added to each table of the destination by each source merged
+        """
+        db = self.db
+        ExperimentTable(db)
+        fingerprints = MergeSourceTable(db).fingerprints()
+        watermark_table = MergeWatermarkTable(db)
+        paths = []
+        for path in dict.fromkeys(os.path.abspath(path) for path in source_paths):
+            if path in fingerprints and os.path.isfile(path) and source_fingerprint(path) == fingerprints[path]:
+                self.skipped.append(path)
+            elif os.path.exists(path) and os.path.samefile(path, db.db_path):
+                self.invalid[path] = 'the destination database'
+            else:
+                paths.append(path)
+        with self._executor(len(paths)) as executor:
+            infos = [info for info in executor.map(inspect_source, paths)]
+            for info in infos:
+                if info['error'] is None and (info['max_id'] or 0) < watermark_table.get(info['path']).get('experiment_list', 0):
+                    info['error'] = 'fewer experiments than merged before, the source was recreated since'
+                if info['error'] is not None:
+                    self.invalid[info['path']] = info['error']
+            if self.invalid and not skip_invalid:
+                raise ValueError('Invalid source databases, nothing merged:\n' + '\n'.join([f'{path}: {error}' for path, error in self.invalid.items()]))
+            infos = [info for info in infos if info['error'] is None]
+            column_types = db.run_transaction(self._reconcile, infos)
+            hashes = executor.map(partial(hash_source, column_types=column_types), [info['path'] for info in infos])
+            return self._apply(infos, hashes)
+
+    def _executor(self, tasks:int):
+        if min(self.workers, tasks) > 1:
+            return ProcessPoolExecutor(max_workers=min(self.workers, tasks))
+        return _InlineExecutor()
+
+    def _reconcile(self, infos:typing.List[dict]) -> typing.Dict[str, typing.Dict[str, str]]:
+        # the tables and columns of all the sources created beforehand, the batches then only add rows
+        db = self.db
+        for info in infos:
+            for table_name, (sql, source_columns) in info['tables'].items():
+                if table_name in SKIPPED_TABLES or table_name.startswith('setting_stats_') or re.fullmatch(r'detail_\d+', table_name):
+                    continue
+                if table_name not in db.table_names:
+                    db.write(sql)
+                    continue
+                columns = _columns(db, 'main', table_name)
+                for column, column_type in source_columns.items():
+                    if column not in columns:
+                        db.write(f"ALTER TABLE {table_name} ADD COLUMN {column} {column_type} DEFAULT NULL")
+                        columns[column] = column_type
+                    elif column_type.upper() != columns[column].upper():
+                        self.conflicts.append((info['path'], table_name, column, columns[column], column_type))
+        # the types the settings are hashed with
+        column_types = {}
+        for table_name in db.table_names:
+            kind = _setting_kind(table_name)
+            if kind is not None:
+                table = SETTING_TABLES[kind](db, table_name[len(kind) + 1:])
+                if 'param_hash' not in table.columns:
+                    table.create_indexes()
+                column_types[table_name] = dict(zip(table.columns, table.column_types))
+        return column_types
+
+    def _batches(self, infos:typing.List[dict]) -> typing.Iterator[typing.List[int]]:
+        limit = self.db.conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(self.db.conn, 'getlimit') else 10
+        batch, size = [], 0
+        for i, info in enumerate(infos):
+            if batch and (size + info['size'] > self.batch_size or len(batch) == limit):
+                yield batch
+                batch, size = [], 0
+            batch.append(i)
+            size += info['size']
+        if batch:
+            yield batch
+
+    def _apply(self, infos:typing.List[dict], hashes:typing.Iterator[typing.Dict[str, typing.List[typing.Tuple[int, str]]]]) -> typing.Dict[str, typing.Dict[str, int]]:
+        db = self.db
+        checkpoint = MergeSourceTable(db)
+        results = {}
+        done = 0
+        for batch in self._batches(infos):
+            # hashed in the pool while the previous batch was written
+            batch_hashes = [next(hashes) for _ in batch]
+            schemas = [f'{SOURCE}_{k}' for k in range(len(batch))]
+            # ATTACH is not allowed in a transaction
+            for schema, i in zip(schemas, batch):
+                db.conn.execute(f"ATTACH DATABASE ? AS {schema}", (infos[i]['path'],))
+            try:
+                with db.transaction():
+                    batch_results = {}
+                    base = next_experiment_base(db)
+                    merger = DatabaseMerger(db)
+                    for schema, i, setting_hashes in zip(schemas, batch, batch_hashes):
+                        info = infos[i]
+                        merger.source = schema
+                        counts = merger.merge_attached(setting_hashes, base, rebuild_stats=False, source_key=info['path'])
+                        experiments = counts.get('experiment_list', 0)
+                        checkpoint.add(info['path'], info['fingerprint'], info['size'], info['mtime'], experiments, sum(counts.values()))
+                        base += experiments
+                        batch_results[info['path']] = counts
+                    # once for the batch
+                    merger.rebuild_stats()
+            finally:
+                drop_mapping_tables(db)
+                for schema in schemas:
+                    db.conn.execute(f"DETACH DATABASE {schema}")
+            for path, counts in batch_results.items():
+                done += 1
+                results[path] = counts
+                if self.progress is not None:
+                    self.progress(done, len(infos), path, counts)
+        return results
+
+
+class _InlineExecutor:
+    # the executor of a single worker, without starting a process
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+def merge_databases(db:Database, source_paths:typing.Iterable[str], workers:int=None, batch_size:int=2 ** 30, skip_invalid:bool=False,
+                    progress:typing.Callable[[int, int, str, typing.Dict[str, int]], None]=None) -> typing.Dict[str, typing.Dict[str, int]]:
+    """
+    Merge many source databases into `db`, prepared in a process pool and written in batches resumable after an interruption, 
+    see `ParallelMerger`
+
+    Returns
+    -------
+    typing.Dict[str, typing.Dict[str, int]]
+        The number of rows added to each table of `db` by each source merged
+    """
+    return ParallelMerger(db, workers, batch_size, progress).merge(source_paths, skip_invalid)
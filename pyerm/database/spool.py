@@ -0,0 +1,311 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+
+import base64
+import json
+import os
+import socket
+import typing
+from time import time
+from uuid import uuid4
+
+from .dbbase import Database, Table
+from .tables import ExperimentTable, DataTable, MethodTable, ResultTable, DetailRecordTable, SettingStatsTable
+from .utils import auto_detect_def
+
+SPOOL_SUFFIX = '.jsonl'
+
+def _encode(value):
+    # numpy scalars and bytes of the results, details and images
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Unsupported spool value type: {type(value)}")
+
+def _decode(obj:dict):
+    if len(obj) == 1 and '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    return obj
+
+class SpoolWriter:
+    """
+    Append-only spool of the events of one experiment process, written instead of the database where SQLite locking is unsafe 
+    or slow (e.g. a database on NFS), and loaded into the database later with `ingest_spools()` (the `pyerm_ingest` command).
+    Each writer owns one segment file `{time}_{host}_{pid}_{random}.jsonl` in `spool_dir`, one JSON event per line,
+    every line is handed to the OS once written so the events survive a crash of the process.
+    The experiment IDs of the events are local to the segment, the database IDs are assigned when ingested.
+
+    Parameters
+    ----------
+    spool_dir : str
+        The directory of the segment files, a local disk of the node is best
+    fsync : bool, optional
+        Also force every event to the disk, survives a crash of the node but costs one disk sync per event, by default False
+    """
+    def __init__(self, spool_dir:str, fsync:bool=False) -> None:
+        os.makedirs(spool_dir, exist_ok=True)
+        name = f"{int(time() * 1000):013d}_{socket.gethostname()}_{os.getpid()}_{uuid4().hex[:8]}"
+        self.path = os.path.join(spool_dir, name + SPOOL_SUFFIX)
+        self.fsync = fsync
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._next_id = 0
+
+    def write(self, event:str, **fields) -> None:
+        """
+        Append one event, see `SpoolIngest` for the events and their fields
+        """
+        self._file.write(json.dumps({'e': event, **fields}, default=_encode, ensure_ascii=False) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def start(self, **fields) -> int:
+        """
+        Append the start event of a new experiment and return its segment local ID
+        """
+        self._next_id += 1
+        self.write('start', id=self._next_id, **fields)
+        return self._next_id
+
+    def details(self, experiment_id:int, columns:typing.List[str], rows:typing.List[tuple]) -> None:
+        self.write('details', id=experiment_id, columns=columns, rows=rows)
+
+    def close(self) -> None:
+        """
+        Append the close event, a closed segment ingested to its end may be removed by `pyerm_ingest --remove`
+        """
+        if not self._file.closed:
+            self.write('close')
+            self._file.close()
+
+
+def read_segment(path:str, offset:int=0) -> typing.Tuple[typing.List[dict], int]:
+    """
+    The complete events of a segment file from the byte `offset` on, a last line still being written is left for later
+
+    Returns
+    -------
+    typing.Tuple[typing.List[dict], int]
+        The events and the byte offset after the last complete one
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    events = [json.loads(line, object_hook=_decode) for line in data[:end].splitlines() if line.strip()]
+    return events, offset + end
+
+def find_segments(paths:typing.Iterable[str]) -> typing.List[str]:
+    """
+    The segment files of the given files and spool directories, oldest first
+    """
+    segments = []
+    for path in paths:
+        if os.path.isdir(path):
+            segments.extend(os.path.join(path, name) for name in os.listdir(path) if name.endswith(SPOOL_SUFFIX))
+        else:
+            segments.append(path)
+    return sorted(segments, key=os.path.basename)
+
+
+class SpoolSegmentTable(Table):
+    """
+    Ingest progress of the spool segments, the byte offset and the number of events loaded of each segment,
+    and the setting (data, method and task with their IDs) at the offset, as JSON, so the next ingest starts reading at the offset
+    """
+    def __init__(self, db:Database) -> None:
+        columns = {
+            'segment': 'TEXT PRIMARY KEY',
+            'offset': 'INTEGER NOT NULL',
+            'events': 'INTEGER NOT NULL',
+            'closed': 'INTEGER NOT NULL DEFAULT 0',
+            'ingest_time': 'REAL',
+            'setting': 'TEXT DEFAULT NULL',
+        }
+        if 'spool_segments' in db.table_names and 'setting' not in [column[0] for column in db.schema.column_info(db.conn, 'spool_segments')]:
+            # ingested by a former version, its segments are read from the beginning once more
+            db.write("ALTER TABLE spool_segments ADD COLUMN setting TEXT DEFAULT NULL")
+        super().__init__(db, 'spool_segments', columns)
+
+    def progress(self, segment:str) -> typing.Tuple[int, int, bool, typing.Optional[dict]]:
+        row = self.db.cursor.execute(f"SELECT offset, events, closed, setting FROM {self.table_name} WHERE segment=?", (segment,)).fetchone()
+        if row is None:
+            return 0, 0, False, {}
+        return row[0], row[1], bool(row[2]), json.loads(row[3]) if row[3] is not None else None
+
+    def set_progress(self, segment:str, offset:int, events:int, closed:bool, setting:dict) -> None:
+        self.db.write(f"INSERT OR REPLACE INTO {self.table_name} (segment, offset, events, closed, ingest_time, setting) VALUES (?, ?, ?, ?, ?, ?)", 
+                      (segment, offset, events, int(closed), time(), json.dumps(setting)))
+
+
+class SpoolExperimentTable(Table):
+    """
+    The database IDs of the segment local experiment IDs, for the events of an experiment ingested after its start
+    """
+    def __init__(self, db:Database) -> None:
+        columns = {
+            'map_id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+            'segment': 'TEXT NOT NULL',
+            'local_id': 'INTEGER NOT NULL',
+            'experiment_id': 'INTEGER NOT NULL',
+        }
+        super().__init__(db, 'spool_experiments', columns)
+        self.create_index('index_spool_experiments_segment', ['segment', 'local_id'], unique=True)
+
+    def get_ids(self, segment:str) -> typing.Dict[int, int]:
+        return dict(self.db.cursor.execute(f"SELECT local_id, experiment_id FROM {self.table_name} WHERE segment=?", (segment,)).fetchall())
+
+
+class SpoolIngest:
+    """
+    Replays the events of spool segments into a database, each segment from where its last ingest stopped.
+
+    The events, one JSON object per line with the event type in `e`:
+
+    - `data` / `method`: `name`, `params`, `defs`, the setting of the following experiments
+    - `task`: `name`, `defs`
+    - `start`: `id` (segment local), `description`, `start_time`, `tags`, `experimenters`, `remark`
+    - `details`: `id`, `columns`, `rows`, a batch of detail rows with their `record_time`
+    - `over`: `id`, `rst`, `images` (encoded image bytes), `end_time`, `useful_time_cost`
+    - `failed`: `id`, `error_info`, `end_time`
+    - `close`: the writer is closed, no more events
+
+    Parameters
+    ----------
+    db : Database
+        The database to load the spools into
+    """
+    def __init__(self, db:Database) -> None:
+        self.db = db
+        self.experiment_table = ExperimentTable(db)
+        self.segment_table = SpoolSegmentTable(db)
+        self.id_table = SpoolExperimentTable(db)
+        self.detail_table = None
+        self.rst_tables = {}
+        self.stats_tables = {}
+
+    def ingest(self, path:str) -> int:
+        """
+        Load the new events of one segment, to be called in a transaction so the progress is saved with the events
+
+        Returns
+        -------
+        int
+            The number of events loaded
+        """
+        segment = os.path.basename(path)
+        offset, done, closed, setting = self.segment_table.progress(segment)
+        if closed and os.path.getsize(path) == offset:
+            return 0
+        if setting is None:
+            # the progress of a former version has no setting, the setting events are replayed from the beginning for the IDs
+            # (`insert` of an existing setting returns its ID) and the events loaded before are skipped
+            events, end = read_segment(path)
+            skip, setting = done, {}
+        else:
+            # only the bytes written since the last ingest, the setting in force there was saved with the progress
+            events, end = read_segment(path, offset)
+            skip = 0
+        ids = self.id_table.get_ids(segment)
+        loaded = 0
+        for i, event in enumerate(events):
+            kind = event['e']
+            if kind in ('data', 'method', 'task'):
+                setting[kind] = self._setting(kind, event)
+            elif i >= skip:
+                if kind == 'start':
+                    ids[event['id']] = self._start(segment, event, setting)
+                elif kind == 'details':
+                    if self.detail_table is None:
+                        self.detail_table = DetailRecordTable(self.db)
+                    self.detail_table.insert_many(ids[event['id']], event['columns'], event['rows'])
+                elif kind == 'over':
+                    self._over(ids[event['id']], event)
+                elif kind == 'failed':
+                    self.experiment_table.experiment_failed(ids[event['id']], event['error_info'], event['end_time'])
+                elif kind == 'close':
+                    closed = True
+            loaded += i >= skip
+        self.segment_table.set_progress(segment, end, done + loaded, closed, setting)
+        return loaded
+
+    def _setting(self, kind:str, event:dict):
+        name = event['name']
+        if kind == 'task':
+            if event['defs'] is not None and name not in self.rst_tables:
+                self.rst_tables[name] = ResultTable(self.db, name, event['defs'])
+            return name
+        if len(event['params']) == 0:
+            return name, -1
+        table = (DataTable if kind == 'data' else MethodTable)(self.db, name, event['defs'])
+        return name, table.insert(**event["params"])
+
+    def _start(self, segment:str, event:dict, setting:dict) -> int:
+        (data, data_id), (method, method_id) = setting['data'], setting['method']
+        experiment_id = self.experiment_table.experiment_start(event['description'], method, method_id, data, data_id, setting['task'], 
+                                                               event['start_time'], event['tags'], event['experimenters'], event['remark'])
+        self.id_table.insert(segment=segment, local_id=event['id'], experiment_id=experiment_id)
+        return experiment_id
+
+    def _over(self, experiment_id:int, event:dict) -> None:
+        # the setting of the experiment as started, the start may be in an earlier ingest
+        task, method, method_id, data, data_id = self.experiment_table.select('task', 'method', 'method_id', 'data', 'data_id', where=f"id={experiment_id}")[0]
+        rst_dict = event['rst']
+        if task not in self.rst_tables:
+            self.rst_tables[task] = ResultTable(self.db, task, None if f"result_{task}" in self.db.table_names else auto_detect_def(rst_dict))
+        rst_table = self.rst_tables[task]
+        rst_table.record_rst(experiment_id=experiment_id, **rst_dict)
+        rst_table.record_image(experiment_id, **event['images'])
+        self.experiment_table.experiment_over(experiment_id, end_time=event['end_time'], useful_time_cost=event['useful_time_cost'])
+        # the running statistics are kept up to date where the database has them
+        if task not in self.stats_tables:
+            self.stats_tables[task] = SettingStatsTable(self.db, task) if f"setting_stats_{task}" in self.db.table_names else None
+        if self.stats_tables[task] is not None:
+            self.stats_tables[task].add(method, method_id, data, data_id, rst_dict)
+
+
+def ingest_spools(db:Database, paths:typing.Iterable[str]) -> typing.Dict[str, int]:
+    """
+    Load the spool segments of the given files and spool directories into the database in one transaction, 
+    running it again only loads the events written since, and nothing if the segments did not grow
+
+    Parameters
+    ----------
+    db : Database
+        The database to load the spools into
+    paths : typing.Iterable[str]
+        The segment files and spool directories
+
+    Returns
+    -------
+    typing.Dict[str, int]
+        The number of events loaded of each segment path
+    """
+    loaded = {}
+    with db.transaction():
+        ingest = SpoolIngest(db)
+        for path in find_segments(paths):
+            loaded[path] = ingest.ingest(path)
+    return loaded
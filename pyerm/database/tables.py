@@ -31,11 +31,26 @@ import traceback
 import sys
 import os
 import base64
+import hashlib
+import json
+import math
+import numbers
+import pandas as pd
 
 from .dbbase import Table, Database
-from .utils import value2def
+from .utils import value2def, setting_results, group_statistics, SETTING_COLUMNS
 
 class ExperimentTable(Table):
+    # managed secondary indexes, index name -> (columns, partial index condition)
+    # `remark` is already indexed by the automatic index of its UNIQUE constraint
+    INDEXES = {
+        'index_experiment_list_setting': (['task', 'method', 'method_id', 'data', 'data_id', 'status'], None),
+        'index_experiment_list_finished': (['task', 'method', 'method_id', 'data', 'data_id'], "status='finished'"),
+        'index_experiment_list_start_time': (['start_time'], None),
+        # only the running experiments, the stale ones are a range of it
+        'index_experiment_list_heartbeat': (['last_heartbeat'], "status='running'"),
+    }
+
     def __init__(self, db: Database) -> None:
         columns = {
             'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
@@ -54,12 +69,30 @@ class ExperimentTable(Table):
             'total_time_cost': 'REAL AS (strftime(\"%s\", end_time) - strftime(\"%s\", start_time)) VIRTUAL',
             'status': 'TEXT CHECK(status IN (\"running\", \"finished\", \"failed\"))',
             'failed_reason': 'TEXT DEFAULT NULL',
+            'last_heartbeat': 'REAL DEFAULT NULL', # UNIX time of the last heartbeat, only of the experiments with heartbeats
         }
+        # the upgrade of a former version and the managed indexes are checked once per schema version of the file,
+        # not every time the table is opened (e.g. at every rerun of the webUI)
+        check = "experiment_list" not in db.schema.checked
+        if check and "experiment_list" in db.table_names and 'last_heartbeat' not in [column[0] for column in db.schema.column_info(db.conn, "experiment_list")]:
+            # experiment_list of a former version
+            db.write("ALTER TABLE experiment_list ADD COLUMN last_heartbeat REAL DEFAULT NULL")
         super().__init__(db, "experiment_list", columns)
+        if check:
+            self.create_indexes()
+            # the version after the changes, a later change of the schema (e.g. a dropped index) is checked again
+            db.schema.checked.add("experiment_list")
+
+    def create_indexes(self) -> typing.List[str]:
+        created = []
+        for index_name, (index_columns, where) in self.INDEXES.items():
+            if self.create_index(index_name, index_columns, where=where):
+                created.append(index_name)
+        return created
 
-    def experiment_start(self, description:str, method:str, method_id:int, data:str, data_id, task:str, start_time:float=None, tags:str=None, experimenters:str=None, remark:str=None) -> int:
+    def experiment_start(self, description:str, method:str, method_id:int, data:str, data_id, task:str, start_time:float=None, tags:str=None, experimenters:str=None, remark:str=None, heartbeat:float=None) -> int:
         if start_time is None:
-            start_time = time()
+            start_time = strftime("%Y-%m-%d %H:%M:%S", localtime(time()))
         elif start_time == "":
             start_time = None
         else:
@@ -67,11 +100,67 @@ class ExperimentTable(Table):
             start_time = strftime("%Y-%m-%d %H:%M:%S", start_time)
         return super().insert(description=description, method=method, method_id=method_id,
                                 data=data, data_id=data_id, task=task, tags=tags, experimenters=experimenters,
-                                start_time=strftime(start_time) if start_time is not None else None, status='running', remark=remark)
+                                start_time=start_time, status='running', remark=remark, last_heartbeat=heartbeat)
+
+    def heartbeat(self, experiment_ids:typing.List[int], heartbeat_time:float=None) -> None:
+        """
+        Record that the given running experiments are alive at `heartbeat_time` (UNIX time), by default now
+        """
+        if len(experiment_ids) == 0:
+            return
+        ids = ','.join([str(int(i)) for i in experiment_ids])
+        self.db.write(f"UPDATE {self.table_name} SET last_heartbeat=? WHERE id IN ({ids}) AND status='running'", 
+                      (heartbeat_time if heartbeat_time is not None else time(),))
+
+    def stale_experiments(self, timeout:float=300, max_age:float=86400) -> typing.List[int]:
+        """
+        The running experiments whose process is gone: with heartbeats, the ones without a heartbeat for `timeout` seconds,
+        without heartbeats (e.g. recorded by a former version), the ones started more than `max_age` seconds ago.
+        Both are range queries on the partial index of the running experiments
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The seconds without a heartbeat after which an experiment is stale, by default 300, keep it several heartbeat intervals long
+        max_age : float, optional
+            The seconds after which an experiment without heartbeats is stale, by default 86400 (24 hours), None to keep them
+
+        Returns
+        -------
+        typing.List[int]
+            The IDs of the stale experiments
+        """
+        now = time()
+        stale = [row[0] for row in self.db.cursor.execute(
+            f"SELECT id FROM {self.table_name} WHERE status='running' AND last_heartbeat < ?", (now - timeout,))]
+        if max_age is not None:
+            # the start times are local times 'YYYY-mm-dd HH:MM:SS', compared as strings
+            start_before = strftime("%Y-%m-%d %H:%M:%S", localtime(now - max_age))
+            stale.extend(row[0] for row in self.db.cursor.execute(
+                f"SELECT id FROM {self.table_name} WHERE status='running' AND last_heartbeat IS NULL AND start_time < ?", (start_before,)))
+        return sorted(stale)
+
+    def mark_stale_experiments(self, timeout:float=300, max_age:float=86400) -> typing.List[int]:
+        """
+        Mark the stale experiments (see `stale_experiments()`) as failed, their end time is their last heartbeat
+
+        Returns
+        -------
+        typing.List[int]
+            The IDs of the experiments marked as failed
+        """
+        with self.db.transaction():
+            stale = self.stale_experiments(timeout, max_age)
+            if len(stale) > 0:
+                self.db.write(f"""UPDATE {self.table_name} SET status='failed', 
+                    end_time=CASE WHEN last_heartbeat IS NULL THEN NULL ELSE strftime('%Y-%m-%d %H:%M:%S', last_heartbeat, 'unixepoch', 'localtime') END,
+                    failed_reason=CASE WHEN last_heartbeat IS NULL THEN ? ELSE ? END WHERE id IN ({','.join([str(i) for i in stale])})""",
+                    (f'Stale: still running after {max_age} seconds without heartbeats', f'Stale: no heartbeat for {timeout} seconds'))
+        return stale
 
     def experiment_over(self, experiment_id:int, end_time:float=None, useful_time_cost:float=None) -> None:
         if end_time is None:
-            end_time = time()
+            end_time = localtime(time())
         elif end_time == "":
             end_time = None
         else:
@@ -81,12 +170,11 @@ class ExperimentTable(Table):
 
     def experiment_failed(self, experiment_id:int, error_info:str=None, end_time:float=None) -> None:
         if end_time is None:
-            end_time = time()
+            end_time = localtime(time())
         elif end_time == "":
             end_time = None
         else:
             end_time = localtime(end_time)
-            end_time = strftime("%Y-%m-%d %H:%M:%S", end_time)
         # print(error_info)
         if error_info is None:
             error_info = traceback.format_exc()
@@ -100,86 +188,195 @@ class ExperimentTable(Table):
     def __getitem__(self, index: int):
         return self.get_experiment(index)
 
-class DataTable(Table):
-    def __init__(self, db: Database, data: str, param_def_dict: dict=None) -> None:
-        table_name = f"data_{data}"
-        if table_name in db.table_names:
-            columns = None
-        else:
-            assert param_def_dict is not None, 'Data Parameter Dict must be provided when creating a new data table'
-            columns = {
-                'data_id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
-                'remark': 'TEXT DEFAULT NULL UNIQUE',
-                **param_def_dict,
-            }
-        super().__init__(db, table_name, columns)
-        # if len(param_def_dict) != 0: 
-        #     self.db.cursor.execute(f"CREATE INDEX IF NOT EXISTS index_{self.table_name} ON {self.table_name}({', '.join(param_def_dict.keys())})")
-    
-    def insert(self, **kwargs):
-        for key in kwargs.keys():
-            if key not in self.columns:
-                def_str = value2def(kwargs[key])
-                self.add_column(key, def_str)
-                self.update(**{key: None})
-        remark = kwargs.pop('remark', None)
-        condition = ' AND '.join([f'{k.replace(" ", "_")}=?' if kwargs[k] is not None else f'{k.replace(" ", "_")} IS NULL' for k in kwargs.keys()])
-        values = [v for v in kwargs.values() if v is not None]
+def _affinity(declared_type:str) -> str:
+    # the type affinity rules of SQLite, https://www.sqlite.org/datatype3.html
+    declared_type = declared_type.upper()
+    if 'INT' in declared_type:
+        return 'INTEGER'
+    if any(t in declared_type for t in ('CHAR', 'CLOB', 'TEXT')):
+        return 'TEXT'
+    if declared_type == '' or 'BLOB' in declared_type:
+        return 'BLOB'
+    if any(t in declared_type for t in ('REAL', 'FLOA', 'DOUB')):
+        return 'REAL'
+    return 'NUMERIC'
 
-        query = f"SELECT data_id FROM {self.table_name} WHERE {condition}"
-        id_list = self.db.cursor.execute(query, values).fetchall()
-        # print(kwargs)
+def _canonical(value, affinity:str):
+    # the value as stored by a column of the affinity, so a setting hashes the same before and after it is written
+    if isinstance(value, bool):
+        value = int(value)
+    if affinity == 'TEXT' and isinstance(value, (int, float)):
+        value = str(value)
+    elif affinity in ('INTEGER', 'REAL', 'NUMERIC') and isinstance(value, str):
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                pass
+    if isinstance(value, float) and value.is_integer():
+        # 1 and 1.0 are the same setting, as for the `=` of SQLite
+        value = int(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = ['blob', bytes(value).hex()]
+    return value
 
-        if id_list == []:
-            if remark is not None:
-                kwargs['remark'] = remark
-            return super().insert(**kwargs)
-        else:
-            if remark is not None:
-                self.update(f"data_id={id_list[0][0]}", remark=remark)
-            return id_list[0][0] 
+def param_hash(params:typing.Dict[str, typing.Any], column_types:typing.Dict[str, str]=None) -> str:
+    """
+    The canonical hash of a setting, independent of the order of the parameters, with the numbers equal for SQLite 
+    (e.g. 1 and 1.0) hashing the same and a None parameter the same as a missing one (e.g. a column added later)
 
+    Parameters
+    ----------
+    params : typing.Dict[str, typing.Any]
+        The parameters of the setting, without the ID and the remark
+    column_types : typing.Dict[str, str], optional
+        The declared types of the parameter columns, the values are hashed as the columns store them, by default None
 
-class MethodTable(Table):
-    def __init__(self, db: Database, method: str, param_def_dict: dict=None) -> None:
-        table_name = f"method_{method}"
+    Returns
+    -------
+    str
+        32 hex digits
+    """
+    column_types = column_types or {}
+    items = sorted((key.replace(' ', '_'), _canonical(value, _affinity(column_types.get(key.replace(' ', '_'), ''))))
+                   for key, value in params.items() if value is not None)
+    return hashlib.blake2b(json.dumps(items, separators=(',', ':')).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ParamTable(Table):
+    """
+    A table of settings (the parameters of a data set or a method), one row per distinct setting.
+    A setting is found by the hash of its parameters in the column `param_hash` with a UNIQUE index, 
+    the tables of former versions are hashed on the first insert or by `pyerm_reindex`.
+    """
+    PREFIX = None
+    ID_COLUMN = None
+
+    def __init__(self, db: Database, name: str, param_def_dict: dict=None) -> None:
+        table_name = f"{self.PREFIX}_{name}"
         if table_name in db.table_names:
             columns = None
         else:
-            assert param_def_dict is not None, 'Method Parameter Dict must be provided when creating a new parameter table'
+            assert param_def_dict is not None, f'{self.PREFIX.capitalize()} Parameter Dict must be provided when creating a new {self.PREFIX} table'
             columns = {
-                'method_id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+                self.ID_COLUMN: 'INTEGER PRIMARY KEY AUTOINCREMENT',
                 'remark': 'TEXT DEFAULT NULL UNIQUE',
                 **param_def_dict,
+                'param_hash': 'TEXT DEFAULT NULL',
             }
         super().__init__(db, table_name, columns)
-        # if len(param_def_dict) != 0: 
-        #     self.db.cursor.execute(f"CREATE INDEX IF NOT EXISTS index_{self.table_name} ON {self.table_name}({', '.join(param_def_dict.keys())})")
-    
+        if columns is not None:
+            self.create_indexes()
+
+    @property
+    def param_columns(self) -> typing.List[str]:
+        return [col for col in self.columns if col not in (self.ID_COLUMN, 'remark', 'param_hash')]
+
+    def create_indexes(self) -> typing.List[str]:
+        with self.db.transaction():
+            hashed = 'param_hash' in self.columns
+            if not hashed:
+                self.backfill_param_hash()
+            # the index on all the parameters of former versions is replaced by the hash lookup
+            if f"index_{self.table_name}" in self.db.index_names:
+                self.db.write(f"DROP INDEX index_{self.table_name}")
+            created = self.create_index(f"index_{self.table_name}_param_hash", ['param_hash'], unique=True)
+        return [f"index_{self.table_name}_param_hash"] if created or not hashed else []
+
+    def backfill_param_hash(self) -> int:
+        """
+        Add the column `param_hash` to a table of a former version and hash its settings, 
+        a duplicate of an earlier setting (written by a race of former versions) keeps a NULL hash
+
+        Returns
+        -------
+        int
+            The number of settings hashed
+        """
+        with self.db.transaction():
+            if 'param_hash' not in self.columns:
+                self.add_column('param_hash', 'TEXT DEFAULT NULL')
+            param_columns = self.param_columns
+            column_types = dict(zip(self.columns, self.column_types))
+            seen = {row[0] for row in self.db.cursor.execute(f"SELECT param_hash FROM {self.table_name} WHERE param_hash IS NOT NULL")}
+            hashes = []
+            for row in self.select_iter(self.ID_COLUMN, *param_columns, where='param_hash IS NULL', other=f'ORDER BY {self.ID_COLUMN}'):
+                setting_hash = param_hash(dict(zip(param_columns, row[1:])), column_types)
+                if setting_hash not in seen:
+                    seen.add(setting_hash)
+                    hashes.append((setting_hash, row[0]))
+            self.db.write(f"UPDATE {self.table_name} SET param_hash=? WHERE {self.ID_COLUMN}=?", hashes, many=True)
+        return len(hashes)
+
     def insert(self, **kwargs):
-        for key in kwargs.keys():
-            if key not in self.columns:
-                self.add_column(key, value2def(kwargs[key]))
-                self.update(**{key: None})
-        remark = kwargs.pop('remark', None)
-        condition = ' AND '.join([f'{k.replace(" ", "_")}=?' if kwargs[k] is not None else f'{k.replace(" ", "_")} IS NULL' for k in kwargs.keys()])
-        values = [v for v in kwargs.values() if v is not None]
+        with self.db.transaction():
+            return self._insert(**kwargs)
 
-        query = f"SELECT method_id FROM {self.table_name} WHERE {condition}"
-        id_list = self.db.cursor.execute(query, values).fetchall()
-        # print(kwargs)
-        if id_list == []:
+    def _insert(self, **kwargs):
+        kwargs.pop('param_hash', None)
+        # the existing settings read NULL for the new parameters, their hash does not change
+        columns = set(self.columns)
+        self.add_columns({key: value2def(value) for key, value in kwargs.items() if key not in columns})
+        if 'param_hash' not in self.columns:
+            self.create_indexes()
+        remark = kwargs.pop('remark', None)
+        setting_hash = param_hash(kwargs, dict(zip(self.columns, self.column_types)))
+        row = self.db.cursor.execute(f"SELECT {self.ID_COLUMN} FROM {self.table_name} WHERE param_hash=?", (setting_hash,)).fetchone()
+        if row is None:
             if remark is not None:
                 kwargs['remark'] = remark
-            return super().insert(**kwargs)
+            return super().insert(**kwargs, param_hash=setting_hash)
         else:
             if remark is not None:
-                self.update(f"method_id={id_list[0][0]}", remark=remark)
-            return id_list[0][0] 
+                self.update(f"{self.ID_COLUMN}={row[0]}", remark=remark)
+            return row[0]
+
+
+class DataTable(ParamTable):
+    PREFIX = 'data'
+    ID_COLUMN = 'data_id'
+
+    def __init__(self, db: Database, data: str, param_def_dict: dict=None) -> None:
+        super().__init__(db, data, param_def_dict)
+
+
+class MethodTable(ParamTable):
+    PREFIX = 'method'
+    ID_COLUMN = 'method_id'
+
+    def __init__(self, db: Database, method: str, param_def_dict: dict=None) -> None:
+        super().__init__(db, method, param_def_dict)
 
 def image_def(i):
     return {f'image_{i}_name': 'TEXT DEFAULT NULL', f'image_{i}': 'BLOB DEFAULT NULL'}
 
+def encode_image(image:typing.Union[Image.Image, str, bytearray, bytes]) -> bytes:
+    """
+    The bytes stored for an image: PIL images and base64 strings are encoded as PNG, a file path is read as it is
+    """
+    if isinstance(image, Image.Image):
+        buffer = BytesIO()
+        image.save(buffer, format='PNG')
+        return buffer.getvalue()
+    elif isinstance(image, str):
+        try:
+            decoded_base64_img = base64.b64decode(image)
+            decoded_base64_img = Image.open(BytesIO(decoded_base64_img))
+            decoded_base64_img.copy().verify()  # Verify that it is a valid image
+            buffer = BytesIO()
+            decoded_base64_img.save(buffer, format='PNG')
+            return buffer.getvalue()
+        except:
+            if os.path.isfile(image):
+                return open(image, 'rb').read()
+            else:
+                raise ValueError(f"Image file {image} does not exist.")
+    elif isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    else:
+        raise TypeError(f"Unsupported image type: {type(image)}")
+
 class ResultTable(Table):
     def __init__(self, db: Database, task: str, rst_def_dict: dict=None, default_image_num: int=2) -> None:
         table_name = f"result_{task}"
@@ -194,57 +391,44 @@ class ResultTable(Table):
             }
         
         super().__init__(db, table_name, columns)
-        self._non_img_columns = None
+        self.max_image_index = self._max_image_index()
+
+    def _max_image_index(self) -> int:
         pattern = re.compile(r'image_(\d+)')
-        self.max_image_index = -1
+        max_image_index = -1
         for name in self.columns:
             match = pattern.match(name)
             if match:
-                self.max_image_index = max(self.max_image_index, int(match.group(1)))
+                max_image_index = max(max_image_index, int(match.group(1)))
+        return max_image_index
 
     def record_rst(self, experiment_id:int, **rst_dict:dict):
-        for key in rst_dict.keys():
-            if key not in self.columns:
-                self.add_column(key, value2def(rst_dict[key]))
+        columns = set(self.columns)
+        self.add_columns({key: value2def(value) for key, value in rst_dict.items() if key not in columns})
         self.insert(experiment_id=experiment_id, **rst_dict)
 
     def record_image(self, experiment_id:int, **image_dict:typing.Dict[str, typing.Union[Image.Image, str, bytearray, bytes]]):        
+        if len(image_dict) > self.max_image_index + 1:
+            # another process may have added the columns since, or a rolled back transaction removed them
+            self.max_image_index = self._max_image_index()
+        if len(image_dict) > self.max_image_index + 1:
+            self.add_columns({k: v for i in range(self.max_image_index + 1, len(image_dict)) for k, v in image_def(i).items()})
+            self.max_image_index = len(image_dict) - 1
+        images = {}
         for i, image_key in enumerate(image_dict.keys()):
-            if i > self.max_image_index:
-                self.add_column(f'image_{i}_name', 'TEXT DEFAULT NULL')
-                self.add_column(f'image_{i}', 'BLOB DEFAULT NULL')
-                self.max_image_index += 1
-            if isinstance(image_dict[image_key], Image.Image):
-                image = BytesIO()
-                image_dict[image_key].save(image, format='PNG')
-                image = image.getvalue()
-            elif isinstance(image_dict[image_key], str):
-                try:
-                    decoded_base64_img = base64.b64decode(image_dict[image_key])
-                    decoded_base64_img = Image.open(BytesIO(decoded_base64_img))
-                    decoded_base64_img.copy().verify()  # Verify that it is a valid image
-                    image = BytesIO()
-                    decoded_base64_img.save(image, format='PNG')
-                    image = image.getvalue()
-                except:
-                    if os.path.isfile(image_dict[image_key]):
-                        image = open(image_dict[image_key], 'rb').read()
-                    else:
-                        raise ValueError(f"Image file {image_dict[image_key]} does not exist.")
-            # print(type(image_key))
-            # print(type(image))
-            self.update(f"experiment_id={experiment_id}", **{f'image_{i}_name': image_key})
-            self.update(f"experiment_id={experiment_id}", **{f'image_{i}': image})
+            images[f'image_{i}_name'] = image_key
+            images[f'image_{i}'] = encode_image(image_dict[image_key])
+        if len(images) > 0:
+            self.update(f"experiment_id={experiment_id}", **images)
     
     @property
     def non_img_columns(self):
-        if self._non_img_columns is None:
-            self._non_img_columns = [c for c in self.columns if not c.startswith('image_')]
-        return self._non_img_columns
+        return [c for c in self.columns if not c.startswith('image_')]
 
 
 
 class DetailTable(Table):
+    # the former per experiment detail table, read by the WebUI until `migrate_detail_tables()` moves it into detail_records
     def __init__(self, db: Database, experiment_id:int, detail_def_dict: dict=None) -> None:
         columns = {
             'detail_id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
@@ -255,6 +439,368 @@ class DetailTable(Table):
         super().__init__(db, table_name, columns)
         
     def insert(self, **kwargs):
-        cur_time = strftime("%Y-%m-%d %H:%M:%S", localtime(time()))
-        kwargs['record_time'] = strftime(cur_time)
-        return super().insert(**kwargs)
\ No newline at end of file
+        record_time = kwargs.get('record_time')
+        kwargs['record_time'] = strftime("%Y-%m-%d %H:%M:%S", localtime(record_time if record_time is not None else time()))
+        return super().insert(**kwargs)
+
+    def insert_many(self, columns:typing.List[str], rows:typing.Iterable[typing.Sequence]) -> int:
+        if 'record_time' not in columns:
+            cur_time = strftime("%Y-%m-%d %H:%M:%S", localtime(time()))
+            return super().insert_many([*columns, 'record_time'], [(*row, cur_time) for row in rows])
+        # the given record times are UNIX times, formatted once per second as the rows of a batch mostly share it
+        index = columns.index('record_time')
+        last_second, last_str = None, None
+        def format_row(row):
+            nonlocal last_second, last_str
+            record_time = row[index]
+            if record_time is None or isinstance(record_time, str):
+                return row
+            second = int(record_time)
+            if second != last_second:
+                last_second, last_str = second, strftime("%Y-%m-%d %H:%M:%S", localtime(second))
+            return (*row[:index], last_str, *row[index + 1:])
+        return super().insert_many(columns, map(format_row, rows))
+
+class DetailRecordTable(Table):
+    """
+    The details of all experiments in one long format table, one row per (experiment, step, detail key), 
+    instead of one `detail_{experiment_id}` table per experiment, so the schema stays small however many experiments are run
+    and the details of several experiments are read with one indexed query.
+    `step` numbers the detail rows of an experiment from 0, `record_time` is the UNIX time.
+    """
+    def __init__(self, db: Database) -> None:
+        columns = {
+            'record_id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+            'experiment_id': 'INTEGER NOT NULL',
+            'step': 'INTEGER NOT NULL',
+            'key': 'TEXT NOT NULL',
+            'value': 'BLOB', # BLOB affinity, numbers and text keep their own type
+            'record_time': 'REAL',
+        }
+        with db.transaction():
+            super().__init__(db, "detail_records", columns if "detail_records" not in db.table_names else None)
+            self.create_index('index_detail_records_experiment', ['experiment_id', 'key', 'step'])
+        self._next_steps = {}
+
+    def next_step(self, experiment_id:int) -> int:
+        if experiment_id not in self._next_steps:
+            last = self.db.cursor.execute(f"SELECT MAX(step) FROM {self.table_name} WHERE experiment_id=?", (experiment_id,)).fetchone()[0]
+            self._next_steps[experiment_id] = 0 if last is None else last + 1
+        return self._next_steps[experiment_id]
+
+    def insert_many(self, experiment_id:int, columns:typing.List[str], rows:typing.Iterable[typing.Sequence]) -> int:
+        """
+        Record the detail rows of an experiment, one row per non-null detail
+
+        Parameters
+        ----------
+        experiment_id : int
+            The experiment ID
+        columns : typing.List[str]
+            The detail keys of the rows, `record_time` (UNIX time) among them if given, otherwise the current time is recorded
+        rows : typing.Iterable[typing.Sequence]
+            The detail rows, each one ordered as `columns`
+
+        Returns
+        -------
+        int
+            The number of detail rows recorded
+        """
+        time_index = columns.index('record_time') if 'record_time' in columns else None
+        keys = [(i, key) for i, key in enumerate(columns) if i != time_index]
+        step = self.next_step(experiment_id)
+        cur_time = time()
+        records = []
+        for row in rows:
+            record_time = row[time_index] if time_index is not None else cur_time
+            for i, key in keys:
+                value = row[i]
+                # missing details are absent rows
+                if value is not None and value == value:
+                    records.append((experiment_id, step, key, value, record_time))
+            step += 1
+        super().insert_many(['experiment_id', 'step', 'key', 'value', 'record_time'], records)
+        count = step - self._next_steps[experiment_id]
+        # advanced once written, and read again from the table if the transaction of the caller is rolled back, 
+        # so that neither a gap nor a step numbered twice is left
+        self._next_steps[experiment_id] = step
+        self.db.on_rollback(lambda: self._next_steps.pop(experiment_id, None))
+        return count
+
+    def get_details(self, experiment_id:int, keys:typing.List[str]=None) -> pd.DataFrame:
+        """
+        The details of an experiment in the wide format of `detail_{experiment_id}`, one row per step and one column per detail key,
+        plus the formatted `record_time`, an empty DataFrame when it has no details
+
+        Parameters
+        ----------
+        experiment_id : int
+            The experiment ID
+        keys : typing.List[str], optional
+            Only these detail keys, by default None, which means all of them
+        """
+        where = f"experiment_id={int(experiment_id)}"
+        if keys is not None:
+            where += f" AND key IN ({','.join(['?'] * len(keys))})"
+        # the keys of a step in their logged order
+        rows = self.db.cursor.execute(f"SELECT step, key, value, record_time FROM {self.table_name} WHERE {where} ORDER BY step, record_id", 
+                                      keys or ()).fetchall()
+        steps, record_times, columns = [], [], {}
+        last_step = None
+        for step, key, value, record_time in rows:
+            if step != last_step:
+                steps.append(step)
+                record_times.append(record_time)
+                last_step = step
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = {}
+            column[len(steps) - 1] = value
+        # built from lists so that each detail gets the dtype of its own values, as in the detail_{experiment_id} tables
+        details = pd.DataFrame({'step': steps, **{key: [column.get(i) for i in range(len(steps))] for key, column in columns.items()}}, 
+                               columns=['step', *(columns.keys() if keys is None else keys)])
+        details['record_time'] = [strftime("%Y-%m-%d %H:%M:%S", localtime(t)) if t is not None else None for t in record_times]
+        if list(columns.keys()).count('step'):
+            # a detail named step replaces the row number
+            details = details.iloc[:, 1:]
+        return details
+
+    def get_curves(self, key:str, experiment_ids:typing.List[int]) -> pd.DataFrame:
+        """
+        One detail of several experiments with one indexed query, columns experiment_id, step and value
+        """
+        ids = ','.join([str(int(i)) for i in experiment_ids])
+        return pd.read_sql_query(f"SELECT experiment_id, step, value FROM {self.table_name} WHERE experiment_id IN ({ids}) AND key=? ORDER BY experiment_id, step", 
+                                 self.db.conn, params=(key,))
+
+    def remove_experiments(self, experiment_ids:typing.List[int]) -> None:
+        """
+        Delete the details of the given experiments
+        """
+        if len(experiment_ids) == 0:
+            return
+        self.delete(f"experiment_id IN ({','.join([str(int(i)) for i in experiment_ids])})")
+        for experiment_id in experiment_ids:
+            self._next_steps.pop(experiment_id, None)
+
+def migrate_detail_tables(db: Database, drop:bool=True, batch_size:int=100) -> typing.List[str]:
+    """
+    Move the details of the per experiment `detail_{experiment_id}` tables into `detail_records`, `batch_size` tables per transaction.
+    A table whose experiment already has rows in `detail_records` is skipped, 
+    so running it again, or after an interruption, only migrates the remaining tables.
+
+    Parameters
+    ----------
+    db : Database
+        The database
+    drop : bool, optional
+        Whether to drop the migrated tables, by default True
+    batch_size : int, optional
+        The number of tables migrated in one transaction, by default 100
+
+    Returns
+    -------
+    typing.List[str]
+        The migrated tables
+    """
+    record_table = DetailRecordTable(db)
+    # the detail_{method} tables of the old method_init(detail_def_dict) never held any details
+    table_names = [name for name in db.table_names if name.startswith('detail_') and name[len('detail_'):].isdigit()]
+    migrated = []
+    for start in range(0, len(table_names), batch_size):
+        with db.transaction():
+            for table_name in table_names[start:start + batch_size]:
+                experiment_id = int(table_name[len('detail_'):])
+                if record_table.next_step(experiment_id) > 0:
+                    # migrated before with drop=False
+                    if drop:
+                        db.cursor.execute(f"DROP TABLE {table_name}")
+                        migrated.append(table_name)
+                    continue
+                # PRAGMA instead of the schema catalog, which every DROP TABLE would invalidate
+                keys = [info[1] for info in db.cursor.execute(f"PRAGMA table_info({table_name})").fetchall() 
+                        if info[1] not in ('detail_id', 'record_time', 'experiment_id')]
+                if len(keys) > 0:
+                    # one row per non-null detail, in the (step, key) order of the recorded details
+                    # record_time was saved in local time, the 'utc' modifier converts it back to the UNIX time
+                    details = ' UNION ALL '.join([f"SELECT detail_id, {i} AS key_index, ? AS key, {key} AS value, record_time FROM {table_name}" 
+                                                  for i, key in enumerate(keys)])
+                    db.cursor.execute(f"""INSERT INTO detail_records (experiment_id, step, key, value, record_time) 
+                                          SELECT {experiment_id}, step, key, value, CAST(strftime('%s', record_time, 'utc') AS REAL) FROM (
+                                              SELECT DENSE_RANK() OVER (ORDER BY detail_id) - 1 AS step, key_index, key, value, record_time FROM ({details})
+                                          ) WHERE value IS NOT NULL ORDER BY step, key_index""", keys)
+                if drop:
+                    db.cursor.execute(f"DROP TABLE {table_name}")
+                record_table._next_steps.pop(experiment_id, None)
+                migrated.append(table_name)
+    return migrated
+
+
+class SettingStatsTable(Table):
+    """
+    Running statistics (count, mean, M2, min, max) of every score of the finished experiments of a task per setting,
+    kept up to date with Welford's algorithm as results are recorded and deleted, 
+    so the statistics of a setting are an indexed point lookup instead of a scan of the results.
+    A new table is filled from the existing results.
+    """
+    def __init__(self, db: Database, task: str) -> None:
+        table_name = f"setting_stats_{task}"
+        self.task = task
+        if table_name in db.table_names:
+            columns = None
+        else:
+            columns = {
+                'stats_id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+                'method': 'TEXT NOT NULL',
+                'method_id': 'INTEGER NOT NULL',
+                'data': 'TEXT NOT NULL',
+                'data_id': 'INTEGER NOT NULL',
+                'metric': 'TEXT NOT NULL',
+                'count': 'INTEGER NOT NULL',
+                'mean': 'REAL',
+                'm2': 'REAL',
+                'min': 'REAL',
+                'max': 'REAL',
+            }
+        with db.transaction():
+            super().__init__(db, table_name, columns)
+            self.create_index(f'index_{table_name}_setting', [*SETTING_COLUMNS, 'metric'], unique=True)
+            if columns is not None and f'result_{task}' in db.table_names:
+                self.rebuild()
+
+    @staticmethod
+    def _scores(rst_dict:dict) -> typing.List[typing.Tuple[str, float]]:
+        # only numeric scores have statistics
+        return [(k.replace(' ', '_'), float(v)) for k, v in rst_dict.items() 
+                if isinstance(v, numbers.Real) and not math.isnan(v)]
+
+    def add(self, method:str, method_id:int, data:str, data_id:int, rst_dict:dict) -> None:
+        query = f"""INSERT INTO {self.table_name} (method, method_id, data, data_id, metric, count, mean, m2, min, max)
+            VALUES (?, ?, ?, ?, ?, 1, ?, 0, ?, ?)
+            ON CONFLICT (method, method_id, data, data_id, metric) DO UPDATE SET
+                count = count + 1,
+                mean = mean + (excluded.mean - mean) / (count + 1),
+                m2 = m2 + (excluded.mean - mean) * (excluded.mean - (mean + (excluded.mean - mean) / (count + 1))),
+                min = MIN(min, excluded.min),
+                max = MAX(max, excluded.max)"""
+        rows = [(method, method_id, data, data_id, metric, value, value, value) for metric, value in self._scores(rst_dict)]
+        self.db.write(query, rows, many=True)
+
+    def remove_experiments(self, experiment_ids:typing.List[int]) -> None:
+        """
+        Reverse the scores of the given experiments (the finished ones), run it before deleting them.
+        The scores are aggregated per setting and metric in one pass, each statistic is then updated once 
+        by reversing the parallel form of Welford's algorithm, and the minima and maxima the deleted scores reached 
+        are read again from the remaining results with one grouped query
+        """
+        if len(experiment_ids) == 0:
+            return
+        ids = ','.join([str(int(i)) for i in experiment_ids])
+        results = setting_results(self.db, self.task, where=f"e.id IN ({ids})")
+        score_columns = [col for col in results.columns if col not in SETTING_COLUMNS and col != 'experiment_id']
+        scores = results.melt(id_vars=SETTING_COLUMNS, value_vars=score_columns, var_name='metric').dropna(subset=['value'])
+        if len(scores) == 0:
+            return
+        removed = scores.groupby([*SETTING_COLUMNS, 'metric'], sort=False)['value'].agg(['count', 'mean', 'var', 'min', 'max'])
+        # the sum of the squared deviations, the sample variance is NaN for a single score
+        removed['m2'] = removed['var'].fillna(0.0) * (removed['count'] - 1)
+        # n, mean, M2 of the kept scores from the ones of all (count, mean, m2) and of the removed scores (k, b, m2b):
+        # mean_a = (n mean - k b) / (n - k), M2_a = M2 - m2b - (b - mean_a)^2 (n - k) k / n
+        # an extreme that is removed is set to NULL, read again below; the statistics with no score left are deleted
+        kept_mean = "(count * mean - :k * :b) / (count - :k)"
+        query = f"""UPDATE {self.table_name} SET
+                count = count - :k,
+                mean = {kept_mean},
+                m2 = MAX(m2 - :m2b - (:b - {kept_mean}) * (:b - {kept_mean}) * (count - :k) * :k / count, 0.0),
+                min = CASE WHEN :min <= min THEN NULL ELSE min END,
+                max = CASE WHEN :max >= max THEN NULL ELSE max END
+            WHERE method = :method AND method_id = :method_id AND data = :data AND data_id = :data_id AND metric = :metric"""
+        rows = [dict(method=method, method_id=int(method_id), data=data, data_id=int(data_id), metric=metric, 
+                     k=int(k), b=float(b), m2b=float(m2b), min=float(min_value), max=float(max_value)) 
+                for (method, method_id, data, data_id, metric), k, b, m2b, min_value, max_value in removed[['count', 'mean', 'm2', 'min', 'max']].itertuples(name=None)]
+        with self.db.transaction():
+            self.db.write(query, rows, many=True)
+            self.delete('count <= 0')
+            recompute = self.select(*SETTING_COLUMNS, 'metric', where='min IS NULL OR max IS NULL')
+            if len(recompute) == 0:
+                return
+            metrics = list(dict.fromkeys([row[-1] for row in recompute]))
+            settings = ', '.join([f'e.{col}' for col in SETTING_COLUMNS])
+            extremes = self.db.conn.execute(f"""SELECT {settings}, {', '.join([f'MIN(r.{m}), MAX(r.{m})' for m in metrics])} 
+                FROM experiment_list AS e INNER JOIN result_{self.task} AS r ON r.experiment_id = e.id
+                WHERE e.task = ? AND e.status = 'finished' AND e.id NOT IN ({ids}) 
+                AND ({settings}) IN (SELECT {', '.join(SETTING_COLUMNS)} FROM {self.table_name} WHERE min IS NULL OR max IS NULL)
+                GROUP BY {settings}""", (self.task,)).fetchall()
+            rows = [(row[4 + 2 * i], row[5 + 2 * i], *row[:4], metric) for row in extremes for i, metric in enumerate(metrics)]
+            self.db.write(f"""UPDATE {self.table_name} SET min = COALESCE(min, ?), max = COALESCE(max, ?) 
+                WHERE method = ? AND method_id = ? AND data = ? AND data_id = ? AND metric = ?""", rows, many=True)
+
+    def rebuild(self) -> None:
+        statistics = group_statistics(self.db, self.task)
+        rows = []
+        for setting, stats in statistics.iterrows():
+            for metric in statistics['Count'].columns:
+                count = int(stats[('Count', metric)])
+                if count == 0:
+                    continue
+                rows.append((*setting, metric, count, stats[('Avg', metric)], stats[('Std', metric)] ** 2 * count, 
+                             stats[('Min', metric)], stats[('Max', metric)]))
+        with self.db.transaction():
+            self.delete('1')
+            self.insert_many([*SETTING_COLUMNS, 'metric', 'count', 'mean', 'm2', 'min', 'max'], rows)
+
+    def get_statistics(self, method:str, method_id:int, data:str, data_id:int) -> typing.Optional[pd.DataFrame]:
+        """
+        Statistics of one setting, the same as `get_result_statistics` without the median
+
+        Returns
+        -------
+        pd.DataFrame
+            Rows 'Count', 'Max', 'Min', 'Avg', 'Std' (population), one column per score, None if the setting has no result
+        """
+        rows = self.db.conn.execute(f"SELECT metric, count, max, min, mean, m2 FROM {self.table_name} WHERE method=? AND method_id=? AND data=? AND data_id=?", 
+                                    (method, method_id, data, data_id)).fetchall()
+        if len(rows) == 0:
+            return None
+        return pd.DataFrame({metric: [count, max_value, min_value, mean, math.sqrt(m2 / count)] for metric, count, max_value, min_value, mean, m2 in rows}, 
+                            index=['Count', 'Max', 'Min', 'Avg', 'Std'])
+
+
+def delete_experiments(db: Database, experiment_ids:typing.Iterable[int]) -> int:
+    """
+    Delete experiments with everything recorded for them in one transaction: their rows of experiment_list, 
+    of the result table (with the images) of their task and of detail_records, the detail_{id} tables of former versions,
+    and their scores in the setting statistics. Each table is cleaned with one `DELETE ... WHERE ... IN (...)`
+
+    Parameters
+    ----------
+    db : Database
+        The database
+    experiment_ids : typing.Iterable[int]
+        The experiment IDs, the unknown ones are ignored
+
+    Returns
+    -------
+    int
+        The number of deleted experiments
+    """
+    experiment_ids = sorted({int(i) for i in experiment_ids})
+    if len(experiment_ids) == 0 or 'experiment_list' not in db.table_names:
+        return 0
+    ids = ','.join([str(i) for i in experiment_ids])
+    with db.transaction():
+        tasks = [row[0] for row in db.cursor.execute(f"SELECT DISTINCT task FROM experiment_list WHERE id IN ({ids})")]
+        for task in tasks:
+            # the scores are read from the results, reversed before they are deleted
+            if f'setting_stats_{task}' in db.table_names:
+                SettingStatsTable(db, task).remove_experiments(experiment_ids)
+            if f'result_{task}' in db.table_names:
+                db.write(f"DELETE FROM result_{task} WHERE experiment_id IN ({ids})")
+        if 'detail_records' in db.table_names:
+            DetailRecordTable(db).remove_experiments(experiment_ids)
+        table_names = set(db.table_names)
+        for experiment_id in experiment_ids:
+            if f'detail_{experiment_id}' in table_names:
+                db.write(f"DROP TABLE detail_{experiment_id}")
+        deleted = db.write(f"DELETE FROM experiment_list WHERE id IN ({ids})").rowcount
+    return deleted
@@ -0,0 +1,293 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+
+import sqlite3
+import re
+import os
+import sys
+import json
+import bisect
+import typing
+import threading
+import contextlib
+from time import perf_counter, time
+import pandas as pd
+
+# upper bounds (ms) of the latency histogram buckets, the last bucket is unbounded
+HISTOGRAM_BOUNDS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000]
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.])")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+# queries issued from these files are attributed to the code calling into them
+_INTERNAL_FILES = {os.path.abspath(__file__), os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dbbase.py'), 
+                   os.path.abspath(contextlib.__file__)}
+
+def fingerprint(sql:str) -> str:
+    """
+    Normalize a statement so that queries differing only in their literal values share one fingerprint,
+    e.g. `SELECT * FROM result_a WHERE experiment_id IN (1,2,3)` -> `SELECT * FROM result_a WHERE experiment_id IN (...)`
+    """
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _VALUE_LIST.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+def _caller() -> str:
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename not in _INTERNAL_FILES and f'{os.sep}pandas{os.sep}' not in filename and f'{os.sep}sqlite3{os.sep}' not in filename:
+            return f'{os.path.basename(filename)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '<unknown>'
+
+class QueryTracer:
+    """
+    Records every statement executed on the traced connections: fingerprint, duration (execute and fetch), 
+    rows returned or changed and the calling code. Keeps a latency histogram per fingerprint and logs the statements 
+    slower than the threshold together with their `EXPLAIN QUERY PLAN`.
+
+    Parameters
+    ----------
+    slow_query_ms : float, optional
+        The duration above which a statement is logged as slow, by default 100
+    trace_file : str, optional
+        The path of a JSONL file every statement is appended to, by default None
+    max_slow_queries : int, optional
+        The number of slow statements kept in memory, by default 100
+    """
+    def __init__(self, slow_query_ms:float=100, trace_file:str=None, max_slow_queries:int=100) -> None:
+        self.slow_query_ms = slow_query_ms
+        self.trace_file = trace_file
+        self.max_slow_queries = max_slow_queries
+        self._lock = threading.Lock()
+        self._file = open(trace_file, 'a', buffering=1) if trace_file is not None else None
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+            self._slow = []
+
+    def record(self, conn:sqlite3.Connection, sql:str, params, duration:float, rows:int, caller:str) -> None:
+        duration_ms = duration * 1000
+        key = fingerprint(sql)
+        plan = None
+        slow = duration_ms >= self.slow_query_ms
+        if slow:
+            plan = self.explain(conn, sql, params)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                                           'histogram': [0] * (len(HISTOGRAM_BOUNDS) + 1), 'callers': {}}
+            stat['calls'] += 1
+            stat['total_ms'] += duration_ms
+            stat['max_ms'] = max(stat['max_ms'], duration_ms)
+            stat['rows'] += rows
+            stat['histogram'][bisect.bisect_left(HISTOGRAM_BOUNDS, duration_ms)] += 1
+            stat['callers'][caller] = stat['callers'].get(caller, 0) + 1
+            entry = {'time': time(), 'fingerprint': key, 'sql': sql, 'duration_ms': round(duration_ms, 4), 'rows': rows, 'caller': caller}
+            if slow:
+                entry['plan'] = plan
+                self._slow.append(entry)
+                if len(self._slow) > self.max_slow_queries:
+                    self._slow.pop(0)
+            if self._file is not None:
+                self._file.write(json.dumps(entry) + '\n')
+
+    @staticmethod
+    def explain(conn:sqlite3.Connection, sql:str, params) -> typing.Optional[typing.List[str]]:
+        try:
+            # the plain sqlite3 method, so that the EXPLAIN itself is not traced
+            rows = sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {sql}', params if params is not None else ()).fetchall()
+        except (sqlite3.Error, ValueError):
+            return None
+        return [row[-1] for row in rows]
+
+    def stats(self) -> pd.DataFrame:
+        """
+        Per fingerprint statistics, sorted by the total time spent
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns: fingerprint, calls, total_ms, mean_ms, p50_ms, p95_ms, max_ms, rows, top_caller, histogram,
+            the percentiles are the upper bounds of the histogram buckets they fall in
+        """
+        with self._lock:
+            items = [(key, dict(stat, histogram=list(stat['histogram']), callers=dict(stat['callers']))) for key, stat in self._stats.items()]
+        records = []
+        for key, stat in items:
+            records.append({
+                'fingerprint': key,
+                'calls': stat['calls'],
+                'total_ms': stat['total_ms'],
+                'mean_ms': stat['total_ms'] / stat['calls'],
+                'p50_ms': self._percentile(stat['histogram'], 0.5, stat['max_ms']),
+                'p95_ms': self._percentile(stat['histogram'], 0.95, stat['max_ms']),
+                'max_ms': stat['max_ms'],
+                'rows': stat['rows'],
+                'top_caller': max(stat['callers'], key=stat['callers'].get),
+                'histogram': stat['histogram'],
+            })
+        columns = ['fingerprint', 'calls', 'total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms', 'rows', 'top_caller', 'histogram']
+        return pd.DataFrame(records, columns=columns).sort_values('total_ms', ascending=False, ignore_index=True)
+
+    @staticmethod
+    def _percentile(histogram:typing.List[int], q:float, max_ms:float) -> float:
+        target = q * sum(histogram)
+        count = 0
+        for i, n in enumerate(histogram):
+            count += n
+            if count >= target:
+                return min(HISTOGRAM_BOUNDS[i], max_ms) if i < len(HISTOGRAM_BOUNDS) else max_ms
+        return max_ms
+
+    def slow_queries(self) -> typing.List[dict]:
+        with self._lock:
+            return list(self._slow)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class TracingCursor(sqlite3.Cursor):
+    """
+    Cursor reporting each statement to the tracer of its connection, 
+    the time spent fetching the rows is added to the statement until the result is exhausted or the next statement runs
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._pending = None
+
+    def _finish(self) -> None:
+        pending, self._pending = self._pending, None
+        if pending is not None and self.connection.tracer is not None:
+            self.connection.tracer.record(self.connection, *pending)
+
+    def _start(self, sql:str, params, duration:float, caller:str) -> None:
+        # rows changed for DML, rows are counted while fetching for queries
+        rows = max(self.rowcount, 0) if self.description is None else 0
+        self._pending = [sql, params, duration, rows, caller]
+        if self.description is None:
+            self._finish()
+
+    def _fetched(self, rows:int, duration:float, exhausted:bool) -> None:
+        if self._pending is not None:
+            self._pending[2] += duration
+            self._pending[3] += rows
+            if exhausted:
+                self._finish()
+
+    def execute(self, sql:str, parameters=()):
+        self._finish()
+        caller = _caller()
+        start = perf_counter()
+        super().execute(sql, parameters)
+        self._start(sql, parameters, perf_counter() - start, caller)
+        return self
+
+    def executemany(self, sql:str, seq_of_parameters):
+        self._finish()
+        caller = _caller()
+        seq_of_parameters = list(seq_of_parameters)
+        start = perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._start(sql, seq_of_parameters[0] if seq_of_parameters else None, perf_counter() - start, caller)
+        return self
+
+    def executescript(self, sql_script:str):
+        self._finish()
+        caller = _caller()
+        start = perf_counter()
+        super().executescript(sql_script)
+        self._pending = [sql_script, None, perf_counter() - start, 0, caller]
+        self._finish()
+        return self
+
+    def fetchone(self):
+        start = perf_counter()
+        row = super().fetchone()
+        self._fetched(row is not None, perf_counter() - start, row is None)
+        return row
+
+    def fetchmany(self, size:int=None):
+        size = self.arraysize if size is None else size
+        start = perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(len(rows), perf_counter() - start, len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), perf_counter() - start, True)
+        return rows
+
+    def __next__(self):
+        start = perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(0, perf_counter() - start, True)
+            raise
+        self._fetched(1, perf_counter() - start, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+class TracingConnection(sqlite3.Connection):
+    """
+    Connection whose cursors (including the ones of `execute()` shortcuts and pandas) are `TracingCursor`,
+    statements are recorded into `tracer`, or not at all when it is None
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.tracer = None
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql:str, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql:str, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script:str):
+        return self.cursor().executescript(sql_script)
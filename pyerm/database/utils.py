@@ -22,11 +22,10 @@
 
 # Version: 0.3.9
 
-from time import time
 import pandas as pd
 import numpy as np
 import re
-from datetime import datetime
+import warnings
 import typing
 
 from .dbbase import Database
@@ -57,82 +56,205 @@ def value2def(v):
     else:
         return 'TEXT'
 
-def delete_failed_experiments(db:Database):
-    experiment_table = db['experiment_list']
-    failed_experiments = experiment_table.select('id', 'task', where="status='failed'")
-    for experiment in failed_experiments:
-        experiment_id = experiment[0]
-        task = experiment[1]
-        task_table = db[f"result_{task}"]
-        task_table.delete(f"experiment_id={experiment_id}")
-        experiment_table.delete(f"id={experiment_id}")
-
-    # delete stuck running experiments that have been running for more than 24 hours
-    running_experiments = experiment_table.select('id', 'task', 'start_time', where="status='running'")
-    for experiment in running_experiments:
-        experiment_id = experiment[0]
-        task = experiment[1]
-        if time() - datetime.strptime(experiment[2], "%Y-%m-%d %H:%M:%S").timestamp() > 86400:
-            task_table = db[f"result_{task}"]
-            task_table.delete(f"experiment_id={experiment_id}")
-            experiment_table.delete(f"id={experiment_id}")
-
-def get_result_statistics(db, task, method, method_id, data, data_id):
-    same_setting_id_sql = f"SELECT id FROM experiment_list WHERE method='{method}' AND method_id={method_id} AND data='{data}' AND data_id={data_id} AND task='{task}' AND status='finished'"
+def delete_failed_experiments(db:Database, timeout:float=300, max_age:float=86400) -> int:
+    """
+    Delete the failed experiments and the stale ones, the running experiments without a heartbeat for `timeout` seconds 
+    or, without heartbeats, started more than `max_age` seconds ago, see `ExperimentTable.stale_experiments()`
+    """
+    from .tables import ExperimentTable, delete_experiments
+    if 'experiment_list' not in db.table_names:
+        return 0
+    with db.transaction():
+        experiment_table = ExperimentTable(db)
+        experiment_table.mark_stale_experiments(timeout, max_age)
+        experiment_ids = [row[0] for row in experiment_table.select('id', where="status='failed'", other='ORDER BY id')]
+        return delete_experiments(db, experiment_ids)
+
+def parse_experiment_ids(spec:str) -> typing.List[int]:
+    """
+    The experiment IDs of a list of IDs and ranges such as '1-20, 25 31'
+    """
+    experiment_ids = []
+    for part in re.split(r'[,\s]+', spec.strip()):
+        if part == '':
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            experiment_ids.extend(range(int(first), int(last) + 1))
+        else:
+            experiment_ids.append(int(part))
+    return experiment_ids
+
+def select_experiment_ids(db:Database, experiment_ids:typing.Iterable[int]=None, where:str=None) -> typing.List[int]:
+    """
+    The IDs of the recorded experiments among `experiment_ids` (all if None) matching the condition `where` on experiment_list
+    """
+    conditions = []
+    if experiment_ids is not None:
+        conditions.append(f"id IN ({','.join([str(int(i)) for i in experiment_ids])})")
+    if where:
+        conditions.append(f"({where})")
+    if 'experiment_list' not in db.table_names:
+        return []
+    return [row[0] for row in db['experiment_list'].select('id', where=' AND '.join(conditions) if conditions else None, other='ORDER BY id')]
+
+def get_result_statistics(db, task, method, method_id, data, data_id, quantiles:typing.Sequence[float]=None):
+    same_setting_id_sql = f"SELECT id FROM experiment_list WHERE method='{method}' AND method_id={method_id} AND data='{data}' AND data_id={data_id} AND task='{task}' AND status='finished' ORDER BY id"
     same_setting_id = db.conn.execute(same_setting_id_sql).fetchall()
     # print(same_setting_id)
     if len(same_setting_id) == 0:
         return None, []
     same_setting_id = [str(i[0]) for i in same_setting_id]
-    return get_result_statistics_by_ids(db, task, same_setting_id), same_setting_id
+    return get_result_statistics_by_ids(db, task, same_setting_id, quantiles), same_setting_id
     
-def get_result_statistics_by_ids(db, task, same_setting_id):
+def get_result_statistics_by_ids(db, task, same_setting_id, quantiles:typing.Sequence[float]=None):
     result_table = db[f'result_{task}']
     score_columns = [col for col in result_table.columns if not col.startswith("image_") and not col=="experiment_id"]
-    same_setting_id_sql = ','.join(same_setting_id)
-    # print(same_setting_id_sql)
-    
-    max_score_sql = f"SELECT {','.join([f'MAX({col}) AS {col}' for col in score_columns])} FROM result_{task} WHERE experiment_id IN ({same_setting_id_sql})"
-    max_score = pd.read_sql_query(max_score_sql, db.conn)
-    min_score_sql = f"SELECT {','.join([f'MIN({col}) AS {col}' for col in score_columns])} FROM result_{task} WHERE experiment_id IN ({same_setting_id_sql})"
-    min_score = pd.read_sql_query(min_score_sql, db.conn)
-    avg_score_sql = f"SELECT {','.join([f'AVG({col}) AS {col}' for col in score_columns])} FROM result_{task} WHERE experiment_id IN ({same_setting_id_sql})"
-    avg_score = pd.read_sql_query(avg_score_sql, db.conn)
-
-
-    std_queries = [
-        f"""(SELECT AVG(({col} - sub.avg_{col}) * ({col} - sub.avg_{col})) AS var_{col}
-             FROM result_{task}, 
-             (SELECT AVG({col}) AS avg_{col} FROM result_{task} WHERE experiment_id IN ({same_setting_id_sql})) AS sub
-             WHERE experiment_id IN ({same_setting_id_sql})) AS var_{col}"""
-        for col in score_columns
-    ]
-    std_score_sql = f"SELECT {', '.join(std_queries)}"
-    var_score = pd.read_sql_query(std_score_sql, db.conn)
-    var_score = var_score.astype('float64')
-    std_score = var_score.apply(np.sqrt)
-    std_score.columns = [col.replace('var_', '') for col in std_score.columns]
-    
-    
-    median_queries = [
-        f"""(SELECT AVG({col}) FROM 
-            (SELECT {col} FROM result_{task} 
-             WHERE experiment_id IN ({same_setting_id_sql}) 
-             ORDER BY {col} 
-             LIMIT 2 - (SELECT COUNT(*) FROM result_{task} 
-                        WHERE experiment_id IN ({same_setting_id_sql})) % 2 
-             OFFSET (SELECT (COUNT(*) - 1) / 2 FROM result_{task} 
-                     WHERE experiment_id IN ({same_setting_id_sql}))) AS median_{col}) AS {col}"""
-        for col in score_columns
-    ]
-    median_score_sql = f"SELECT {', '.join(median_queries)}"
-    median_score = pd.read_sql_query(median_score_sql, db.conn)
-    rst = pd.concat([max_score, min_score, avg_score, std_score, median_score], axis=0)
-    rst.index = ['Max', 'Min', 'Avg', 'Std', 'Median']
-    return rst
-    
-    
+    same_setting_id_sql = ','.join([str(i) for i in same_setting_id])
+    # one fetch of the metric columns, every statistic is computed from it
+    values = result_table.select_columns(*score_columns, where=f"experiment_id IN ({same_setting_id_sql})") if score_columns else {}
+    return describe_scores(values, quantiles)
+
+def describe_scores(values:typing.Dict[str, np.ndarray], quantiles:typing.Sequence[float]=None) -> pd.DataFrame:
+    """
+    Max, Min, Avg, Std (population) and Median of each score column, and the given quantiles as rows 'Q{q}',
+    NULL and non-numeric values are ignored like the SQL aggregates do
+
+    Parameters
+    ----------
+    values : typing.Dict[str, np.ndarray]
+        Column name -> scores, e.g. from `Table.select_columns()`
+    quantiles : typing.Sequence[float], optional
+        Additional quantiles in [0, 1], by default None
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per statistic, one column per score column
+    """
+    quantiles = list(quantiles) if quantiles is not None else []
+    index = ['Max', 'Min', 'Avg', 'Std', 'Median'] + [f'Q{q:g}' for q in quantiles]
+    columns = list(values.keys())
+    scores = np.column_stack([_as_float(values[col]) for col in columns]) if columns else np.empty((0, 0))
+    if scores.shape[0] == 0:
+        return pd.DataFrame(np.full((len(index), len(columns)), np.nan), index=index, columns=columns)
+    with warnings.catch_warnings():
+        # columns without any value give NaN
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        percentiles = np.nanquantile(scores, [0.5, *quantiles], axis=0)
+        rst = np.vstack([
+            np.nanmax(scores, axis=0),
+            np.nanmin(scores, axis=0),
+            np.nanmean(scores, axis=0),
+            np.nanstd(scores, axis=0),
+            percentiles,
+        ])
+    return pd.DataFrame(rst, index=index, columns=columns)
+
+def _as_float(array:np.ndarray) -> np.ndarray:
+    if array.dtype.kind in 'iufb':
+        return array.astype(np.float64)
+    return pd.to_numeric(array, errors='coerce').astype(np.float64)
     
+SETTING_COLUMNS = ['method', 'method_id', 'data', 'data_id']
+
+def setting_results(db:Database, task:str, score_columns:typing.List[str]=None, where:str=None, 
+                    extra_columns:typing.List[str]=None) -> pd.DataFrame:
+    """
+    The results of all finished experiments of a task with their setting, from one join of experiment_list and result_{task}
+
+    Parameters
+    ----------
+    db : Database
+        The database
+    task : str
+        The task
+    score_columns : typing.List[str], optional
+        The score columns, by default all columns of the result table except the images
+    where : str, optional
+        Additional condition, experiment_list is aliased as `e` and the result table as `r`, by default None
+    extra_columns : typing.List[str], optional
+        Other experiment_list columns to select, by default None
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns: experiment_id, method, method_id, data, data_id, extra columns, score columns, ordered by experiment_id
+    """
+    if score_columns is None:
+        score_columns = [col for col in db[f'result_{task}'].columns if not col.startswith("image_") and not col=="experiment_id"]
+    experiment_columns = list(dict.fromkeys(SETTING_COLUMNS + (extra_columns or [])))
+    select_columns = ['e.id AS experiment_id'] + [f'e.{col}' for col in experiment_columns] + [f'r.{col}' for col in score_columns]
+    where_clause = f' AND ({where})' if where else ''
+    sql = f"SELECT {', '.join(select_columns)} FROM experiment_list AS e INNER JOIN result_{task} AS r ON r.experiment_id = e.id \
+        WHERE e.task = ? AND e.status = 'finished'{where_clause} ORDER BY e.id"
+    results = pd.read_sql_query(sql, db.conn, params=(task,))
+    for col in score_columns:
+        results[col] = _as_float(results[col].to_numpy())
+    return results
+
+def group_statistics(db:Database, task:str, by:typing.List[str]=None, score_columns:typing.List[str]=None, where:str=None, 
+                     quantiles:typing.Sequence[float]=None) -> pd.DataFrame:
+    """
+    Statistics of the finished experiments of a task for every group (by default every setting) at once,
+    the results are fetched with a single join and aggregated per group with vectorized pandas group-by reductions
+
+    Parameters
+    ----------
+    db : Database
+        The database
+    task : str
+        The task
+    by : typing.List[str], optional
+        The experiment_list columns to group by, by default ['method', 'method_id', 'data', 'data_id']
+    score_columns : typing.List[str], optional
+        The score columns, by default all columns of the result table except the images
+    where : str, optional
+        Additional condition, experiment_list is aliased as `e` and the result table as `r`, by default None
+    quantiles : typing.Sequence[float], optional
+        Additional quantiles in [0, 1], as statistics 'Q{q}', by default None
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by the group, columns are (statistic, score column) with the statistics 
+        'Count', 'Max', 'Min', 'Avg', 'Std' (population), 'Median' and the quantiles, e.g. `stats['Avg']['acc']`
+    """
+    by = list(by) if by is not None else SETTING_COLUMNS
+    results = setting_results(db, task, score_columns, where, extra_columns=by)
+    score_columns = [col for col in results.columns if col not in by and col != 'experiment_id' and col not in SETTING_COLUMNS]
+    grouped = results.groupby(by, sort=True)[score_columns]
+    statistics = {
+        'Count': grouped.count(),
+        'Max': grouped.max(),
+        'Min': grouped.min(),
+        'Avg': grouped.mean(),
+        'Std': grouped.std(ddof=0),
+        'Median': grouped.median(),
+    }
+    for q in (quantiles or []):
+        statistics[f'Q{q:g}'] = grouped.quantile(q)
+    return pd.concat(statistics, axis=1)
+
+def best_experiments(db:Database, task:str, score_column:str, type_flag:typing.Literal['max', 'min']='max', by:typing.List[str]=None, 
+                     where:str=None) -> pd.DataFrame:
+    """
+    The experiment with the highest (or lowest) score in every group (by default every setting), 
+    ties go to the earliest experiment, groups without any score are left out
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns: experiment_id, the group columns, remark, score_column
+    """
+    if type_flag not in ('max', 'min'):
+        raise ValueError('type_flag should be either "max" or "min".')
+    by = list(by) if by is not None else SETTING_COLUMNS
+    results = setting_results(db, task, [score_column], where, extra_columns=by + ['remark']).dropna(subset=[score_column])
+    grouped = results.groupby(by, sort=True)[score_column]
+    best = grouped.idxmax() if type_flag == 'max' else grouped.idxmin()
+    return results.loc[best.to_numpy(), ['experiment_id', *by, 'remark', score_column]].reset_index(drop=True)
+
 def split_result_info(result_info:pd.DataFrame):
     columns_keep = [col for col in result_info.columns if not col.startswith("image_") and not col=="experiment_id"]
     pattern = re.compile(r'image_(\d+)$')
@@ -0,0 +1,218 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+
+import atexit
+import queue
+import sys
+import threading
+import traceback
+import typing
+from concurrent.futures import Future
+
+from .dbbase import Database
+from .tables import ExperimentTable
+
+class AsyncWriter:
+    """
+    Dedicated writer thread of a `Database`, write operations are queued by the caller and executed in order on the writer thread,
+    the operations waiting in the queue are coalesced into one transaction. The queue is bounded, so a caller producing writes 
+    faster than the database can take them is blocked in `submit()` instead of growing the memory without limit.
+    The queue is drained when the interpreter exits.
+
+    Parameters
+    ----------
+    db : Database
+        The database, the writer thread uses its own connection of it
+    max_queue : int, optional
+        The maximum number of queued operations, by default 1024
+    max_batch : int, optional
+        The maximum number of operations in one transaction, by default 256
+    """
+    def __init__(self, db:Database, max_queue:int=1024, max_batch:int=256) -> None:
+        self.db = db
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._errors = []
+        self._errors_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='pyerm-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, fn:typing.Callable, *args, prepare:typing.Callable=None) -> Future:
+        """
+        Queue `fn(*args)` to run on the writer thread, blocks while the queue is full.
+        Its error, if any, is also raised by the next `flush()`.
+        `prepare(*args)`, if given, runs on the writer thread before the transaction and returns the arguments for `fn`, 
+        for work that does not need the database (e.g. encoding images), so it does not hold the write lock.
+
+        Returns
+        -------
+        Future
+            Resolved with the return value of `fn` once its transaction is committed
+        """
+        return self._put(fn, args, prepare, detached=True)
+
+    def call(self, fn:typing.Callable, *args):
+        """
+        Queue `fn(*args)` behind the writes already queued and wait for its result
+        """
+        return self._put(fn, args, None, detached=False).result()
+
+    def _put(self, fn:typing.Callable, args:tuple, prepare:typing.Callable, detached:bool) -> Future:
+        if self._closed:
+            raise RuntimeError('The writer is closed')
+        future = Future()
+        future.detached = detached
+        self._queue.put([fn, args, prepare, future])
+        return future
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._execute(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _execute(self, batch:list) -> None:
+        prepared = []
+        for item in batch:
+            fn, args, prepare, future = item
+            if prepare is None:
+                prepared.append(item)
+                continue
+            try:
+                # prepared once, a retried operation keeps its prepared arguments
+                item[1], item[2] = prepare(*args), None
+                prepared.append(item)
+            except BaseException:
+                self._fail(future, sys.exc_info()[1])
+        batch = prepared
+        if len(batch) == 0:
+            return
+        def run_batch():
+            return [fn(*args) for fn, args, _, _ in batch]
+        try:
+            # retried as a whole while the database is locked by other processes
+            results = self.db.run_transaction(run_batch)
+        except BaseException:
+            if len(batch) == 1:
+                self._fail(batch[0][3], sys.exc_info()[1])
+                return
+            # one operation failed and the batch was rolled back, run them one by one so that only the failing one is lost
+            for item in batch:
+                self._execute([item])
+            return
+        for (_, _, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _fail(self, future:Future, error:BaseException) -> None:
+        future.set_exception(error)
+        if not future.detached:
+            # raised to the waiting caller
+            return
+        with self._errors_lock:
+            self._errors.append(error)
+        print(f"pyerm writer: a queued write failed\n{''.join(traceback.format_exception(type(error), error, error.__traceback__))}", file=sys.stderr)
+
+    def flush(self) -> None:
+        """
+        Wait until every queued operation is committed, raises the first error of the operations failed since the last flush
+        """
+        self._queue.join()
+        with self._errors_lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        """
+        Drain the queue and stop the writer thread, raises like `flush()`
+        """
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(None)
+        self._thread.join()
+        self.flush()
+
+
+class Heartbeat:
+    """
+    Thread updating `last_heartbeat` of the running experiment of an `Experiment` every `interval` seconds,
+    so a run whose process is gone is found stale minutes later instead of after 24 hours, see `ExperimentTable.stale_experiments()`.
+    A failed heartbeat (e.g. the database locked out) is reported and retried at the next one.
+
+    Parameters
+    ----------
+    db : Database
+        The database, the thread uses its own connection of it
+    get_experiment_id : typing.Callable[[], typing.Optional[int]]
+        Returns the ID of the running experiment, None between experiments
+    interval : float, optional
+        The seconds between two heartbeats, by default 60
+    """
+    def __init__(self, db:Database, get_experiment_id:typing.Callable[[], typing.Optional[int]], interval:float=60) -> None:
+        self.db = db
+        self.interval = interval
+        self.get_experiment_id = get_experiment_id
+        self._table = ExperimentTable(db)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='pyerm-heartbeat', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            experiment_id = self.get_experiment_id()
+            if experiment_id is None:
+                continue
+            try:
+                self.db.run_transaction(self._table.heartbeat, [experiment_id])
+            except Exception as e:
+                print(f"pyerm heartbeat: failed for experiment {experiment_id}: {e}", file=sys.stderr)
+
+    def close(self) -> None:
+        """
+        Stop the thread
+        """
+        self._stop.set()
+        self._thread.join()
@@ -20,44 +20,77 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-# Version: 0.1.9
-import sqlite3
+# Version: 0.3.9
 import argparse
+import glob
 import os
+import sys
+from time import perf_counter
 
-from pyerm.database.dbbase import Table, Database
-
-def copy_table(db1:Database, db2:Database, table_name:str):
-    table = Table(db2, table_name)
-    columns = [info[1] for info in db2.cursor.execute(f"PRAGMA table_info({table_name})").fetchall() if info[1] not in table.primary_key]
-    columns_list_str = ', '.join(columns)  
-    placeholders = ', '.join(['?'] * len(columns))  
-    insert_stmt = f"INSERT INTO {table_name} ({columns_list_str}) VALUES ({placeholders})"
-    rows = db2.cursor.execute(f"SELECT {columns_list_str} FROM {table_name}").fetchall()
-    for row in rows:
-        try:
-            db1.cursor.execute(insert_stmt, row)
-        except sqlite3.IntegrityError:
-            pass
-    db1.conn.commit()
+from pyerm.database.dbbase import Database
+from pyerm.database.merge import merge_database, ParallelMerger
 
 def merge_db(db_path1:str, db_path2:str):
     db1 = Database(db_path1)
-    db2 = Database(db_path2)
-    for table_name in db2.table_names:
-        copy_table(db1, db2, table_name)
+    counts = merge_database(db1, db_path2)
+    db1.close()
+    return counts
+
+def expand_sources(patterns:list) -> list:
+    # a quoted glob is expanded here, e.g. for more sources than the command line can hold
+    paths = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern)))
+        else:
+            paths.append(pattern)
+    return paths
+
+def merge_dbs(db_path:str, source_paths:list, workers:int=None, batch_size:int=2 ** 30, skip_invalid:bool=False, verbose:bool=True):
+    start = perf_counter()
+    rows = 0
+
+    def progress(done, total, path, counts):
+        nonlocal rows
+        rows += sum(counts.values())
+        if verbose:
+            elapsed = perf_counter() - start
+            print(f"[{done}/{total}] {path}: {sum(counts.values())} rows, {rows / max(elapsed, 1e-9):.0f} rows/s")
+
+    db = Database(db_path)
+    merger = ParallelMerger(db, workers, batch_size, progress)
+    try:
+        results = merger.merge(source_paths, skip_invalid)
+    finally:
+        db.close()
+    return results, merger
 
 def main():
-    parser = argparse.ArgumentParser(description='Merge two SQLite databases. For now, the merged two databases must have the same schema.')
+    parser = argparse.ArgumentParser(description='Merge the source databases into the destination database, the experiments are added with new IDs and their results, details and settings mapped to them. The sources are prepared in a process pool and merged in batches of one transaction each, the sources merged are recorded in the destination and skipped when it is run again, e.g. after an interruption.')
     parser.add_argument('db_path_destination', type=str, help='Destination database file path.')
-    parser.add_argument('db_path_source', type=str, help='Source database file path.')
+    parser.add_argument('db_path_source', type=str, nargs='+', help='Source database file paths or glob patterns.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes preparing the sources, by default the number of CPUs.')
+    parser.add_argument('--batch-size', type=int, default=1024, help='Size in MB of the source files merged in one transaction at most, by default 1024.')
+    parser.add_argument('--skip-invalid', action='store_true', help='Merge the valid sources when some are invalid instead of merging nothing.')
+    parser.add_argument('--quiet', action='store_true', help='Do not print the progress of every source.')
     args = parser.parse_args()
     if not os.path.exists(args.db_path_destination):
         raise FileNotFoundError(f"The database file {args.db_path_destination} does not exist")
-    if not os.path.exists(args.db_path_source):
-        raise FileNotFoundError(f"The database file {args.db_path_source} does not exist")
-    merge_db(args.db_path_destination, args.db_path_source)
+    source_paths = expand_sources(args.db_path_source)
+    if len(source_paths) == 0:
+        raise FileNotFoundError(f"No source database matches {' '.join(args.db_path_source)}")
+    start = perf_counter()
+    results, merger = merge_dbs(args.db_path_destination, source_paths, args.workers, args.batch_size * 2 ** 20, args.skip_invalid, not args.quiet)
+    elapsed = perf_counter() - start
+    for path, error in merger.invalid.items():
+        print(f"Skipped invalid source {path}: {error}", file=sys.stderr)
+    for path, table_name, column, column_type, source_type in merger.conflicts:
+        print(f"Column {table_name}.{column} is {source_type} in {path}, kept as {column_type}", file=sys.stderr)
+    if len(merger.skipped) > 0:
+        print(f"Skipped {len(merger.skipped)} sources already merged")
+    rows = sum(sum(counts.values()) for counts in results.values())
+    print(f"Merged {rows} rows of {len(results)} sources in {elapsed:.2f} s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
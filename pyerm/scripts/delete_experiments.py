@@ -0,0 +1,59 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+import argparse
+import os
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import delete_experiments
+from pyerm.database.utils import parse_experiment_ids, select_experiment_ids
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete experiments with their results, images, details and setting statistics in one transaction.')
+    parser.add_argument('db_path', type=str, help='Database file path.')
+    parser.add_argument('ids', type=str, nargs='*', help='Experiment IDs and ranges, such as 1-20 25.')
+    parser.add_argument('--where', type=str, default=None, help="SQL condition on experiment_list, such as \"status='failed' AND task='cls'\".")
+    parser.add_argument('--failed', action='store_true', help='Delete the failed experiments.')
+    parser.add_argument('--dry-run', action='store_true', help='Only print the matching experiment IDs.')
+    parser.add_argument('--vacuum', action='store_true', help='Shrink the database file with VACUUM after deleting.')
+    args = parser.parse_args()
+    if not os.path.exists(args.db_path):
+        raise FileNotFoundError(f"The database file {args.db_path} does not exist")
+    if len(args.ids) == 0 and args.where is None and not args.failed:
+        parser.error('give experiment IDs, --where or --failed')
+    where = ' AND '.join([f"({condition})" for condition in (args.where, "status='failed'" if args.failed else None) if condition])
+    db = Database(args.db_path)
+    experiment_ids = select_experiment_ids(db, parse_experiment_ids(' '.join(args.ids)) if len(args.ids) > 0 else None, where)
+    if args.dry_run:
+        print(f"{len(experiment_ids)} experiments match: {', '.join([str(i) for i in experiment_ids])}")
+    else:
+        deleted = delete_experiments(db, experiment_ids)
+        if args.vacuum and deleted > 0:
+            db.conn.execute('VACUUM')
+        print(f'Deleted {deleted} experiments')
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -20,31 +20,209 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-# Version: 0.2.4
+# Version: 0.3.9
 
 import PIL.Image as Image
 import io
-import pandas as pd
+import re
 import sqlite3
 import argparse
 import os
 import shutil
+import xlsxwriter
 from zipfile import ZipFile
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
 USER_HOME = os.path.expanduser('~')
+# the rows of a worksheet, the header included, the rows after it continue on another worksheet
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_SHEET_NAME = 31
+# the signatures of the image formats, the extension of an image file written as it is stored
+IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tif'),
+    (b'MM\x00*', 'tif'),
+    (b'%PDF', 'pdf'),
+]
+IMAGE_HEAD_SIZE = 16
 
-def save_image(row, col, output_img_dir, output_path):
-    img_data = getattr(row, col)
-    if img_data is not None:
+def image_extension(head:bytes) -> str:
+    """
+    The file extension of an image from its first bytes, 'bin' if the format is unknown
+    """
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head.lstrip()[:5] in (b'<?xml', b'<svg ', b'<svg>'):
+        return 'svg'
+    return 'bin'
+
+def format_extension(image_format:str) -> str:
+    # the extension of a format of PIL, e.g. JPEG -> jpg
+    extensions = [extension for extension, extension_format in Image.registered_extensions().items() if extension_format == image_format.upper()]
+    if len(extensions) == 0:
+        raise ValueError(f"Unknown image format {image_format}")
+    return 'jpg' if '.jpg' in extensions else extensions[0][1:]
+
+def write_image(conn:sqlite3.Connection, table_name:str, col:str, experiment_id:int, img_base_path:str) -> str:
+    """
+    Write the image stored in the column `col` of the result of `experiment_id` to a file as it is, without decoding it, 
+    streamed from the database by its row ID. The extension is its format sniffed from the first bytes
+
+    Returns
+    -------
+    str
+        The path of the image file, `img_base_path` with the extension
+    """
+    if hasattr(conn, 'blobopen'):
+        # the experiment ID of a result table is its row ID
+        with conn.blobopen(table_name, col, experiment_id, readonly=True) as blob:
+            img_abs_path = f"{img_base_path}.{image_extension(blob.read(IMAGE_HEAD_SIZE))}"
+            blob.seek(0)
+            with open(img_abs_path, 'wb') as f:
+                shutil.copyfileobj(blob, f, 2 ** 20)
+        return img_abs_path
+    img_data = conn.execute(f"SELECT {_quote(col)} FROM {_quote(table_name)} WHERE experiment_id=?", (experiment_id,)).fetchone()[0]
+    img_abs_path = f"{img_base_path}.{image_extension(img_data[:IMAGE_HEAD_SIZE])}"
+    with open(img_abs_path, 'wb') as f:
+        f.write(img_data)
+    return img_abs_path
+
+def transcode_image(img_data:bytes, img_abs_path:str, image_format:str=None, max_size:tuple=None):
+    """
+    Decode an image, shrink it to fit in `max_size` (width, height) keeping its aspect ratio and save it in `image_format`, 
+    in a worker process of the export. Bytes which are not an image are written as they are
+    """
+    try:
         img = Image.open(io.BytesIO(img_data))
-        img_abs_path = os.path.join(output_img_dir, f"ID{row.experiment_id}_{col}.png")
-        img.save(img_abs_path)
-        img_rel_path = os.path.relpath(img_abs_path, os.path.dirname(output_path))
-        return img_rel_path
-    return None
+        img_format = image_format or img.format
+        if max_size is not None:
+            img.thumbnail(max_size)
+        if img_format.upper() == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        img.save(img_abs_path, format=img_format)
+    except Image.UnidentifiedImageError:
+        with open(img_abs_path, 'wb') as f:
+            f.write(img_data)
+
+def _quote(name:str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _cell(column:str) -> str:
+    # the size of a BLOB instead of its content, typeof() and length() do not read it
+    quoted = _quote(column)
+    return f"CASE WHEN typeof({quoted})='blob' THEN '<BLOB ' || length({quoted}) || ' bytes>' ELSE {quoted} END"
+
+def _image_columns(conn:sqlite3.Connection, table_name:str, columns:list) -> list:
+    # the images of a result table with a name, written to files and linked from their cells
+    image_columns = []
+    for col in columns:
+        if col.startswith("image_") and not col.endswith("_name") and f"{col}_name" in columns:
+            if conn.execute(f"SELECT 1 FROM {_quote(table_name)} WHERE {_quote(col + '_name')} IS NOT NULL LIMIT 1").fetchone() is not None:
+                image_columns.append(col)
+    return image_columns
+
+def _sheet_name(workbook:xlsxwriter.Workbook, name:str, suffix:str="") -> str:
+    # a valid name of Excel for a new worksheet: without the characters it forbids, cut to its length limit with the suffix kept, 
+    # and numbered if the cut name is already used (case ignored, as Excel does)
+    name = re.sub(r"[\[\]:*?/\\]", "_", name).strip("'") or "Sheet"
+    used = {worksheet.name.lower() for worksheet in workbook.worksheets()}
+    candidate = name[:EXCEL_MAX_SHEET_NAME - len(suffix)].rstrip("'") + suffix
+    number = 1
+    while candidate.lower() in used:
+        number += 1
+        tail = f"{suffix}~{number}"
+        candidate = name[:EXCEL_MAX_SHEET_NAME - len(tail)].rstrip("'") + tail
+    return candidate
+
+class _SheetWriter:
+    # rows written in order as xlsxwriter's constant_memory mode needs, continued on a new worksheet at the row limit of Excel
+    def __init__(self, workbook:xlsxwriter.Workbook, sheet_name:str, columns:list, header_format) -> None:
+        self.workbook = workbook
+        self.sheet_name = sheet_name
+        self.columns = columns
+        self.header_format = header_format
+        self.part = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.part += 1
+        suffix = f"_{self.part}" if self.part > 1 else ""
+        self.worksheet = self.workbook.add_worksheet(_sheet_name(self.workbook, self.sheet_name, suffix))
+        for col_num, col in enumerate(self.columns):
+            self.worksheet.write(0, col_num, col, self.header_format)
+        self.row_num = 0
+
+    def next_row(self) -> int:
+        if self.row_num == EXCEL_MAX_ROWS - 1:
+            self._new_sheet()
+        self.row_num += 1
+        return self.row_num
+
+def export_table(conn:sqlite3.Connection, workbook:xlsxwriter.Workbook, header_format, table_name:str, is_table:bool, 
+                 output_img_dir:str, output_path:str, chunk_size:int=1000, executor:ProcessPoolExecutor=None, 
+                 image_format:str=None, max_size:tuple=None, max_pending:int=16):
+    """
+    Write the table or view `table_name` to a worksheet, reading `chunk_size` rows at a time without their BLOBs. 
+    The images of a result table are read one by one by their experiment ID and written to files as they are stored, 
+    or transcoded by the processes of `executor` (to `image_format`, shrunk to fit in `max_size`) with `max_pending` of them in memory at most. 
+    Their cells link to the files
+    """
+    # the columns of SELECT *, generated ones included
+    columns = [column[1] for column in conn.execute(f"PRAGMA table_xinfo({_quote(table_name)})").fetchall() if column[6] != 1]
+    image_columns = _image_columns(conn, table_name, columns) if is_table and table_name.startswith("result_") else []
+    image_positions = {columns.index(col): (col, columns.index(f"{col}_name")) for col in image_columns}
+    id_position = columns.index("experiment_id") if image_columns else None
+    sheet = _SheetWriter(workbook, table_name, columns, header_format)
+    cursor = conn.execute(f"SELECT {', '.join([_cell(col) for col in columns])} FROM {_quote(table_name)}")
+    pending = set()
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if len(rows) == 0:
+            break
+        for row in rows:
+            row_num = sheet.next_row()
+            for col_num, cell_value in enumerate(row):
+                if col_num not in image_positions or cell_value is None:
+                    sheet.worksheet.write(row_num, col_num, cell_value)
+                    continue
+                col, name_position = image_positions[col_num]
+                experiment_id = row[id_position]
+                img_base_path = os.path.join(output_img_dir, f"ID{experiment_id}_{col}")
+                if executor is None:
+                    img_abs_path = write_image(conn, table_name, col, experiment_id, img_base_path)
+                else:
+                    img_data = conn.execute(f"SELECT {_quote(col)} FROM {_quote(table_name)} WHERE experiment_id=?", (experiment_id,)).fetchone()[0]
+                    extension = format_extension(image_format) if image_format is not None else image_extension(img_data[:IMAGE_HEAD_SIZE])
+                    img_abs_path = f"{img_base_path}.{extension}"
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(executor.submit(transcode_image, img_data, img_abs_path, image_format, max_size))
+                img_rel_path = os.path.relpath(img_abs_path, os.path.dirname(output_path))
+                # a link to a local file relative to the workbook
+                sheet.worksheet.write_url(row_num, col_num, f"external:{img_rel_path}", string=row[name_position])
+    for future in pending:
+        future.result()
+
+def export_data(db_path:str, output_dir:str, chunk_size:int=1000, image_format:str=None, max_size:tuple=None, workers:int=None):
+    """
+    Export the tables and views of the database to an Excel file and the result images to files, zipped together. 
+    The images are written as they are stored unless `image_format` (a format of PIL, e.g. 'JPEG') or `max_size` 
+    (width, height) is given, then they are transcoded in `workers` processes (by default the number of CPUs)
 
-def export_data(db_path:str, output_dir:str):
+    Returns
+    -------
+    str
+        The path of the zip file
+    """
     db_name = os.path.basename(db_path)
     db_name = os.path.splitext(db_name)[0]
     output_path = os.path.join(output_dir, db_name, f"{db_name}.xlsx")
@@ -53,27 +231,23 @@ def export_data(db_path:str, output_dir:str):
     os.makedirs(output_img_dir, exist_ok=True)
 
     conn = sqlite3.connect(db_path)
-    table_names = pd.read_sql_query("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')", conn)
-    writer = pd.ExcelWriter(output_path, engine='xlsxwriter')
-
-    for table_name in table_names['name']:
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-        if table_name.startswith("result_"):
-            for col in df.columns:
-                if col.startswith("image_") and not col.endswith("_name") and not df[f"{col}_name"].isnull().all():
-                    with ThreadPoolExecutor() as executor:
-                        img_paths = list(executor.map(lambda row: save_image(row, col, output_img_dir, output_path), df.itertuples()))
-                    df[col] = img_paths
-        df.to_excel(writer, sheet_name=table_name, index=False)
-        if table_name.startswith("result_"):
-            workbook  = writer.book
-            worksheet = writer.sheets[table_name]
-            for col_num, col in enumerate(df.columns):
-                if col.startswith("image_") and not col.endswith("_name"):
-                    for row_num, cell_value in enumerate(df[col], start=1):
-                        if cell_value is not None:
-                            worksheet.write_url(row_num, col_num, cell_value, string=df[f"{col}_name"][row_num-1])
-    writer.close()
+    tables = conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')").fetchall()
+    # every row is flushed to the file once the next one is written, the memory does not grow with the tables
+    workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+    # the header format of pandas' to_excel
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    if image_format is not None:
+        # an unknown format fails before the export
+        format_extension(image_format)
+    executor = ProcessPoolExecutor(max_workers=workers) if image_format is not None or max_size is not None else None
+    try:
+        for table_name, table_type in tables:
+            export_table(conn, workbook, header_format, table_name, table_type == 'table', output_img_dir, output_path, chunk_size, 
+                         executor, image_format, max_size)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    workbook.close()
     conn.close()
     zip_path = os.path.join(output_dir, f"{db_name}.zip")
     zip_dir(os.path.dirname(output_path), zip_path, remove_original=True)
@@ -94,13 +268,21 @@ def main():
     parser = argparse.ArgumentParser(description="Export the content of a SQLite database to an Excel file")
     parser.add_argument('db_path', type=str, nargs='?', default=None, help='The path of the database file')
     parser.add_argument('output_dir', type=str, nargs='?', default="./", help='The dir path of the output file')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='The number of rows read from the database at a time')
+    parser.add_argument('--image-format', type=str, default=None, help='Transcode the images to this format of PIL (e.g. PNG, JPEG, WEBP), by default they are written as they are stored')
+    parser.add_argument('--thumbnail', type=str, default=None, help='Shrink the images to fit in WIDTHxHEIGHT (or SIZE for a square) keeping their aspect ratio')
+    parser.add_argument('--image-workers', type=int, default=None, help='The number of processes transcoding the images, by default the number of CPUs')
     args = parser.parse_args()
     if args.db_path is None:
         args.db_path = os.path.join(USER_HOME, 'experiment.db')
     if not os.path.exists(args.db_path):
         print(f"Error: The database file {args.db_path} does not exist, please run any experiment first or check the database path.")
         return
-    export_data(args.db_path, args.output_dir)
+    max_size = None
+    if args.thumbnail is not None:
+        width, _, height = args.thumbnail.lower().partition('x')
+        max_size = (int(width), int(height or width))
+    export_data(args.db_path, args.output_dir, args.chunk_size, args.image_format, max_size, args.image_workers)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,62 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+import argparse
+import os
+
+from pyerm.database.dbbase import Database
+from pyerm.database.spool import SpoolSegmentTable, ingest_spools
+
+def ingest(db_path:str, paths:list, remove:bool=False):
+    db = Database(db_path)
+    loaded = ingest_spools(db, paths)
+    removed = []
+    if remove:
+        # only the segments closed by their writer and loaded to their end, the others may still grow
+        segment_table = SpoolSegmentTable(db)
+        for path in loaded:
+            offset, _, closed, _ = segment_table.progress(os.path.basename(path))
+            if closed and os.path.getsize(path) == offset:
+                os.remove(path)
+                removed.append(path)
+    db.close()
+    return loaded, removed
+
+def main():
+    parser = argparse.ArgumentParser(description='Load the spool segments written by Experiment(spool_dir=...) into a database in one transaction, running it again only loads the events written since.')
+    parser.add_argument('db_path', type=str, help='Database file path, created if it does not exist.')
+    parser.add_argument('spool_paths', type=str, nargs='+', help='Spool directories or segment files.')
+    parser.add_argument('--remove', action='store_true', help='Remove the closed segments once loaded to their end.')
+    args = parser.parse_args()
+    for path in args.spool_paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"The spool path {path} does not exist")
+    loaded, removed = ingest(args.db_path, args.spool_paths, remove=args.remove)
+    print(f'Loaded {sum(loaded.values())} events of {sum(count > 0 for count in loaded.values())}/{len(loaded)} segments into {args.db_path}')
+    if len(removed) > 0:
+        print(f'Removed {len(removed)} segments')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+import argparse
+import os
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import migrate_detail_tables
+
+def migrate_details(db_path:str, drop:bool=True, vacuum:bool=True):
+    db = Database(db_path)
+    migrated = migrate_detail_tables(db, drop=drop)
+    if vacuum and drop and len(migrated) > 0:
+        db.conn.execute('VACUUM')
+    db.close()
+    return migrated
+
+def main():
+    parser = argparse.ArgumentParser(description='Move the details of the per experiment detail_{id} tables into the table detail_records, running it again only migrates the remaining tables.')
+    parser.add_argument('db_path', type=str, help='Database file path.')
+    parser.add_argument('--keep', action='store_true', help='Keep the migrated detail_{id} tables instead of dropping them.')
+    parser.add_argument('--no-vacuum', action='store_true', help='Skip shrinking the database file with VACUUM after dropping the tables.')
+    args = parser.parse_args()
+    if not os.path.exists(args.db_path):
+        raise FileNotFoundError(f"The database file {args.db_path} does not exist")
+    migrated = migrate_details(args.db_path, drop=not args.keep, vacuum=not args.no_vacuum)
+    if len(migrated) == 0:
+        print('No detail table to migrate.')
+    else:
+        print(f'Migrated {len(migrated)} detail tables into detail_records')
+
+
+if __name__ == "__main__":
+    main()
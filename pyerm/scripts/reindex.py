@@ -0,0 +1,64 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Version: 0.3.9
+import argparse
+import os
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import ExperimentTable, MethodTable, DataTable
+
+def reindex(db_path:str, analyze:bool=True):
+    db = Database(db_path)
+    before = dict(db.schema.indexes)
+    if 'experiment_list' in db.table_names:
+        ExperimentTable(db).create_indexes()
+    for table_name in db.table_names:
+        if table_name.startswith('method_'):
+            MethodTable(db, table_name[len('method_'):]).create_indexes()
+        elif table_name.startswith('data_'):
+            DataTable(db, table_name[len('data_'):]).create_indexes()
+    after = db.schema.indexes
+    changed = [name for name, sql in after.items() if before.get(name) != sql]
+    if analyze:
+        db.conn.execute('ANALYZE')
+        db.conn.commit()
+    db.close()
+    return changed
+
+def main():
+    parser = argparse.ArgumentParser(description='Create or rebuild the secondary indexes managed by pyerm on an existing database, running it again is a no-op.')
+    parser.add_argument('db_path', type=str, help='Database file path.')
+    parser.add_argument('--no-analyze', action='store_true', help='Skip refreshing the query planner statistics with ANALYZE.')
+    args = parser.parse_args()
+    if not os.path.exists(args.db_path):
+        raise FileNotFoundError(f"The database file {args.db_path} does not exist")
+    changed = reindex(args.db_path, analyze=not args.no_analyze)
+    if len(changed) == 0:
+        print('All indexes are up to date.')
+    else:
+        print(f'Created or rebuilt {len(changed)} indexes: {", ".join(changed)}')
+
+
+if __name__ == "__main__":
+    main()
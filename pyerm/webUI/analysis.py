@@ -34,7 +34,8 @@ import json
 import numpy as np
 
 from pyerm.database.dbbase import Database
-from pyerm.database.utils import get_result_statistics, get_result_statistics_by_ids
+from pyerm.database.tables import SettingStatsTable, delete_experiments
+from pyerm.database.utils import get_result_statistics, get_result_statistics_by_ids, group_statistics, best_experiments
 from pyerm.database.utils import method_id2remark_name, data_id2remark_name, experiment_remark_name2id
 from pyerm.database.utils import method_remark_name2id, data_remark_name2id
 from pyerm.database.utils import split_result_info
@@ -44,26 +45,25 @@ from pyerm.webUI.utils import boxplot, violinplot, lineplot, barplot
 def analysis():
     title()
     if os.path.exists(st.session_state.db_path) and st.session_state.db_path.endswith('.db'):
-        db = Database(st.session_state.db_path, output_info=False)
-        analysis_task = sidebar_select_analysis()
-        if analysis_task == st.session_state.lm["analysis.single_setting_analysis_text"]:
-            task, method, method_id, dataset, dataset_id = select_setting(db)
-            st.write('---')
-            single_setting_analysis(db, task, method, method_id, dataset, dataset_id)
+        with Database(st.session_state.db_path, output_info=False, profile=st.session_state.db_profile, pooled=True, trace=st.session_state.tracer) as db:
+            analysis_task = sidebar_select_analysis()
+            if analysis_task == st.session_state.lm["analysis.single_setting_analysis_text"]:
+                task, method, method_id, dataset, dataset_id = select_setting(db)
+                st.write('---')
+                single_setting_analysis(db, task, method, method_id, dataset, dataset_id)
             
-        elif analysis_task == st.session_state.lm["analysis.multi_setting_analysis_text"]:
-            task, method, method_id, dataset, dataset_id = select_setting(db)
-            if task != st.session_state.cur_analysis_task:
-                st.session_state.recorded_analysis_setting = []
-                st.session_state.cur_analysis_task = task
-            if st.button(st.session_state.lm["analysis.multi_setting_record_cur_setting_button"], key='add_setting'):
-                if not (method, method_id, dataset, dataset_id) in st.session_state.recorded_analysis_setting:
-                    st.session_state.recorded_analysis_setting.append((method, method_id, dataset, dataset_id))
-                    st.rerun()
-            st.write('---')
-            multi_setting_analysis(db)
+            elif analysis_task == st.session_state.lm["analysis.multi_setting_analysis_text"]:
+                task, method, method_id, dataset, dataset_id = select_setting(db)
+                if task != st.session_state.cur_analysis_task:
+                    st.session_state.recorded_analysis_setting = []
+                    st.session_state.cur_analysis_task = task
+                if st.button(st.session_state.lm["analysis.multi_setting_record_cur_setting_button"], key='add_setting'):
+                    if not (method, method_id, dataset, dataset_id) in st.session_state.recorded_analysis_setting:
+                        st.session_state.recorded_analysis_setting.append((method, method_id, dataset, dataset_id))
+                        st.rerun()
+                st.write('---')
+                multi_setting_analysis(db)
         
-        del(db)
             
     st.sidebar.write("---")
     if st.sidebar.button(st.session_state.lm["app.refresh"], key='refresh', use_container_width=True):
@@ -79,7 +79,7 @@ def single_setting_analysis(db, task, method, method_id, dataset, dataset_id):
     else:
         st.write(st.session_state.lm["analysis.single_setting_analysis.statistics_no_result_found"])
         return
-    remarked_list = db[f'experiment_list'].select('remark', where=f'id in ({",".join(same_setting_ids)}) AND remark IS NOT NULL')
+    remarked_list = db[f'experiment_list'].select('remark', where=f'id in ({",".join(same_setting_ids)}) AND remark IS NOT NULL', other='ORDER BY id')
     remarked_list = [remark[0] for remark in remarked_list]
     # remarked_list = []
     # for id in same_setting_ids:
@@ -160,30 +160,31 @@ def select_setting(db:Database):
     cols = st.columns(3)
     with cols[0]:
         st.write(st.session_state.lm["analysis.select_setting.select_task_title"])
-        task_sql = f'SELECT DISTINCT task FROM experiment_list'
+        task_sql = f'SELECT task FROM experiment_list GROUP BY task ORDER BY MIN(id)'
         tasks = [t[0] for t in db.conn.execute(task_sql).fetchall()]
         task = st.selectbox(st.session_state.lm["analysis.select_setting.select_task_select"], tasks)
                 
     with cols[1]:
         st.write(st.session_state.lm["analysis.select_setting.select_method_title"])
-        method_sql = f'SELECT DISTINCT method FROM experiment_list WHERE task="{task}"'
+        method_sql = f'SELECT method FROM experiment_list WHERE task="{task}" GROUP BY method ORDER BY MIN(id)'
         methods = [m[0] for m in db.cursor.execute(method_sql).fetchall()]
         method = st.selectbox(st.session_state.lm["analysis.select_setting.select_method_select"], methods)
         
     with cols[2]:
         st.write(st.session_state.lm["analysis.select_setting.select_data_title"])
-        dataset_sql = f'SELECT DISTINCT data FROM experiment_list WHERE task = "{task}" AND method = "{method}" AND status = "finished"'
+        dataset_sql = f'SELECT data FROM experiment_list WHERE task = "{task}" AND method = "{method}" AND status = "finished" GROUP BY data ORDER BY MIN(id)'
         datasets = [d[0] for d in db.conn.execute(dataset_sql).fetchall()]
         dataset = st.selectbox(st.session_state.lm["analysis.select_setting.select_data_select"], datasets)
         
     with cols[1]:
         if f"method_{method}" in db.table_names:
-            method_id_sql = f'SELECT DISTINCT experiment_list.method_id, method_{method}.remark FROM \
+            method_id_sql = f'SELECT experiment_list.method_id, method_{method}.remark FROM \
                 experiment_list INNER JOIN method_{method} ON experiment_list.method_id = method_{method}.method_id \
-                WHERE task = "{task}" AND method = "{method}" AND data = "{dataset}" AND status = "finished"'
+                WHERE task = "{task}" AND method = "{method}" AND data = "{dataset}" AND status = "finished" \
+                GROUP BY experiment_list.method_id, method_{method}.remark ORDER BY MIN(experiment_list.id)'
             method_ids = {(m[1] if m[1] is not None else m[0]):m[0] for m in db.conn.execute(method_id_sql).fetchall()}
         else:
-            method_id_sql = f'SELECT DISTINCT method_id FROM experiment_list WHERE task = "{task}" AND method = "{method}" AND data = "{dataset}"'
+            method_id_sql = f'SELECT method_id FROM experiment_list WHERE task = "{task}" AND method = "{method}" AND data = "{dataset}" GROUP BY method_id ORDER BY MIN(id)'
             method_ids = {m[0]:m[0] for m in db.conn.execute(method_id_sql).fetchall()}
 
         method_id = st.selectbox(st.session_state.lm["analysis.select_setting.method_id_select"], method_ids.keys())
@@ -193,7 +194,7 @@ def select_setting(db:Database):
             method_table = db[f'method_{method}']
             method_info = method_table.select(where=f'method_id={method_id}')
             method_columns = method_table.columns
-            method_info = pd.DataFrame(method_info, columns=method_columns)
+            method_info = pd.DataFrame(method_info, columns=method_columns).drop(columns=['param_hash'], errors='ignore')
             # method_remark_name = method_info['remark'][0]
             method_info = method_info.drop(columns=['method_id', 'remark'])
             method_info.index = [st.session_state.lm["analysis.select_setting.method_index"]]
@@ -227,7 +228,7 @@ def select_setting(db:Database):
         
         
     with cols[2]:
-        dataset_id_sql = f'SELECT DISTINCT data_id FROM experiment_list WHERE task = "{task}" AND method = "{method}" AND method_id = "{method_id}" AND data = "{dataset}"  AND status = "finished"'
+        dataset_id_sql = f'SELECT data_id FROM experiment_list WHERE task = "{task}" AND method = "{method}" AND method_id = "{method_id}" AND data = "{dataset}"  AND status = "finished" GROUP BY data_id ORDER BY MIN(id)'
         dataset_ids = {data_id2remark_name(db, dataset, d[0]):d[0] for d in db.conn.execute(dataset_id_sql).fetchall()}
         dataset_id = st.selectbox(st.session_state.lm["analysis.select_setting.data_id_select"], dataset_ids.keys())
         dataset_id = dataset_ids[dataset_id] if dataset_id is not None else -1
@@ -235,7 +236,7 @@ def select_setting(db:Database):
             data_table = db[f'data_{dataset}']
             data_info = data_table.select(where=f'data_id={dataset_id}')
             data_columns = data_table.columns
-            data_info = pd.DataFrame(data_info, columns=data_columns)
+            data_info = pd.DataFrame(data_info, columns=data_columns).drop(columns=['param_hash'], errors='ignore')
             # data_remark_name = data_info['remark'][0]
             data_info = data_info.drop(columns=['data_id', 'remark'])
             data_info.index = [st.session_state.lm["analysis.select_setting.data_index"]]
@@ -269,7 +270,7 @@ def select_setting(db:Database):
             st.write(st.session_state.lm["analysis.select_setting.data_no_param"])
             
     with cols[0]:
-        same_setting_id_sql = f"SELECT id FROM experiment_list WHERE method='{method}' AND method_id={method_id} AND data='{dataset}' AND data_id={dataset_id} AND task='{task}' AND status='finished'"
+        same_setting_id_sql = f"SELECT id FROM experiment_list WHERE method='{method}' AND method_id={method_id} AND data='{dataset}' AND data_id={dataset_id} AND task='{task}' AND status='finished' ORDER BY id"
         selected_function = st.radio(st.session_state.lm["analysis.select_setting.select_function_title"],
                 [
                     st.session_state.lm["analysis.select_setting.remark_max_score_checkbox"],
@@ -284,7 +285,7 @@ def select_setting(db:Database):
                 score_types = ['Max', 'Min', 'Avg', 'Std', 'Median']
                 score_type = st.selectbox(st.session_state.lm["analysis.select_setting.remark_max_score_type_select"], score_types, index=0, key='score_type_max')
                 if st.button(st.session_state.lm["analysis.select_setting.remark_max_score_setting_button"], key='confirm_remark_max_setting'):
-                    auto_remark_setting_for_method_and_data(db, task, method, dataset, score_column, score_type, 'max' if score_type != 'std' else 'min')
+                    auto_remark_setting_for_method_and_data(db, task, method, dataset, score_column, score_type, 'max' if score_type != 'Std' else 'min')
                     st.rerun()
             else:
                 score_columns = [col for col in db[f'result_{task}'].columns if not col.startswith("image_") and not col=="experiment_id"]
@@ -303,7 +304,7 @@ def select_setting(db:Database):
                 score_types = ['Max', 'Min', 'Avg', 'Std', 'Median']
                 score_type = st.selectbox(st.session_state.lm["analysis.select_setting.remark_min_score_type_select"], score_types, index=0, key='score_type_min')
                 if st.button(st.session_state.lm["analysis.select_setting.remark_min_score_setting_button"], key='confirm_remark_min_setting'):
-                    auto_remark_setting_for_method_and_data(db, task, method, dataset, score_column, score_type, 'min' if score_type != 'std' else 'max')
+                    auto_remark_setting_for_method_and_data(db, task, method, dataset, score_column, score_type, 'min' if score_type != 'Std' else 'max')
                     st.rerun()
             else:
                 score_columns = [col for col in db[f'result_{task}'].columns if not col.startswith("image_") and not col=="experiment_id"]
@@ -312,7 +313,7 @@ def select_setting(db:Database):
                     auto_remark_all_settings_for_task(db, task, score_column, 'min')
                     st.rerun()
                 if st.button(st.session_state.lm["analysis.select_setting.remark_min_score_cur_button"], key='confirm_remark_min_current'):
-                    auto_remark_single_setting(db, task, method, method_id, dataset, dataset_id, same_setting_id_sql, score_column, 'min')
+                    auto_remark_single_setting(db, task, method, method_id, dataset, dataset_id, score_column, 'min')
                     st.rerun()
                  
         elif selected_function == st.session_state.lm["analysis.select_setting.clear_remark_checkbox"]:
@@ -363,12 +364,7 @@ def show_images(db, task, experiments):
         st.write(st.session_state.lm["analysis.show_images.experiment_img_not_exist"].format(SELECTED_ID=selected_id))
         
 def delete_all_same_setting_experiment(db, task, same_setting_ids):
-    experiment_table = db['experiment_list']
-    result_table = db[f'result_{task}']
-    for experiment_id in same_setting_ids:
-        experiment_table.delete(f'id={experiment_id}')
-        result_table.delete(f'experiment_id={experiment_id}')
-    db.conn.commit()
+    delete_experiments(db, same_setting_ids)
     st.session_state.cur_detail_id = None
     st.rerun()
 
@@ -414,12 +410,8 @@ def single_setting_plot(db, task, same_setting_ids, plot_type):
         return
     plot_data = {x_label: [], y_label: []}
     if plot_type == 'Boxplot' or plot_type == 'Violinplot':
-        for id in same_setting_ids:
-            result = result_table.select(where=f'experiment_id={id}')
-            for i, score_column in enumerate(selected_metrics):
-                plot_data[x_label].append(score_column)
-                plot_data[y_label].append(result[0][i+1])
-        plot_df = pd.DataFrame(plot_data)
+        result_df = result_table.to_frame(*selected_metrics, where=f'experiment_id IN ({",".join(same_setting_ids)})')
+        plot_df = result_df.melt(value_vars=selected_metrics, var_name=x_label, value_name=y_label)
         if plot_type == 'Boxplot':
             plot_buf = boxplot(plot_df, x_label, y_label, title, (figure_size_x, figure_size_y), **additional_params_dict)
         elif plot_type == 'Violinplot':
@@ -487,11 +479,14 @@ def multi_setting_plot(db, task, selected_settings, selected_metric, plot_type):
         additional_params_dict = {}
         
     result_table = db[f'result_{task}']
+    # the maintained running statistics are a point lookup per setting, the median still needs the results
+    stats_table = SettingStatsTable(db, task) if f'setting_stats_{task}' in db.table_names and plot_type in ('Lineplot', 'Barplot') and value_type != 'Median' else None
     plot_data = {x_label: [], y_label: []}
     setting_name_dict = {}
     used_setting_names_counts = {}
     for i, setting in enumerate(selected_settings):
-        _, same_ids = get_result_statistics(db, task, setting[0], method_remark_name2id(db, setting[0], setting[1]), setting[2], data_remark_name2id(db, setting[2], setting[3]))
+        if stats_table is None:
+            _, same_ids = get_result_statistics(db, task, setting[0], method_remark_name2id(db, setting[0], setting[1]), setting[2], data_remark_name2id(db, setting[2], setting[3]))
         if not col_name_list == '':
             str_setting = None
         else:
@@ -503,13 +498,15 @@ def multi_setting_plot(db, task, selected_settings, selected_metric, plot_type):
                 setting_name_dict[str_setting] = f'{setting[0]}_{used_setting_names_counts[setting[0]]}'
                 used_setting_names_counts[setting[0]] += 1
         if plot_type == 'Boxplot' or plot_type == 'Violinplot':
-            for id in same_ids:
-                result = result_table.select(selected_metric, where=f'experiment_id={id}')[0][0]
-                plot_data[x_label].append(setting_name_dict[str_setting] if str_setting else col_names[i])
-                plot_data[y_label].append(result)
+            results = result_table.select_columns(selected_metric, where=f'experiment_id IN ({",".join(same_ids)})')[selected_metric]
+            plot_data[x_label].extend([setting_name_dict[str_setting] if str_setting else col_names[i]] * len(results))
+            plot_data[y_label].extend(results)
         elif plot_type == 'Lineplot' or plot_type == 'Barplot':
-            result_info = get_result_statistics_by_ids(db, task, same_ids)
-            result = result_info.loc[value_type][selected_metric]
+            if stats_table is not None:
+                result_info = stats_table.get_statistics(setting[0], method_remark_name2id(db, setting[0], setting[1]), setting[2], data_remark_name2id(db, setting[2], setting[3]))
+            else:
+                result_info = get_result_statistics_by_ids(db, task, same_ids)
+            result = result_info.loc[value_type][selected_metric] if result_info is not None and selected_metric in result_info.columns else np.nan
             plot_data[x_label].append(setting_name_dict[str_setting] if str_setting else col_names[i])
             plot_data[y_label].append(result)
     
@@ -540,92 +537,56 @@ def multi_setting_plot(db, task, selected_settings, selected_metric, plot_type):
     )
             
 def auto_remark_all_settings_for_task(db:Database, task, score_column, type_flag:typing.Literal[f'max', f'min']='max'):
-    all_setting_sql = f"SELECT DISTINCT method, method_id, data, data_id FROM experiment_list WHERE task='{task}'"
-    all_settings = db.conn.execute(all_setting_sql).fetchall()
-    for setting in all_settings:
-        method, method_id, dataset, dataset_id = setting
-        auto_remark_single_setting(db, task, method, method_id, dataset, dataset_id, score_column, type_flag)
+    best = best_experiments(db, task, score_column, type_flag)
+    with db.transaction():
+        for row in best.itertuples(index=False):
+            remark_best_experiment(db, task, row.experiment_id, row.remark, row.method, row.method_id, row.data, row.data_id, score_column, type_flag)
         
 def auto_remark_single_setting(db, task, method, method_id, dataset, dataset_id, score_column, type_flag:typing.Literal[f'max', f'min']='max'):
-    same_setting_id_sql = f"SELECT id FROM experiment_list WHERE method='{method}' AND method_id={method_id} AND data='{dataset}' AND data_id={dataset_id} AND task='{task}' AND status='finished'"
-    if  type_flag == 'max':
-        score_sql = f"SELECT experiment_id FROM result_{task} WHERE {score_column} = (SELECT MAX({score_column}) FROM result_{task} where experiment_id IN ({same_setting_id_sql})) AND experiment_id IN ({same_setting_id_sql})"
-    elif type_flag == 'min':
-        score_sql = f"SELECT experiment_id FROM result_{task} WHERE {score_column} = (SELECT MIN({score_column}) FROM result_{task} where experiment_id IN ({same_setting_id_sql})) AND experiment_id IN ({same_setting_id_sql})"
+    best = best_experiments(db, task, score_column, type_flag, 
+                            where=f"e.method='{method}' AND e.method_id={method_id} AND e.data='{dataset}' AND e.data_id={dataset_id}")
+    with db.transaction():
+        for row in best.itertuples(index=False):
+            remark_best_experiment(db, task, row.experiment_id, row.remark, method, method_id, dataset, dataset_id, score_column, type_flag)
+
+def remark_best_experiment(db, task, experiment_id, former_remark, method, method_id, dataset, dataset_id, score_column, type_flag:typing.Literal[f'max', f'min']='max'):
+    if former_remark is None or pd.isnull(former_remark):
+        remark=f'{task}_{method}_{method_id2remark_name(db, method, method_id)}_{dataset}_{data_id2remark_name(db, dataset, dataset_id)}_{score_column}_{type_flag}'
+        db['experiment_list'].update(remark=None, where=f'remark="{remark}"')
+        db[f'experiment_list'].update(where=f'id={experiment_id}', remark=remark)
+    elif f'{score_column}_max' in former_remark or f'{score_column}_min' in former_remark:
+        pass
     else:
-        raise ValueError('type_flag should be either "max" or "min".')
-    score_experiment = db.conn.execute(score_sql).fetchall()
-    # st.write(max_score_experiment)
-    if len(score_experiment) >= 1:
-        score_experiment_id = score_experiment[0][0]
-        former_remark = db[f'experiment_list'].select('remark', where=f'id={score_experiment_id}')[0][0]
-        if former_remark is None:
-            if type_flag == 'max':
-                remark=f'{task}_{method}_{method_id2remark_name(db, method, method_id)}_{dataset}_{data_id2remark_name(db, dataset, dataset_id)}_{score_column}_max'
-            elif type_flag == 'min':
-                remark=f'{task}_{method}_{method_id2remark_name(db, method, method_id)}_{dataset}_{data_id2remark_name(db, dataset, dataset_id)}_{score_column}_min'
-            db['experiment_list'].update(remark=None, where=f'remark="{remark}"')
-            db[f'experiment_list'].update(where=f'id={score_experiment_id}', remark=remark)
-        elif f'{score_column}_max' in former_remark or f'{score_column}_min' in former_remark:
-            pass
-        else:
-            db[f'experiment_list'].update(where=f'id={score_experiment_id}', 
-                                            remark=f'{former_remark}_{score_column}_max')
-        db.conn.commit()
-    # else:
-    #     st.error(st.session_state.lm["analysis.auto_remark_single_setting_failed_text"])
+        db[f'experiment_list'].update(where=f'id={experiment_id}', remark=f'{former_remark}_{score_column}_{type_flag}')
 
 def auto_remark_setting_for_method_and_data(db:Database, task, method, dataset, score_column, score_type, type_flag:typing.Literal[f'max', f'min']='max'):
-    target_method_id = target_data_id = -1
-    target_method_remark = target_data_remark = None
-    cur_target_value = float('inf') if type_flag == 'min' else float('-inf')
-    if score_type == 'std':
+    if score_type == 'Std':
         remark_type = 'best' if type_flag == 'min' else 'worst'
     else:
         remark_type = 'best' if type_flag == 'max' else 'worst'
     remark_content = f"{method}-{dataset}-{score_column}-{score_type}-{remark_type}"
 
-    if f"method_{method}" in db.table_names:
-        method_id_sql = f'SELECT DISTINCT experiment_list.method_id, method_{method}.remark FROM \
-            experiment_list INNER JOIN method_{method} ON experiment_list.method_id = method_{method}.method_id \
-            WHERE task = "{task}" AND method = "{method}" AND data = "{dataset}" AND status = "finished"'
-        method_ids = {m[0]:m[1] for m in db.conn.execute(method_id_sql).fetchall()}
-    else:
-        method_id_sql = f'SELECT DISTINCT method_id FROM experiment_list WHERE task = "{task}" AND method = "{method}" AND data = "{dataset}"'
-        method_ids = {m[0]:None for m in db.conn.execute(method_id_sql).fetchall()}
-    for method_id, method_remark_name in method_ids.items():
-        dataset_id_sql = f'SELECT DISTINCT data_id FROM experiment_list WHERE task = "{task}" AND method = "{method}" AND method_id = "{method_id}" AND data = "{dataset}"  AND status = "finished"'
-        dataset_ids = {d[0]:data_id2remark_name(db, dataset, d[0], default_id_as_remark=False) for d in db.conn.execute(dataset_id_sql).fetchall()}
-        for dataset_id, data_remark_name in dataset_ids.items():
-            result_statistics, _ = get_result_statistics(db, task, method, method_id, dataset, dataset_id)
-            target_value = result_statistics.at[score_type, score_column]
-            if (type_flag == 'max' and target_value > cur_target_value) or (type_flag == 'min' and target_value < cur_target_value):
-                cur_target_value = target_value
-                target_method_id = method_id
-                target_method_remark = method_remark_name.replace(remark_content, '') if method_remark_name else None
-                if method_remark_name and remark_content in method_remark_name:
-                    db[f'method_{method}'].update(where=f'method_id={method_id}', remark=target_method_remark)
-                target_data_id = dataset_id
-                target_data_remark = data_remark_name.replace(remark_content, '') if data_remark_name else None
-                if data_remark_name and remark_content in data_remark_name:
-                    db[f'data_{dataset}'].update(where=f'data_id={dataset_id}', remark=target_data_remark)
-
-              
-    if target_method_id != -1:
-        if target_method_remark is None:
-            target_method_remark = remark_content
-        else:
-            target_method_remark = f"{target_method_remark}_{remark_content}"
-
-        db[f'method_{method}'].update(where=f'method_id={target_method_id}', remark=target_method_remark)
+    statistics = group_statistics(db, task, by=['method_id', 'data_id'], score_columns=[score_column], where=f"e.method='{method}' AND e.data='{dataset}'")
+    values = statistics[score_type][score_column].dropna()
+    if len(values) == 0:
+        return
+    target_method_id, target_data_id = values.idxmax() if type_flag == 'max' else values.idxmin()
 
-    if target_data_id != -1:
-        if target_data_remark is None:
-            target_data_remark = remark_content
-        else:
-            target_data_remark = f"{target_data_remark}_{remark_content}"
+    def move_remark(table_name, id_column, ids, target_id):
+        # the remark content moves from the former best setting to the new one
+        if table_name not in db.table_names:
+            return
+        table = db[table_name]
+        ids = ','.join([str(int(i)) for i in set(ids)])
+        for id, remark in table.select(id_column, 'remark', where=f'{id_column} IN ({ids}) AND remark IS NOT NULL'):
+            if remark_content in remark:
+                table.update(where=f'{id_column}={id}', remark=remark.replace(f'_{remark_content}', '').replace(remark_content, '') or None)
+        target_remark = table.select('remark', where=f'{id_column}={target_id}')[0][0]
+        table.update(where=f'{id_column}={target_id}', remark=remark_content if target_remark is None else f"{target_remark}_{remark_content}")
 
-        db[f'data_{dataset}'].update(where=f'data_id={target_data_id}', remark=target_data_remark)
+    with db.transaction():
+        move_remark(f'method_{method}', 'method_id', values.index.get_level_values('method_id'), target_method_id)
+        move_remark(f'data_{dataset}', 'data_id', values.index.get_level_values('data_id'), target_data_id)
 
 def export_experiments_of_same_setting_as_str(db, same_setting_ids, task, method, method_id, data, data_id):
     def detect_experiment_info(experiment_id):
@@ -664,12 +625,12 @@ def export_experiments_of_same_setting_as_str(db, same_setting_ids, task, method
             method_table = db[f'method_{method}']
             method_info = method_table.select(where=f'method_id={method_id}')
             method_columns = method_table.columns
-            method_info = pd.DataFrame(method_info, columns=method_columns)
+            method_info = pd.DataFrame(method_info, columns=method_columns).drop(columns=['param_hash'], errors='ignore')
         if data_id != -1:
             data_table = db[f'data_{data}']
             data_info = data_table.select(where=f'data_id={data_id}')
             data_columns = data_table.columns
-            data_info = pd.DataFrame(data_info, columns=data_columns)
+            data_info = pd.DataFrame(data_info, columns=data_columns).drop(columns=['param_hash'], errors='ignore')
         
         method_info = method_info.drop('method_id', axis=1) if method_info is not None else None
         method_info = method_info.to_dict(orient='list') if method_info is not None else None
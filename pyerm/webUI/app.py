@@ -36,6 +36,7 @@ import datetime
 
 from pyerm.webUI import PYERM_HOME
 from pyerm.webUI.utils import LanguageManager
+from pyerm.database.trace import QueryTracer
 
 
 def init():
@@ -63,6 +64,12 @@ def init():
         st.session_state.db_path_list = db_path_list
         config.set('DEFAULT', 'db_path', ','.join(db_path_list))
         config.set('DEFAULT', 'last_db_path_index', str(last_db_path_index))
+    if 'db_profile' not in st.session_state:
+        st.session_state.db_profile = config.get('DEFAULT', 'db_profile', fallback='default')
+    else:
+        config.set('DEFAULT', 'db_profile', st.session_state.db_profile)
+    if 'tracer' not in st.session_state:
+        st.session_state.tracer = None
     if 'lm' not in st.session_state:
         st.session_state.lm = LanguageManager(config.get('DEFAULT', 'language', fallback='English'))
     else:
@@ -147,6 +154,14 @@ def main():
     st.markdown(f'<div class="custom-footer">© 2024-{datetime.datetime.now().year} Yuxuan Shao | <a href="https://opensource.org/licenses/MIT">MIT License</a></div>', unsafe_allow_html=True)
     st.sidebar.title("PyERM WebUI")
     st.sidebar.markdown(st.session_state.lm["app.sidebar_page_select"])
+    trace = st.sidebar.checkbox(st.session_state.lm["app.performance_checkbox"], value=st.session_state.tracer is not None,
+                                help=st.session_state.lm["app.performance_help"])
+    if trace:
+        if st.session_state.tracer is None:
+            st.session_state.tracer = QueryTracer()
+        st.session_state.tracer.reset()
+    else:
+        st.session_state.tracer = None
     try:
         page = st.sidebar.radio(st.session_state.lm["app.sidebar_page_select_radio"],
                 [
@@ -170,6 +185,25 @@ def main():
     except Exception as e:
         st.error(st.session_state.lm["app.web_app_error_text"].format(ERROR=str(e)))
         st.exception(e)
+    if st.session_state.tracer is not None:
+        performance()
+
+def performance():
+    st.write("---")
+    st.markdown(st.session_state.lm["app.performance_title"])
+    stats = st.session_state.tracer.stats()
+    if len(stats) == 0:
+        st.write(st.session_state.lm["app.performance_empty_text"])
+        return
+    st.write(st.session_state.lm["app.performance_stats_text"])
+    st.dataframe(stats.drop(columns=['histogram']), use_container_width=True, hide_index=True)
+    slow_queries = st.session_state.tracer.slow_queries()
+    if len(slow_queries) > 0:
+        st.write(st.session_state.lm["app.performance_slow_text"].format(SLOW_MS=st.session_state.tracer.slow_query_ms))
+        for query in slow_queries:
+            with st.expander(f"{query['duration_ms']:.1f} ms | {query['caller']}"):
+                st.code(query['sql'], language='sql')
+                st.code('\n'.join(query['plan'] or []))
         
     
 
@@ -33,153 +33,155 @@ import json
 import base64
 
 from pyerm.database.dbbase import Database
+from pyerm.database.tables import DetailRecordTable, delete_experiments
 from pyerm.database.utils import split_result_info, get_result_statistics, experiment_remark_name2id
 from pyerm.webUI import PYERM_HOME
 
 def details():
     title()
     if os.path.exists(st.session_state.db_path) and st.session_state.db_path.endswith('.db'):
-        db = Database(st.session_state.db_path, output_info=False)
-        experiment_table = db['experiment_list']
-        max_id, min_id = experiment_table.select('MAX(id)', 'MIN(id)')[0]
+        with Database(st.session_state.db_path, output_info=False, profile=st.session_state.db_profile, pooled=True, trace=st.session_state.tracer) as db:
+            experiment_table = db['experiment_list']
+            max_id, min_id = experiment_table.select('MAX(id)', 'MIN(id)')[0]
         
-        if st.session_state.cur_detail_id is None:
-            cur_id= detect_experiment_id(db)
-        else:
-            cur_id = st.session_state.cur_detail_id
-        if cur_id is None:
-            st.write(st.session_state.lm["details.no_experiment_found_text"])
-        else:
-            st.sidebar.markdown(st.session_state.lm["details.sidebar_choose_experiment_title"])
-            cur_id_last = cur_id
-            cur_remark_name = experiment_table.select("remark", where=f'id={cur_id}')
-            cur_remark_name = cur_remark_name[0][0] if cur_remark_name else None
-            cur_id = st.sidebar.text_input(st.session_state.lm["details.sidebar_choose_experiment_input"], key='input_exp_id', value=cur_id if cur_remark_name is None else cur_remark_name)
-            if cur_id.isdigit():
-                cur_id = int(cur_id)
+            if st.session_state.cur_detail_id is None:
+                cur_id= detect_experiment_id(db)
             else:
-                cur_id = experiment_remark_name2id(db, cur_id)
-            st.session_state.cur_detail_id = cur_id
-            if cur_id_last != cur_id:
-                st.session_state.cur_detail_img_id = 0
-            if st.sidebar.checkbox(st.session_state.lm["details.sidebar_only_show_remark_checkbox"], key='only_remark'):
-                only_remark = True
+                cur_id = st.session_state.cur_detail_id
+            if cur_id is None:
+                st.write(st.session_state.lm["details.no_experiment_found_text"])
             else:
-                only_remark = False
-            cols_sidebar = st.sidebar.columns(2)
-            cur_id_last = cur_id 
-            with cols_sidebar[0]:
-                if st.button(st.session_state.lm["details.sidebar_last_experiment_button"], disabled=cur_id <= min_id):
-                    cur_id  = detect_experiment_id(db, False, only_remark=only_remark)
-                if st.button(st.session_state.lm["details.sidebar_the_first_experiment_button"]):
-                    st.session_state.cur_detail_id = min_id
-                    st.rerun()
-            with cols_sidebar[1]:
-                if st.button(st.session_state.lm["details.sidebar_next_experiment_button"], disabled=cur_id >= max_id):
-                    cur_id = detect_experiment_id(db, True, only_remark=only_remark)
-                if st.button(st.session_state.lm["details.sidebar_the_last_experiment_button"]):
-                    st.session_state.cur_detail_id = max_id
+                st.sidebar.markdown(st.session_state.lm["details.sidebar_choose_experiment_title"])
+                cur_id_last = cur_id
+                cur_remark_name = experiment_table.select("remark", where=f'id={cur_id}')
+                cur_remark_name = cur_remark_name[0][0] if cur_remark_name else None
+                cur_id = st.sidebar.text_input(st.session_state.lm["details.sidebar_choose_experiment_input"], key='input_exp_id', value=cur_id if cur_remark_name is None else cur_remark_name)
+                if cur_id.isdigit():
+                    cur_id = int(cur_id)
+                else:
+                    cur_id = experiment_remark_name2id(db, cur_id)
+                st.session_state.cur_detail_id = cur_id
+                if cur_id_last != cur_id:
+                    st.session_state.cur_detail_img_id = 0
+                if st.sidebar.checkbox(st.session_state.lm["details.sidebar_only_show_remark_checkbox"], key='only_remark'):
+                    only_remark = True
+                else:
+                    only_remark = False
+                cols_sidebar = st.sidebar.columns(2)
+                cur_id_last = cur_id 
+                with cols_sidebar[0]:
+                    if st.button(st.session_state.lm["details.sidebar_last_experiment_button"], disabled=cur_id <= min_id):
+                        cur_id  = detect_experiment_id(db, False, only_remark=only_remark)
+                    if st.button(st.session_state.lm["details.sidebar_the_first_experiment_button"]):
+                        st.session_state.cur_detail_id = min_id
+                        st.rerun()
+                with cols_sidebar[1]:
+                    if st.button(st.session_state.lm["details.sidebar_next_experiment_button"], disabled=cur_id >= max_id):
+                        cur_id = detect_experiment_id(db, True, only_remark=only_remark)
+                    if st.button(st.session_state.lm["details.sidebar_the_last_experiment_button"]):
+                        st.session_state.cur_detail_id = max_id
+                        st.rerun()
+                if cur_id_last != cur_id:
                     st.rerun()
-            if cur_id_last != cur_id:
-                st.rerun()
             
 
-        if experiment_table.select(where=f'id={cur_id}') == []:
-            st.markdown(st.session_state.lm["details.experiment_information_title"])
-            if cur_id == -1:
-                cur_id = 'Unknown'
-            st.markdown(st.session_state.lm["details.experiment_information_id"].format(CUR_ID=cur_id))
-            st.write(st.session_state.lm["details.experiment_not_exist_text"].format(CUR_ID=cur_id))
-        else:
-            st.markdown(st.session_state.lm["details.experiment_information_title"])
-            cur_remark_name = experiment_table.select(where=f'id={cur_id}')[0][-2]
-            st.markdown(st.session_state.lm["details.experiment_information_id"].format(CUR_ID=cur_id) + (f"({cur_remark_name})" if cur_remark_name else ''))
+            if experiment_table.select(where=f'id={cur_id}') == []:
+                st.markdown(st.session_state.lm["details.experiment_information_title"])
+                if cur_id == -1:
+                    cur_id = 'Unknown'
+                st.markdown(st.session_state.lm["details.experiment_information_id"].format(CUR_ID=cur_id))
+                st.write(st.session_state.lm["details.experiment_not_exist_text"].format(CUR_ID=cur_id))
+            else:
+                st.markdown(st.session_state.lm["details.experiment_information_title"])
+                cur_remark_name = experiment_table.select(where=f'id={cur_id}')[0][-2]
+                st.markdown(st.session_state.lm["details.experiment_information_id"].format(CUR_ID=cur_id) + (f"({cur_remark_name})" if cur_remark_name else ''))
             
-            basic_info, method_info, data_info, result_info = detect_experiment_info(db)
-            basic_information(basic_info)
+                basic_info, method_info, data_info, result_info = detect_experiment_info(db)
+                basic_information(basic_info)
             
-            remark_cur_experiment(db)
+                remark_cur_experiment(db)
             
-            st.write('---')
-            cols = st.columns(2)
-            with cols[0]:
-                st.write(st.session_state.lm["details.experiment_result_title"])
-                if result_info is not None:
-                    result_info, image_dict = split_result_info(result_info)
-                    result_info, num_same_setting_records = calculate_result_statistics(db, basic_info, result_info)
-                    selected_img = st.selectbox(st.session_state.lm["details.experiment_result_image_select"], list(image_dict.keys()), key='select_img')
-                    if selected_img:
-                        st.image(Image.open(io.BytesIO(image_dict[selected_img])))
-                        with io.BytesIO(image_dict[selected_img]) as buf:
-                            img_data = buf.read()
-                        st.download_button(
-                            label=st.session_state.lm["details.experiment_result_image_download"].format(SELECTED_IMG=selected_img),
-                            data=img_data,
-                            file_name=f"{selected_img}.png",
-                            mime="image/png"
-                        )
+                st.write('---')
+                cols = st.columns(2)
+                with cols[0]:
+                    st.write(st.session_state.lm["details.experiment_result_title"])
+                    if result_info is not None:
+                        result_info, image_dict = split_result_info(result_info)
+                        result_info, num_same_setting_records = calculate_result_statistics(db, basic_info, result_info)
+                        selected_img = st.selectbox(st.session_state.lm["details.experiment_result_image_select"], list(image_dict.keys()), key='select_img')
+                        if selected_img:
+                            st.image(Image.open(io.BytesIO(image_dict[selected_img])))
+                            with io.BytesIO(image_dict[selected_img]) as buf:
+                                img_data = buf.read()
+                            st.download_button(
+                                label=st.session_state.lm["details.experiment_result_image_download"].format(SELECTED_IMG=selected_img),
+                                data=img_data,
+                                file_name=f"{selected_img}.png",
+                                mime="image/png"
+                            )
+                        else:
+                            st.write(st.session_state.lm["details.experiment_result_image_not_exist"].format(CUR_ID=cur_id))
+                        st.write(st.session_state.lm["details.experiment_result_scores_title"])
+                        st.write(result_info)
+                        st.write(st.session_state.lm["details.experiment_result_scores_notice"].format(NUM_SAME_SETTING_RECORDS=num_same_setting_records))
                     else:
-                        st.write(st.session_state.lm["details.experiment_result_image_not_exist"].format(CUR_ID=cur_id))
-                    st.write(st.session_state.lm["details.experiment_result_scores_title"])
-                    st.write(result_info)
-                    st.write(st.session_state.lm["details.experiment_result_scores_notice"].format(NUM_SAME_SETTING_RECORDS=num_same_setting_records))
-                else:
-                    result_info, image_dict = None, {}
-                    st.write(st.session_state.lm["details.experiment_result_not_exists"])
-            with cols[1]:
-                st.write(st.session_state.lm["details.experiment_method_param_title"])
-                if method_info is not None: 
-                    if len(method_info) == 0:
-                        st.write(st.session_state.lm["details.experiment_method_param_not_exist"])
+                        result_info, image_dict = None, {}
+                        st.write(st.session_state.lm["details.experiment_result_not_exists"])
+                with cols[1]:
+                    st.write(st.session_state.lm["details.experiment_method_param_title"])
+                    if method_info is not None: 
+                        if len(method_info) == 0:
+                            st.write(st.session_state.lm["details.experiment_method_param_not_exist"])
+                        else:
+                            method_remark_name = method_info['remark'][0]
+                            if method_remark_name:
+                                st.write(st.session_state.lm["details.experiment_method_remark"].format(METHOD_REMARK_NAME=method_remark_name))
+                            # method_info.drop(columns=['remark'], inplace=True)
+                            method_info.index = [st.session_state.lm["details.experiment_method_index"]]
+                            cols = [c for c in method_info.columns if c != 'remark']
+                            df_method = method_info[cols].astype(str).transpose()
+                            st.dataframe(df_method, use_container_width=True)
                     else:
-                        method_remark_name = method_info['remark'][0]
-                        if method_remark_name:
-                            st.write(st.session_state.lm["details.experiment_method_remark"].format(METHOD_REMARK_NAME=method_remark_name))
-                        # method_info.drop(columns=['remark'], inplace=True)
-                        method_info.index = [st.session_state.lm["details.experiment_method_index"]]
-                        cols = [c for c in method_info.columns if c != 'remark']
-                        df_method = method_info[cols].astype(str).transpose()
-                        st.dataframe(df_method, use_container_width=True)
-                else:
-                    st.write(st.session_state.lm["details.experiment_method_no_param"])
+                        st.write(st.session_state.lm["details.experiment_method_no_param"])
                     
-                st.write('---')
-                st.write(st.session_state.lm["details.experiment_data_param_title"])
-                if data_info is not None:
-                    if len(data_info) == 0:
-                        st.write(st.session_state.lm["details.experiment_data_param_not_exist"])
+                    st.write('---')
+                    st.write(st.session_state.lm["details.experiment_data_param_title"])
+                    if data_info is not None:
+                        if len(data_info) == 0:
+                            st.write(st.session_state.lm["details.experiment_data_param_not_exist"])
+                        else:
+                            data_remark_name = data_info['remark'][0]
+                            if data_remark_name:
+                                st.write(st.session_state.lm["details.experiment_data_remark"].format(DATA_REMARK_NAME=data_remark_name))
+                            # data_info.drop(columns=['remark'], inplace=True)
+                            data_info.index = [st.session_state.lm["details.experiment_data_index"]]
+                            cols = [c for c in data_info.columns if c != 'remark']
+                            df_data = data_info[cols].astype(str).transpose()
+                            st.dataframe(df_data, use_container_width=True)
                     else:
-                        data_remark_name = data_info['remark'][0]
-                        if data_remark_name:
-                            st.write(st.session_state.lm["details.experiment_data_remark"].format(DATA_REMARK_NAME=data_remark_name))
-                        # data_info.drop(columns=['remark'], inplace=True)
-                        data_info.index = [st.session_state.lm["details.experiment_data_index"]]
-                        cols = [c for c in data_info.columns if c != 'remark']
-                        df_data = data_info[cols].astype(str).transpose()
-                        st.dataframe(df_data, use_container_width=True)
-                else:
-                    st.write(st.session_state.lm["details.experiment_data_no_param"])
+                        st.write(st.session_state.lm["details.experiment_data_no_param"])
             
-            if f'detail_{cur_id}' in db.table_names:
-                st.write('---')
-                st.markdown(st.session_state.lm["details.experiment_detail_title"])
-                detail_table = db[f'detail_{cur_id}']
-                detail_columns = detail_table.columns
-                detail_data = detail_table.select()
-                detail_df = pd.DataFrame(detail_data, columns=detail_columns)
-                st.write(detail_df)
+                detail_df = None
+                if 'detail_records' in db.table_names:
+                    detail_df = DetailRecordTable(db).get_details(cur_id)
+                if (detail_df is None or len(detail_df) == 0) and f'detail_{cur_id}' in db.table_names:
+                    # not migrated to detail_records yet
+                    detail_df = db[f'detail_{cur_id}'].to_frame()
+                if detail_df is not None and len(detail_df) > 0:
+                    st.write('---')
+                    st.markdown(st.session_state.lm["details.experiment_detail_title"])
+                    st.write(detail_df)
             
                 
-            st.write('---')
-            st.markdown(st.session_state.lm["details.experiment_delete_title"])
-            st.markdown(st.session_state.lm["details.experiment_delete_warn"])
-            if st.checkbox(st.session_state.lm["details.experiment_delete_checkbox"], value=False):
-                if st.button(st.session_state.lm["details.experiment_delete_confirm_button"]):
-                    delete_current_experiment(db)
+                st.write('---')
+                st.markdown(st.session_state.lm["details.experiment_delete_title"])
+                st.markdown(st.session_state.lm["details.experiment_delete_warn"])
+                if st.checkbox(st.session_state.lm["details.experiment_delete_checkbox"], value=False):
+                    if st.button(st.session_state.lm["details.experiment_delete_confirm_button"]):
+                        delete_current_experiment(db)
             
-            export_single_experiment_as_str(cur_id, basic_info, method_info, data_info, result_info, image_dict)
+                export_single_experiment_as_str(cur_id, basic_info, method_info, data_info, result_info, image_dict)
 
-        del(db)
 
     st.sidebar.write("---")
     if st.sidebar.button(st.session_state.lm["app.refresh"], key='refresh', use_container_width=True):
@@ -283,12 +285,12 @@ def detect_experiment_info(db):
         method_table = db[f'method_{method}']
         method_info = method_table.select(where=f'method_id={method_id}')
         method_columns = method_table.columns
-        method_info = pd.DataFrame(method_info, columns=method_columns)
+        method_info = pd.DataFrame(method_info, columns=method_columns).drop(columns=['param_hash'], errors='ignore')
     if data_id != -1:
         data_table = db[f'data_{data}']
         data_info = data_table.select(where=f'data_id={data_id}')
         data_columns = data_table.columns
-        data_info = pd.DataFrame(data_info, columns=data_columns)
+        data_info = pd.DataFrame(data_info, columns=data_columns).drop(columns=['param_hash'], errors='ignore')
     if basic_info['status'][0] == 'finished':
         result_table = db[f'result_{task}']
         result_info = result_table.select(where=f'experiment_id={st.session_state.cur_detail_id}')
@@ -325,13 +327,7 @@ def remark_cur_experiment(db):
             st.session_state.error_flag1 = False
 
 def delete_current_experiment(db):
-    experiment_table = db['experiment_list']
-    task = experiment_table.select("task", where=f'id={st.session_state.cur_detail_id}')[0][0]
-
-    experiment_table.delete(f'id={st.session_state.cur_detail_id}')
-    result_table = db[f'result_{task}']
-    result_table.delete(f'experiment_id={st.session_state.cur_detail_id}')
-    db.conn.commit()
+    delete_experiments(db, [st.session_state.cur_detail_id])
     st.session_state.cur_detail_id = None
     st.rerun()
 
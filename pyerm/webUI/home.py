@@ -30,9 +30,9 @@ import math
 import subprocess
 from importlib.metadata import version
 
-from pyerm.database.utils import delete_failed_experiments
-from pyerm.database.dbbase import Database
-from pyerm.database.tables import ResultTable
+from pyerm.database.utils import delete_failed_experiments, parse_experiment_ids, select_experiment_ids
+from pyerm.database.dbbase import Database, PROFILES
+from pyerm.database.tables import ResultTable, delete_experiments
 from pyerm.webUI import PYERM_HOME
 from pyerm.webUI.utils import detect_languages
 
@@ -54,11 +54,11 @@ def home():
                 st.write(st.session_state.lm["home.delete_failed_records_warning"])
                 st.write(st.session_state.lm["home.delete_failed_records_notice"])
                 if st.button(st.session_state.lm["home.delete_failed_records_confirm_button"], key="delete_failed"):
-                    db = Database(st.session_state.db_path, output_info=False)
-                    delete_failed_experiments(db)
-                    st.session_state.cur_detail_id = None
-                    st.success(st.session_state.lm["home.delete_failed_records_success"])
-                    del db
+                    with Database(st.session_state.db_path, output_info=False, profile=st.session_state.db_profile, pooled=True, trace=st.session_state.tracer) as db:
+                        delete_failed_experiments(db)
+                        st.session_state.cur_detail_id = None
+                        st.success(st.session_state.lm["home.delete_failed_records_success"])
+            delete_experiments_in_bulk()
 
             st.write("---")
             st.markdown(st.session_state.lm["home.export_data_title"])
@@ -124,6 +124,13 @@ def load_db():
         st.session_state.clean_cache = True
         st.rerun()
     st.write(st.session_state.lm["home.load_db.current_path_text"].format(DB_PATH=st.session_state.db_path))
+    profiles = list(PROFILES.keys())
+    db_profile = st.selectbox(st.session_state.lm["home.load_db.profile_select"], profiles, 
+                              index=profiles.index(st.session_state.db_profile) if st.session_state.db_profile in profiles else 0,
+                              help=st.session_state.lm["home.load_db.profile_help"])
+    if db_profile != st.session_state.db_profile:
+        st.session_state.db_profile = db_profile
+        st.rerun()
     
 
 def export_data():
@@ -141,7 +148,8 @@ def export_data():
     return zip_file
 
 def download_zip():
-    version = Database(st.session_state.db_path).get_db_version()
+    with Database(st.session_state.db_path, profile=st.session_state.db_profile, pooled=True, trace=st.session_state.tracer) as db:
+        version = db.get_db_version()
     if st.session_state.zip is None or version != st.session_state.last_version:
         st.session_state.zip = export_data()
         st.session_state.last_version = version
@@ -167,18 +175,39 @@ def delete_useless_figures():
     if st.checkbox(st.session_state.lm["home.delete_useless_figures.delete_figures_button"], value=False):
         st.write(st.session_state.lm["home.delete_useless_figures.delete_figures_notice"])
         if st.button(st.session_state.lm["home.delete_useless_figures.delete_figures_confirm_button"], key="delete_useless_figures"):
-            db = Database(st.session_state.db_path, output_info=False)
-            experiment_table = db['experiment_list']
-            useless_figures_ids = experiment_table.select('id', 'task', where="remark is NULL")
-            for id, task in useless_figures_ids:
-                result_table = ResultTable(db, task)
-                result_table.update(where=f"experiment_id={id}", **{f'image_{i}_name': None for i in range(result_table.max_image_index + 1)})
-                result_table.update(where=f"experiment_id={id}", **{f'image_{i}': None for i in range(result_table.max_image_index + 1)})
-            db.conn.execute("VACUUM")
-            db.conn.commit()
-            st.success(st.session_state.lm["home.delete_useless_figures.delete_figures_success_text"])
+            with Database(st.session_state.db_path, output_info=False, profile=st.session_state.db_profile, pooled=True, trace=st.session_state.tracer) as db:
+                experiment_table = db['experiment_list']
+                useless_figures_ids = experiment_table.select('id', 'task', where="remark is NULL", other='ORDER BY id')
+                for id, task in useless_figures_ids:
+                    result_table = ResultTable(db, task)
+                    result_table.update(where=f"experiment_id={id}", **{f'image_{i}_name': None for i in range(result_table.max_image_index + 1)})
+                    result_table.update(where=f"experiment_id={id}", **{f'image_{i}': None for i in range(result_table.max_image_index + 1)})
+                db.conn.execute("VACUUM")
+                db.conn.commit()
+                st.success(st.session_state.lm["home.delete_useless_figures.delete_figures_success_text"])
             
     
+def delete_experiments_in_bulk():
+    if st.checkbox(st.session_state.lm["home.delete_experiments_checkbox"], value=False):
+        ids = st.text_input(st.session_state.lm["home.delete_experiments_ids_input"], key="delete_experiments_ids")
+        where = st.text_input(st.session_state.lm["home.delete_experiments_where_input"], key="delete_experiments_where")
+        if ids.strip() == '' and where.strip() == '':
+            return
+        with Database(st.session_state.db_path, output_info=False, profile=st.session_state.db_profile, pooled=True, trace=st.session_state.tracer) as db:
+            try:
+                experiment_ids = select_experiment_ids(db, parse_experiment_ids(ids) if ids.strip() != '' else None, where.strip() or None)
+            except Exception as e:
+                st.error(st.session_state.lm["home.delete_experiments_invalid"].format(REASON=str(e)))
+                return
+            shown = ', '.join([str(i) for i in experiment_ids[:50]]) + (', ...' if len(experiment_ids) > 50 else '')
+            st.write(st.session_state.lm["home.delete_experiments_match"].format(COUNT=len(experiment_ids), IDS=shown))
+            if len(experiment_ids) > 0:
+                st.write(st.session_state.lm["home.delete_experiments_warning"])
+                if st.button(st.session_state.lm["home.delete_experiments_confirm_button"], key="delete_experiments"):
+                    deleted = delete_experiments(db, experiment_ids)
+                    st.session_state.cur_detail_id = None
+                    st.success(st.session_state.lm["home.delete_experiments_success"].format(COUNT=deleted))
+
 def upload_db():
     upload_db_file = st.file_uploader(st.session_state.lm["home.upload_db_text"], type=['db'])
     if upload_db_file is not None:
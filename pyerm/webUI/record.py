@@ -43,36 +43,41 @@ def record():
     title()
     if st.session_state.db_path.endswith('.db'):
         if os.path.exists(st.session_state.db_path):
-            db = Database(st.session_state.db_path, output_info=False)
+            db = Database(st.session_state.db_path, output_info=False, profile=st.session_state.db_profile, pooled=True, trace=st.session_state.tracer)
         else:
             db = None
-        cols = st.columns(3)
-        with cols[0]:
-            # task select
-            task_select(db=db)
+        try:
+            cols = st.columns(3)
+            with cols[0]:
+                # task select
+                task_select(db=db)
         
-        with cols[1]:
-            # method select
-            method_select(db=db, task=st.session_state.record_task)
+            with cols[1]:
+                # method select
+                method_select(db=db, task=st.session_state.record_task)
 
-        with cols[2]:
-            # data select
-            data_select(db=db, task=st.session_state.record_task)
+            with cols[2]:
+                # data select
+                data_select(db=db, task=st.session_state.record_task)
         
-        cols = st.columns(2)
-        with cols[0]:
-            if st.session_state.record_method:
-                method_remark = set_method_param(db=db, method=st.session_state.record_method)
+            cols = st.columns(2)
+            with cols[0]:
+                if st.session_state.record_method:
+                    method_remark = set_method_param(db=db, method=st.session_state.record_method)
 
-        with cols[1]:
-            if st.session_state.record_data:
-                data_remark = set_data_param(db=db, data=st.session_state.record_data)
+            with cols[1]:
+                if st.session_state.record_data:
+                    data_remark = set_data_param(db=db, data=st.session_state.record_data)
 
-        if st.session_state.record_task is not None and st.session_state.record_method is not None and st.session_state.record_data is not None:
-            set_experiment_info()
+            if st.session_state.record_task is not None and st.session_state.record_method is not None and st.session_state.record_data is not None:
+                set_experiment_info()
 
-        if st.session_state.record_experiment_info is not None and st.session_state.record_experiment_info['status'] == st.session_state.lm["record.status_over"]:
-            set_experiment_result(db, task=st.session_state.record_task)
+            if st.session_state.record_experiment_info is not None and st.session_state.record_experiment_info['status'] == st.session_state.lm["record.status_over"]:
+                set_experiment_result(db, task=st.session_state.record_task)
+        finally:
+            # the pooled connection goes back before the experiment below is written with its own connection
+            if db is not None:
+                db.close()
 
         st.sidebar.write(st.session_state.lm["record.sidebar_title"])
         st.sidebar.write(st.session_state.lm["record.sidebar_task"], st.session_state.record_task if st.session_state.record_task else st.session_state.lm["record.not_setted"])
@@ -110,7 +115,6 @@ def record():
                 st.sidebar.write(st.session_state.lm["record.not_setted"])
 
         if st.sidebar.button(st.session_state.lm["record.add_experiment_button"]):
-            del(db)
             if st.session_state.record_task is None or st.session_state.record_method is None \
                     or st.session_state.record_data is None or st.session_state.record_method_params is None \
                     or st.session_state.record_data_params is None or st.session_state.record_experiment_info is None:
@@ -118,7 +122,7 @@ def record():
             elif st.session_state.record_experiment_info["status"] == st.session_state.lm["record.status_over"] and st.session_state.record_result_scores is None:
                 st.sidebar.error(st.session_state.lm["record.need_result_info"])
             else:
-                exp = Experiment(st.session_state.db_path)
+                exp = Experiment(st.session_state.db_path, profile=st.session_state.db_profile)
                 try:
                     exp.task_init(st.session_state.record_task)
                     if not isinstance(st.session_state.record_method_params, int):
@@ -149,7 +153,8 @@ def record():
                     st.session_state.record_result_imgs = {}
                 except Exception as e:
                     st.sidebar.error(st.session_state.lm["record.add_experiment_failed"].format(REASON=str(e)))
-                    del(exp)
+                finally:
+                    exp.close()
     st.sidebar.write("---")
     st.sidebar.write(st.session_state.lm["record.other_record_way"])
     if st.sidebar.checkbox(st.session_state.lm["record.json4load"]):
@@ -168,7 +173,7 @@ def task_select(db: Database):
     task = None
     st.write(st.session_state.lm["record.task_select.title"])
     try:
-        tasks = pd.read_sql_query("SELECT DISTINCT task FROM experiment_list", db.conn)
+        tasks = pd.read_sql_query("SELECT task FROM experiment_list GROUP BY task ORDER BY MIN(id)", db.conn)
         task = st.selectbox(st.session_state.lm["record.task_select.task_select"], tasks)
     except Exception as e:
         st.write(st.session_state.lm["record.task_select.task_empty"])
@@ -184,7 +189,7 @@ def method_select(db: Database, task: str):
     method = None
     st.write(st.session_state.lm["record.method_select.title"])
     try:
-        methods = pd.read_sql_query(f"SELECT DISTINCT method FROM experiment_list WHERE task = '{task}'", db.conn)
+        methods = pd.read_sql_query(f"SELECT method FROM experiment_list WHERE task = '{task}' GROUP BY method ORDER BY MIN(id)", db.conn)
         method = st.selectbox(st.session_state.lm["record.method_select.method_select"], methods)
     except Exception as e:
         st.write(st.session_state.lm["record.method_select.method_empty"])
@@ -206,7 +211,7 @@ def set_method_param(db: Database, method: str):
         remarks = [method_id2remark_name(db, method, method_id) for method_id in cur_method_params["method_id"]]
         selected_remark = st.selectbox(st.session_state.lm["record.set_method_param.cur_param_select"], remarks)
         selected_param = cur_method_params[cur_method_params["method_id"] == method_remark_name2id(db, method, selected_remark)]
-        selected_param = selected_param.drop(columns=["method_id", "remark"])
+        selected_param = selected_param.drop(columns=["method_id", "remark", "param_hash"], errors="ignore")
         selected_param.index = [st.session_state.lm["record.set_method_param.param_table_row_name"]]
         if st.checkbox(st.session_state.lm["record.set_method_param.add_new_param_checkbox"], key="add_new_method_param"):
             st.write(st.session_state.lm["record.set_method_param.add_new_param_notice"])
@@ -258,7 +263,7 @@ def data_select(db: Database, task: str):
     data = None
     st.write(st.session_state.lm["record.data_select.title"])
     try:
-        datas = pd.read_sql_query(f"SELECT DISTINCT data FROM experiment_list WHERE task = '{task}'", db.conn)
+        datas = pd.read_sql_query(f"SELECT data FROM experiment_list WHERE task = '{task}' GROUP BY data ORDER BY MIN(id)", db.conn)
         data = st.selectbox(st.session_state.lm["record.data_select.data_select"], datas)
     except Exception as e:
         st.write(st.session_state.lm["record.data_select.data_empty"])
@@ -280,7 +285,7 @@ def set_data_param(db: Database, data: str):
         remarks = [data_id2remark_name(db, data, data_id) for data_id in cur_data_params["data_id"]]
         selected_remark = st.selectbox(st.session_state.lm["record.set_data_param.cur_param_select"], remarks)
         selected_param = cur_data_params[cur_data_params["data_id"] == data_remark_name2id(db, data, selected_remark)]
-        selected_param = selected_param.drop(columns=["data_id", "remark"])
+        selected_param = selected_param.drop(columns=["data_id", "remark", "param_hash"], errors="ignore")
         selected_param.index = [st.session_state.lm["record.set_data_param.param_table_row_name"]]
         if st.checkbox(st.session_state.lm["record.set_data_param.add_new_param_checkbox"], key="add_new_data_param"):
             st.write(st.session_state.lm["record.set_data_param.add_new_param_notice"])
@@ -455,43 +460,43 @@ def load_experiments_from_json(json_str: str):
         data_info = exp["data_info"]
         result_info = exp["result_info"]
         result_imgs = exp["result_imgs"]
-        exp = Experiment(st.session_state.db_path)
-        if not isinstance(basic_info, dict):
-            raise ValueError(st.session_state.lm["record.json_format_error"])
-        exp.task_init(basic_info["task"])
-        if data_info is None:
-            exp.data_init(basic_info["data"])
-        else:
-            if not isinstance(data_info, dict):
-                raise ValueError(st.session_state.lm["record.json_format_error"])
-            exp.data_init(basic_info["data"], param_dict=data_info, remark=data_info.pop("remark"))
-        if method_info is None:
-            exp.method_init(basic_info["method"])
-        else:
-            if not isinstance(method_info, dict):
-                raise ValueError(st.session_state.lm["record.json_format_error"])
-            exp.method_init(basic_info["method"], param_dict=method_info, remark=method_info.pop("remark"))
-        start_time = datetime.datetime.strptime(basic_info["start_time"], "%Y-%m-%d %H:%M:%S").timestamp() if basic_info["start_time"] else None
-        exp.experiment_start(
-            description=basic_info["description"],
-            tags=basic_info["tags"],
-            experimenters=basic_info["experimenters"],
-            start_time=start_time,
-            remark=basic_info["remark"]
-        )
-        if basic_info["status"] == "finished":
-            if not isinstance(result_info, dict):
+        with Experiment(st.session_state.db_path, profile=st.session_state.db_profile) as exp:
+            if not isinstance(basic_info, dict):
                 raise ValueError(st.session_state.lm["record.json_format_error"])
-            end_time = datetime.datetime.strptime(basic_info["end_time"], "%Y-%m-%d %H:%M:%S").timestamp() if basic_info["end_time"] else None
-            exp.experiment_over(
-                rst_dict=result_info,
-                image_dict=result_imgs,
-                end_time=end_time,
-                useful_time_cost=basic_info["useful_time_cost"]
+            exp.task_init(basic_info["task"])
+            if data_info is None:
+                exp.data_init(basic_info["data"])
+            else:
+                if not isinstance(data_info, dict):
+                    raise ValueError(st.session_state.lm["record.json_format_error"])
+                exp.data_init(basic_info["data"], param_dict=data_info, remark=data_info.pop("remark"))
+            if method_info is None:
+                exp.method_init(basic_info["method"])
+            else:
+                if not isinstance(method_info, dict):
+                    raise ValueError(st.session_state.lm["record.json_format_error"])
+                exp.method_init(basic_info["method"], param_dict=method_info, remark=method_info.pop("remark"))
+            start_time = datetime.datetime.strptime(basic_info["start_time"], "%Y-%m-%d %H:%M:%S").timestamp() if basic_info["start_time"] else None
+            exp.experiment_start(
+                description=basic_info["description"],
+                tags=basic_info["tags"],
+                experimenters=basic_info["experimenters"],
+                start_time=start_time,
+                remark=basic_info["remark"]
             )
-        elif basic_info["status"] == "failed":
-            end_time = datetime.datetime.strptime(basic_info["end_time"], "%Y-%m-%d %H:%M:%S").timestamp() if basic_info["end_time"] else None
-            exp.experiment_failed(error_info=basic_info["failed_reason"], end_time=basic_info["end_time"])
+            if basic_info["status"] == "finished":
+                if not isinstance(result_info, dict):
+                    raise ValueError(st.session_state.lm["record.json_format_error"])
+                end_time = datetime.datetime.strptime(basic_info["end_time"], "%Y-%m-%d %H:%M:%S").timestamp() if basic_info["end_time"] else None
+                exp.experiment_over(
+                    rst_dict=result_info,
+                    image_dict=result_imgs,
+                    end_time=end_time,
+                    useful_time_cost=basic_info["useful_time_cost"]
+                )
+            elif basic_info["status"] == "failed":
+                end_time = datetime.datetime.strptime(basic_info["end_time"], "%Y-%m-%d %H:%M:%S").timestamp() if basic_info["end_time"] else None
+                exp.experiment_failed(error_info=basic_info["failed_reason"], end_time=basic_info["end_time"])
 
 def title():
     st.title(st.session_state.lm["record.title"])
@@ -56,45 +56,43 @@ def tables():
 
 def detect_tables():
     st.sidebar.markdown(st.session_state.lm["table.detect_tables.title"])
-    db = Database(st.session_state.db_path, output_info=False)
-    if len(db.table_names) == 0:
-        st.write(st.session_state.lm["table.detect_tables.no_table_detected_text"])
-        return
-    table_name = st.sidebar.radio(st.session_state.lm["table.detect_tables.table_select"], db.table_names + db.view_names)
-    st.session_state.table_name = table_name
+    with Database(st.session_state.db_path, output_info=False, profile=st.session_state.db_profile, pooled=True, trace=st.session_state.tracer) as db:
+        if len(db.table_names) == 0:
+            st.write(st.session_state.lm["table.detect_tables.no_table_detected_text"])
+            return
+        table_name = st.sidebar.radio(st.session_state.lm["table.detect_tables.table_select"], db.table_names + db.view_names)
+        st.session_state.table_name = table_name
 
 def select_tables():
     def fold_detail_row(row, col_name):
-        if row[col_name]:
+        if not pd.isnull(row[col_name]) and row[col_name]:
             detail = row[col_name].replace("\n", "<br>")
             return f'<details><summary>Details</summary>{detail}</details>'
         else:
             return 'None'
 
-    db = Database(st.session_state.db_path, output_info=False)
-    table_name:str = st.session_state.table_name
-    st.write(st.session_state.lm["table.select_tables.title"], table_name)
-    if st.session_state.sql is not None:
-        st.session_state.sql = st.session_state.sql.replace("\n", "").replace("\r", "")
-        try:
-            if "SELECT" not in st.session_state.sql.upper():
-                db.conn.execute(st.session_state.sql)
-                db.conn.commit()
-                st.session_state.sql = None
-                st.rerun()
-            else:
-                df = pd.read_sql_query(st.session_state.sql, db.conn)
+    with Database(st.session_state.db_path, output_info=False, profile=st.session_state.db_profile, pooled=True, trace=st.session_state.tracer) as db:
+        table_name:str = st.session_state.table_name
+        st.write(st.session_state.lm["table.select_tables.title"], table_name)
+        if st.session_state.sql is not None:
+            st.session_state.sql = st.session_state.sql.replace("\n", "").replace("\r", "")
+            try:
+                if "SELECT" not in st.session_state.sql.upper():
+                    db.conn.execute(st.session_state.sql)
+                    db.conn.commit()
+                    st.session_state.sql = None
+                    st.rerun()
+                else:
+                    df = pd.read_sql_query(st.session_state.sql, db.conn)
+                    st.write(st.session_state.lm["table.select_tables.used_sql"].format(SQL=st.session_state.sql))
+            except Exception as e:
                 st.write(st.session_state.lm["table.select_tables.used_sql"].format(SQL=st.session_state.sql))
-        except Exception as e:
-            st.write(st.session_state.lm["table.select_tables.used_sql"].format(SQL=st.session_state.sql))
-            st.write(st.session_state.lm["table.select_tables.sql_error"])
-            st.code(e)
-            st.session_state.sql = None
-            return
-    else:
-        data = db[table_name].select()
-        columns = [column[0] if column[0] != "end_time" else "finish_time" for column in db.cursor.description]
-        df = pd.DataFrame(data, columns=columns)
+                st.write(st.session_state.lm["table.select_tables.sql_error"])
+                st.code(e)
+                st.session_state.sql = None
+                return
+        else:
+            df = db[table_name].to_frame().rename(columns={"end_time": "finish_time"})
     
     
     columns_keep = [col for col in df.columns if not col.startswith("image_")]
@@ -53,6 +53,10 @@ setup(
             'pyerm_export_zip=pyerm.scripts.export_data:main',
             'pyerm_db_merge=pyerm.scripts.db_merge:main',
             'pyerm_webui=pyerm.scripts.erm_webui:main',
+            'pyerm_reindex=pyerm.scripts.reindex:main',
+            'pyerm_migrate_details=pyerm.scripts.migrate_details:main',
+            'pyerm_ingest=pyerm.scripts.ingest:main',
+            'pyerm_delete=pyerm.scripts.delete_experiments:main',
         ],
     },
     install_requires=[
@@ -0,0 +1,66 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import pytest
+
+from pyerm.database.dbbase import Database
+from pyerm.database.experiment import Experiment
+from pyerm.database.tables import SettingStatsTable, delete_experiments
+
+def stats(db, task):
+    return sorted(db.cursor.execute(f"SELECT method, method_id, data, data_id, metric, count, mean, m2, min, max FROM setting_stats_{task}").fetchall())
+
+def count(db, sql):
+    return db.cursor.execute(sql).fetchone()[0]
+
+def test_delete_experiments_cascades(tmp_path):
+    db_path = str(tmp_path / 'delete.db')
+    for i in range(12):
+        with Experiment(db_path, setting_stats=True) as exp:
+            exp.task_init('a' if i % 2 else 'b')
+            exp.data_init('data', {'size': 10})
+            exp.method_init('method', {'lr': float(i % 3)})
+            exp.experiment_start()
+            exp.detail_update({'loss': float(i)})
+            exp.experiment_over({'acc': i / 10})
+    db = Database(db_path)
+    # a detail table of a former version
+    db.cursor.execute("CREATE TABLE detail_4 (detail_id INTEGER PRIMARY KEY, loss REAL)")
+    db.commit()
+
+    assert delete_experiments(db, [3, 4, 5, 6, 7, 100]) == 5
+    kept = [1, 2, 8, 9, 10, 11, 12]
+    assert [row[0] for row in db.cursor.execute("SELECT id FROM experiment_list ORDER BY id")] == kept
+    assert [row[0] for row in db.cursor.execute("SELECT experiment_id FROM result_a UNION ALL SELECT experiment_id FROM result_b ORDER BY 1")] == kept
+    assert [row[0] for row in db.cursor.execute("SELECT experiment_id FROM detail_records ORDER BY experiment_id")] == kept
+    assert 'detail_4' not in db.table_names
+    # the statistics reversed as if the experiments were never recorded
+    for task in ('a', 'b'):
+        reversed_stats = stats(db, task)
+        SettingStatsTable(db, task).rebuild()
+        rebuilt = stats(db, task)
+        assert [row[:6] for row in reversed_stats] == [row[:6] for row in rebuilt]
+        assert [row[6:] for row in reversed_stats] == [pytest.approx(row[6:], abs=1e-12) for row in rebuilt]
+    assert count(db, "SELECT SUM(count) FROM setting_stats_a") + count(db, "SELECT SUM(count) FROM setting_stats_b") == len(kept)
+    assert delete_experiments(db, []) == 0
+    db.close()
@@ -0,0 +1,85 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import pytest
+
+from pyerm.database.dbbase import Database
+from pyerm.database.experiment import Experiment
+from pyerm.database.logger import DetailLogger
+
+def logger(**kwargs):
+    batches = []
+    detail_logger = DetailLogger({'epoch': 'INTEGER', 'loss': 'REAL', 'phase': 'TEXT'}, lambda columns, rows: batches.append((columns, rows)), **kwargs)
+    return detail_logger, batches
+
+def test_sampling_keeps_one_step_per_window():
+    detail_logger, batches = logger(flush_rows=2, flush_interval=None, sample_every=3)
+    for i in range(10):
+        detail_logger.log({'epoch': i, 'loss': i / 2, 'phase': i}, record_time=100 + i)
+    # steps 0 and 3, then 6 and 9 once the buffer is full again
+    assert batches == [(['epoch', 'loss', 'phase', 'record_time'], [(0, 0.0, '0', 100.0), (3, 1.5, '3', 103.0)]),
+                       (['epoch', 'loss', 'phase', 'record_time'], [(6, 3.0, '6', 106.0), (9, 4.5, '9', 109.0)])]
+    assert detail_logger.flush() == 0
+    assert detail_logger.rows_written == 4
+
+def test_aggregation_reduces_whole_windows():
+    detail_logger, batches = logger(flush_rows=2, flush_interval=None, sample_every=4, aggregate=True)
+    assert detail_logger.table_def_dict == {'epoch': 'REAL', 'epoch_min': 'REAL', 'epoch_max': 'REAL', 
+                                            'loss': 'REAL', 'loss_min': 'REAL', 'loss_max': 'REAL', 'phase': 'TEXT'}
+    for i in range(10):
+        detail_logger.log({'epoch': i, 'loss': None if i == 1 else float(i), 'phase': f'p{i}'}, record_time=100 + i)
+    assert len(batches) == 1
+    columns, rows = batches[0]
+    assert columns == ['epoch', 'epoch_min', 'epoch_max', 'loss', 'loss_min', 'loss_max', 'phase', 'record_time']
+    # the mean, minimum and maximum of every window of 4 steps, the last value of the others
+    assert rows[0][:3] == (1.5, 0.0, 3.0) and rows[0][6:] == ('p3', 103.0)
+    assert rows[1][:6] == (5.5, 4.0, 7.0, 5.5, 4.0, 7.0) and rows[1][6:] == ('p7', 107.0)
+    # a missing value makes its window NaN
+    assert all(value != value for value in rows[0][3:6])
+    # the last incomplete window, once final
+    assert detail_logger.flush() == 1
+    assert batches[1][1] == [(8.5, 8.0, 9.0, 8.5, 8.0, 9.0, 'p9', 109.0)]
+
+def test_flush_interval():
+    detail_logger, batches = logger(flush_rows=100, flush_interval=0)
+    for i in range(3):
+        detail_logger.log({'epoch': i, 'loss': 0.5, 'phase': 'train'})
+    assert [len(rows) for _, rows in batches] == [1, 1, 1]
+
+def test_experiment_writes_sampled_details(tmp_path):
+    db_path = str(tmp_path / 'details.db')
+    with Experiment(db_path) as exp:
+        exp.task_init('t')
+        exp.data_init('data')
+        exp.method_init('method')
+        exp.detail_init(flush_rows=2, sample_every=2, aggregate=True)
+        exp.experiment_start()
+        for i in range(5):
+            exp.detail_update({'loss': float(i)})
+        exp.experiment_over({'acc': 1.0})
+    db = Database(db_path)
+    rows = db.cursor.execute("SELECT step, key, value FROM detail_records ORDER BY step, key").fetchall()
+    db.close()
+    assert rows == pytest.approx([(0, 'loss', 0.5), (0, 'loss_max', 1.0), (0, 'loss_min', 0.0), 
+                                  (1, 'loss', 2.5), (1, 'loss_max', 3.0), (1, 'loss_min', 2.0),
+                                  (2, 'loss', 4.0), (2, 'loss_max', 4.0), (2, 'loss_min', 4.0)])
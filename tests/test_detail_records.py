@@ -0,0 +1,39 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import pytest
+
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import DetailRecordTable
+
+def test_steps_after_rolled_back_insert(tmp_path):
+    db = Database(str(tmp_path / 'details.db'))
+    table = DetailRecordTable(db)
+    table.insert_many(1, ['loss'], [(1.0,), (0.5,)])
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            table.insert_many(1, ['loss'], [(0.25,)])
+            raise RuntimeError('a later write of the batch failed')
+    table.insert_many(1, ['loss'], [(0.125,)])
+    assert db.cursor.execute("SELECT step, value FROM detail_records WHERE experiment_id=1 ORDER BY step").fetchall() == [(0, 1.0), (1, 0.5), (2, 0.125)]
+    db.close()
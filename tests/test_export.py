@@ -0,0 +1,171 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import io
+import re
+import sqlite3
+import xml.etree.ElementTree as ET
+from zipfile import ZipFile
+
+import pytest
+import xlsxwriter
+from PIL import Image
+
+from pyerm.database.experiment import Experiment
+
+from pyerm.scripts import export_data
+from pyerm.scripts.export_data import export_table
+
+LONG = "method_a_method_with_a_very_long_name"
+
+def test_sheet_names_cut_and_unique_for_every_part(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_data, "EXCEL_MAX_ROWS", 3)
+    conn = sqlite3.connect(":memory:")
+    for name in [f"{LONG}_1", f"{LONG}_2"]:
+        conn.execute(f'CREATE TABLE "{name}" (id INTEGER PRIMARY KEY, value REAL)')
+        conn.executemany(f'INSERT INTO "{name}" (value) VALUES (?)', [(i,) for i in range(5)])
+    workbook = xlsxwriter.Workbook(str(tmp_path / "out.xlsx"), {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True})
+    for name in [f"{LONG}_1", f"{LONG}_2"]:
+        export_table(conn, workbook, header_format, name, True, str(tmp_path), str(tmp_path / "out.xlsx"))
+    names = [worksheet.name for worksheet in workbook.worksheets()]
+    workbook.close()
+    conn.close()
+
+    # 5 rows in sheets of 2 rows, 3 sheets per table
+    assert len(names) == 6
+    assert all(len(name) <= export_data.EXCEL_MAX_SHEET_NAME for name in names)
+    assert len({name.lower() for name in names}) == len(names)
+    assert names[0] == LONG[:export_data.EXCEL_MAX_SHEET_NAME]
+    assert names[1].endswith("_2") and names[2].endswith("_3")
+
+NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+REL_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+def column_index(ref):
+    index = 0
+    for letter in re.match('[A-Z]+', ref).group():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+def read_workbook(data):
+    # the sheets of an xlsx file in their order, rows of cell values and the targets of the links, without a reader library
+    book = ZipFile(io.BytesIO(data))
+    targets = {rel.get('Id'): rel.get('Target') for rel in ET.fromstring(book.read('xl/_rels/workbook.xml.rels'))}
+    sheets = []
+    for sheet in ET.fromstring(book.read('xl/workbook.xml')).find('m:sheets', NS):
+        path = 'xl/' + targets[sheet.get(REL_ID)]
+        root = ET.fromstring(book.read(path))
+        rows = []
+        for row in root.find('m:sheetData', NS):
+            cells = {}
+            for cell in row:
+                if cell.get('t') == 'inlineStr':
+                    cells[column_index(cell.get('r'))] = cell.find('m:is/m:t', NS).text
+                else:
+                    cells[column_index(cell.get('r'))] = float(cell.find('m:v', NS).text)
+            rows.append([cells.get(i) for i in range(len(cells) if len(rows) == 0 else len(rows[0]))])
+        rels_path = path.replace('worksheets/', 'worksheets/_rels/') + '.rels'
+        links = {}
+        if rels_path in book.namelist():
+            link_targets = {rel.get('Id'): rel.get('Target') for rel in ET.fromstring(book.read(rels_path))}
+            for link in root.find('m:hyperlinks', NS):
+                links[link.get('ref')] = link_targets[link.get(REL_ID)].replace('\\', '/')
+        sheets.append((sheet.get('name'), rows, links))
+    return sheets
+
+def test_export_round_trip(tmp_path, monkeypatch):
+    # a few rows per sheet and per read, the tables continue on several sheets
+    monkeypatch.setattr(export_data, "EXCEL_MAX_ROWS", 4)
+    db_path = str(tmp_path / 'experiment.db')
+    images = []
+    with Experiment(db_path) as exp:
+        exp.task_init('t')
+        exp.data_init('data', {'size': 10})
+        exp.method_init('method', {'lr': 0.1, 'name': "it's"})
+        for i in range(7):
+            exp.experiment_start(description=f'run {i}')
+            exp.detail_update({'loss': i / 3, 'note': None if i % 2 else f'step {i}'})
+            image = Image.new('RGB', (8, 6), (i * 30, 0, 0))
+            images.append(image)
+            exp.experiment_over({'acc': i / 7, 'raw': bytes(i + 1)}, {'image': image} if i != 3 else {})
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE VIEW best AS SELECT experiment_id, acc FROM result_t WHERE acc > 0.5")
+    conn.commit()
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")]
+    expected = {}
+    for table in tables:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})") if row[6] != 1]
+        expected[table] = (columns, conn.execute(f"SELECT * FROM {table}").fetchall())
+    conn.close()
+
+    zip_path = export_data.export_data(db_path, str(tmp_path / 'out'), chunk_size=2)
+    archive = ZipFile(zip_path)
+    sheets = read_workbook(archive.read('experiment.xlsx'))
+    # 3 rows under the header of every sheet
+    assert [name for name, _, _ in sheets] == [table if part == 1 else f'{table}_{part}' for table in tables 
+                                               for part in range(1, max(1, -(-len(expected[table][1]) // 3)) + 1)]
+    for table, (columns, rows) in expected.items():
+        parts = [(rows_, links) for name, rows_, links in sheets if re.fullmatch(rf'{table}(_\d+)?', name)]
+        assert all(part[0] == columns for part, _ in parts)
+        cells = [row for part, _ in parts for row in part[1:]]
+        assert len(cells) == len(rows)
+        for cell_row, row in zip(cells, rows):
+            for column, cell, value in zip(columns, cell_row, row):
+                if isinstance(value, bytes) and column.startswith('image_'):
+                    # the image cells link to the image files
+                    experiment_id = row[0]
+                    assert cell == 'image'
+                    # written as they are stored
+                    assert archive.read(f'result_imgs/ID{experiment_id}_{column}.png') == value
+                    assert Image.open(io.BytesIO(value)).tobytes() == images[experiment_id - 1].tobytes()
+                elif isinstance(value, bytes):
+                    assert cell == f'<BLOB {len(value)} bytes>'
+                elif isinstance(value, (int, float)):
+                    assert cell == pytest.approx(value, rel=1e-15)
+                else:
+                    assert cell == value
+        links = [link for _, part_links in parts for link in part_links.values()]
+        if table == 'result_t':
+            assert sorted(links) == sorted(f'result_imgs/ID{i}_image_0.png' for i in [1, 2, 3, 5, 6, 7])
+        else:
+            assert links == []
+    assert len([name for name in archive.namelist() if name.startswith('result_imgs/')]) == 6
+
+def test_export_transcoded_images(tmp_path):
+    db_path = str(tmp_path / 'experiment.db')
+    with Experiment(db_path) as exp:
+        exp.task_init('t')
+        exp.data_init('data')
+        exp.method_init('method')
+        for i in range(3):
+            exp.experiment_start()
+            exp.experiment_over({'acc': i / 3}, {'image': Image.new('RGBA', (16, 8))})
+    zip_path = export_data.export_data(db_path, str(tmp_path / 'out'), image_format='JPEG', max_size=(4, 4), workers=1)
+    archive = ZipFile(zip_path)
+    sheets = read_workbook(archive.read('experiment.xlsx'))
+    links = [links for name, _, links in sheets if name == 'result_t'][0]
+    assert sorted(links.values()) == [f'result_imgs/ID{i}_image_0.jpg' for i in range(1, 4)]
+    for path in links.values():
+        image = Image.open(io.BytesIO(archive.read(path)))
+        assert (image.format, image.size) == ('JPEG', (4, 2))
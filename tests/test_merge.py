@@ -0,0 +1,160 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import shutil
+import sqlite3
+
+from pyerm.database.dbbase import Database
+from pyerm.database.experiment import Experiment
+from pyerm.database.merge import merge_database, merge_databases
+
+def fill(db_path, seed, runs=6, methods=('method',)):
+    with Experiment(db_path) as exp:
+        exp.task_init('t')
+        for i in range(runs):
+            # settings shared by the databases and settings of their own
+            exp.data_init('data', {'size': i % 2})
+            exp.method_init(methods[i % len(methods)], {'lr': float(seed + i % 3), 'layers': None if i % 2 else i})
+            exp.experiment_start(description=f'{seed}-{i}')
+            for step in range(3):
+                exp.detail_update({'loss': seed + i + step / 10})
+            exp.experiment_over({'acc': seed + i / 10})
+
+def row_by_row_merge(dest_path, source_path):
+    # the copy of every row of the former db_merge, with the settings looked up by their parameters and the experiment IDs remapped
+    dest = sqlite3.connect(dest_path)
+    source = sqlite3.connect(source_path)
+    dest_tables = [row[0] for row in dest.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    source_tables = dict(source.execute("SELECT name, sql FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence'").fetchall())
+    for name, sql in source_tables.items():
+        if name not in dest_tables:
+            dest.execute(sql)
+    columns = {name: [row[1] for row in source.execute(f"PRAGMA table_info({name})")] for name in source_tables}
+    setting_ids = {}
+    for name in source_tables:
+        kind = name.split('_')[0]
+        if kind not in ('method', 'data'):
+            continue
+        params = [column for column in columns[name] if column not in (f'{kind}_id', 'remark', 'param_hash')]
+        for row in source.execute(f"SELECT {kind}_id, {', '.join(params)} FROM {name} ORDER BY {kind}_id"):
+            found = dest.execute(f"SELECT {kind}_id FROM {name} WHERE {' AND '.join([f'{column} IS ?' for column in params])}", row[1:]).fetchone()
+            if found is None:
+                found = (dest.execute(f"INSERT INTO {name} ({', '.join(params)}) VALUES ({', '.join(['?'] * len(params))})", row[1:]).lastrowid,)
+            setting_ids[(kind, name[len(kind) + 1:], row[0])] = found[0]
+    experiment_ids = {}
+    experiment_columns = [column for column in columns['experiment_list'] if column != 'id']
+    for row in source.execute(f"SELECT id, {', '.join(experiment_columns)} FROM experiment_list ORDER BY id"):
+        values = dict(zip(experiment_columns, row[1:]))
+        values['method_id'] = setting_ids.get(('method', values['method'], values['method_id']), values['method_id'])
+        values['data_id'] = setting_ids.get(('data', values['data'], values['data_id']), values['data_id'])
+        experiment_ids[row[0]] = dest.execute(f"INSERT INTO experiment_list ({', '.join(values)}) VALUES ({', '.join(['?'] * len(values))})", list(values.values())).lastrowid
+    result_columns = [column for column in columns['result_t'] if column != 'experiment_id']
+    for row in source.execute(f"SELECT experiment_id, {', '.join(result_columns)} FROM result_t ORDER BY experiment_id"):
+        dest.execute(f"INSERT INTO result_t (experiment_id, {', '.join(result_columns)}) VALUES ({', '.join(['?'] * len(row))})", (experiment_ids[row[0]], *row[1:]))
+    for row in source.execute("SELECT experiment_id, step, key, value, record_time FROM detail_records ORDER BY record_id"):
+        dest.execute("INSERT INTO detail_records (experiment_id, step, key, value, record_time) VALUES (?, ?, ?, ?, ?)", (experiment_ids[row[0]], *row[1:]))
+    dest.commit()
+    dest.close()
+    source.close()
+
+def dump(db_path):
+    # every row of the experiment tables, without the hashes and the bookkeeping of the merges
+    conn = sqlite3.connect(db_path)
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence' AND name NOT LIKE 'merge_%' ORDER BY name")]
+    rows = {}
+    for name in tables:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({name})") if row[1] != 'param_hash']
+        rows[name] = conn.execute(f"SELECT {', '.join(columns)} FROM {name} ORDER BY rowid").fetchall()
+    conn.close()
+    return rows
+
+def test_merge_matches_row_by_row(tmp_path):
+    dest_path, source_path = str(tmp_path / 'dest.db'), str(tmp_path / 'source.db')
+    fill(dest_path, 0)
+    fill(source_path, 1, runs=9, methods=('method', 'other'))
+    expected_path = str(tmp_path / 'expected.db')
+    shutil.copy(dest_path, expected_path)
+    row_by_row_merge(expected_path, source_path)
+
+    db = Database(dest_path)
+    counts = merge_database(db, source_path)
+    db.close()
+    assert counts['experiment_list'] == 9
+    assert counts['detail_records'] == 27
+    assert dump(dest_path) == dump(expected_path)
+
+def test_parallel_merge_matches_merges_one_by_one(tmp_path):
+    sources = [str(tmp_path / f'source_{k}.db') for k in range(4)]
+    for k, source_path in enumerate(sources):
+        fill(source_path, k + 1, runs=3 + k, methods=('method', f'method_{k % 2}'))
+    dest_path, expected_path = str(tmp_path / 'dest.db'), str(tmp_path / 'expected.db')
+    fill(dest_path, 0)
+    shutil.copy(dest_path, expected_path)
+    db = Database(expected_path)
+    for source_path in sources:
+        merge_database(db, source_path)
+    db.close()
+
+    db = Database(dest_path)
+    # two processes, one source per batch
+    results = merge_databases(db, sources, workers=2, batch_size=1)
+    assert [results[source_path]['experiment_list'] for source_path in sources] == [3, 4, 5, 6]
+    # merged before and unchanged, skipped
+    assert merge_databases(db, sources, workers=1) == {}
+    db.close()
+    assert dump(dest_path) == dump(expected_path)
+
+def test_incremental_merge(tmp_path):
+    dest_path, source_path = str(tmp_path / 'dest.db'), str(tmp_path / 'source.db')
+    fill(dest_path, 0)
+    fill(source_path, 1)
+    expected_path = str(tmp_path / 'expected.db')
+    shutil.copy(dest_path, expected_path)
+    db = Database(dest_path)
+    merge_database(db, source_path)
+    assert sum(merge_database(db, source_path).values()) == 0
+
+    # a run still going at the next merge, and finished after it
+    exp = Experiment(source_path)
+    exp.task_init('t')
+    exp.data_init('data', {'size': 0})
+    exp.method_init('method', {'lr': 5.0})
+    exp.detail_init(flush_rows=1)
+    exp.experiment_start(description='late')
+    exp.detail_update({'loss': 1.0})
+    counts = merge_database(db, source_path)
+    assert (counts['experiment_list'], counts['detail_records'], counts['method_method']) == (1, 1, 1)
+    exp.detail_update({'loss': 0.5})
+    exp.experiment_over({'acc': 0.5})
+    exp.close()
+    fill(source_path, 2, runs=2)
+    counts = merge_database(db, source_path)
+    assert (counts['experiment_list'], counts['detail_records'], counts['result_t']) == (2, 7, 3)
+    assert sum(merge_database(db, source_path).values()) == 0
+    db.close()
+
+    # the same as merging the whole source once
+    db = Database(expected_path)
+    merge_database(db, source_path)
+    db.close()
+    assert dump(dest_path) == dump(expected_path)
@@ -0,0 +1,66 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import MethodTable, param_hash
+
+def test_param_hash_canonical():
+    assert param_hash({'lr': 0.1, 'layers': 2}) == param_hash({'layers': 2, 'lr': 0.1})
+    # a None parameter is a missing one, e.g. a column added after the setting
+    assert param_hash({'lr': 0.1, 'momentum': None}) == param_hash({'lr': 0.1})
+    # equal numbers for SQLite
+    assert param_hash({'lr': 1.0, 'shuffle': True}) == param_hash({'lr': 1, 'shuffle': 1})
+    assert param_hash({'lr': 0.1}) != param_hash({'lr': 0.2})
+    # as the columns store the values
+    assert param_hash({'lr': '0.5'}, {'lr': 'REAL'}) == param_hash({'lr': 0.5}, {'lr': 'REAL'})
+    assert param_hash({'name': 1}, {'name': 'TEXT'}) == param_hash({'name': '1'}, {'name': 'TEXT'})
+
+def test_insert_finds_the_same_setting(tmp_path):
+    db = Database(str(tmp_path / 'settings.db'))
+    table = MethodTable(db, 'method', {'lr': 'REAL', 'layers': 'INTEGER'})
+    first = table.insert(lr=1.0, layers=2)
+    assert table.insert(layers=2, lr=1) == first
+    assert table.insert(lr=1.0, layers=2.0) == first
+    second = table.insert(lr=1.0, layers=None)
+    assert second != first
+    # a new parameter column, the former settings read NULL for it
+    third = table.insert(lr=1.0, layers=2, momentum=0.9)
+    assert third not in (first, second)
+    assert table.insert(lr=1.0, layers=2, momentum=None) == first
+    assert table.insert(lr=1.0) == second
+    assert db.cursor.execute("SELECT COUNT(*) FROM method_method").fetchone() == (3,)
+    db.close()
+
+def test_former_table_hashed_on_first_insert(tmp_path):
+    db = Database(str(tmp_path / 'settings.db'))
+    # a table of a former version, without param_hash, with a duplicate setting
+    db.cursor.execute("CREATE TABLE method_method (method_id INTEGER PRIMARY KEY AUTOINCREMENT, remark TEXT DEFAULT NULL UNIQUE, lr REAL, layers INTEGER)")
+    db.cursor.executemany("INSERT INTO method_method (lr, layers) VALUES (?, ?)", [(0.1, 2), (0.2, None), (0.1, 2)])
+    db.commit()
+    table = MethodTable(db, 'method')
+    assert table.insert(lr=0.1, layers=2) == 1
+    assert table.insert(lr=0.2) == 2
+    assert table.insert(lr=0.3, layers=2) == 4
+    # the duplicate keeps a NULL hash
+    assert db.cursor.execute("SELECT method_id FROM method_method WHERE param_hash IS NULL").fetchall() == [(3,)]
+    db.close()
@@ -0,0 +1,50 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+from pyerm.database.dbbase import Database, PROFILES
+
+def busy_timeout(db):
+    return db.conn.execute("PRAGMA busy_timeout").fetchone()[0]
+
+def test_released_connection_has_profile_busy_timeout(tmp_path):
+    db_path = str(tmp_path / 'pool.db')
+    db = Database(db_path, profile='writer-heavy', pooled=True, busy_timeout=50)
+    assert busy_timeout(db) == 50
+    conn = db.conn
+    db.close()
+    db = Database(db_path, profile='writer-heavy', pooled=True)
+    assert db.conn is conn
+    assert busy_timeout(db) == PROFILES['writer-heavy']['busy_timeout']
+    db.close()
+    db = Database(db_path, pooled=True, busy_timeout=50)
+    db.conn
+    db.close()
+    db = Database(db_path, pooled=True)
+    assert busy_timeout(db) == 5000
+    db.close()
+
+def test_resolved_profile_is_a_copy(tmp_path):
+    db = Database(str(tmp_path / 'pool.db'), profile='read-mostly')
+    db.profile['busy_timeout'] = 1
+    assert PROFILES['read-mostly']['busy_timeout'] == 5000
+    assert Database(str(tmp_path / 'pool.db')).profile is not PROFILES['default']
@@ -0,0 +1,99 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import numpy as np
+import pytest
+
+from pyerm.database.experiment import Experiment
+from pyerm.database.dbbase import Database
+from pyerm.database.tables import delete_experiments
+from pyerm.database.utils import group_statistics
+
+def run(db_path, score, **kwargs):
+    with Experiment(db_path, **kwargs) as exp:
+        exp.data_init('data', {'size': 10})
+        exp.method_init('method', {'lr': 0.1})
+        exp.task_init('t')
+        exp.experiment_start()
+        exp.experiment_over({'acc': score})
+
+def test_existing_stats_updated_without_flag(tmp_path):
+    db_path = str(tmp_path / 'stats.db')
+    run(db_path, 1.0, setting_stats=True)
+    run(db_path, 3.0)
+    db = Database(db_path)
+    assert db.cursor.execute("SELECT count, mean, min, max FROM setting_stats_t WHERE metric='acc'").fetchall() == [(2, 2.0, 1.0, 3.0)]
+    db.close()
+
+def test_no_stats_table_without_flag(tmp_path):
+    db_path = str(tmp_path / 'stats.db')
+    run(db_path, 1.0)
+    db = Database(db_path)
+    assert 'setting_stats_t' not in db.table_names
+    db.close()
+
+def stats_rows(db):
+    rows = db.cursor.execute("SELECT method, method_id, data, data_id, metric, count, mean, m2, min, max FROM setting_stats_t").fetchall()
+    return {row[:5]: row[5:] for row in rows}
+
+def assert_matches_results(db):
+    statistics = group_statistics(db, 't')
+    expected = {}
+    for setting, stats in statistics.iterrows():
+        for metric in statistics['Count'].columns:
+            count = int(stats[('Count', metric)])
+            if count > 0:
+                expected[(*setting, metric)] = (count, stats[('Avg', metric)], stats[('Std', metric)] ** 2 * count, stats[('Min', metric)], stats[('Max', metric)])
+    actual = stats_rows(db)
+    assert actual.keys() == expected.keys()
+    for key, (count, mean, m2, min_value, max_value) in expected.items():
+        assert actual[key][0] == count
+        assert actual[key][1:] == pytest.approx((mean, m2, min_value, max_value), abs=1e-9)
+
+def test_welford_add_and_remove_match_group_statistics(tmp_path):
+    db_path = str(tmp_path / 'stats.db')
+    random = np.random.default_rng(0)
+    with Experiment(db_path, setting_stats=True) as exp:
+        exp.task_init('t')
+        for i in range(60):
+            exp.data_init('data', {'size': int(i % 2)})
+            if i % 3 == 0:
+                # a quote in the name of a method without parameters (no table) must not break the statements
+                exp.method_init("o'method")
+            else:
+                exp.method_init('method', {'lr': float(i % 3)})
+            exp.experiment_start()
+            rst = {'acc': float(random.normal()), 'loss': float(random.uniform())}
+            if i % 5 == 1:
+                # a missing score, after the first result so the column is REAL
+                rst['loss'] = None
+            exp.experiment_over(rst)
+    db = Database(db_path)
+    assert_matches_results(db)
+    # several scores of a setting at once, its extremes among them, and whole settings
+    deleted = [int(i) for i in random.choice(np.arange(1, 61), 25, replace=False)] + [2, 8, 14, 20, 26, 32, 38, 44, 50, 56]
+    delete_experiments(db, deleted)
+    assert_matches_results(db)
+    delete_experiments(db, range(1, 61))
+    assert stats_rows(db) == {}
+    db.close()
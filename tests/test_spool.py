@@ -0,0 +1,110 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import os
+
+from pyerm.database import spool
+from pyerm.database.dbbase import Database
+from pyerm.database.experiment import Experiment
+from pyerm.database.spool import ingest_spools
+
+def spool_experiment(spool_dir, lr):
+    exp = Experiment(spool_dir=str(spool_dir))
+    exp.task_init('t')
+    exp.data_init('data', {'size': 1})
+    exp.method_init('method', {'lr': lr})
+    return exp
+
+def test_incremental_ingest_reads_only_new_bytes(tmp_path, monkeypatch):
+    offsets = []
+    read_segment = spool.read_segment
+    def recording_read_segment(path, offset=0):
+        offsets.append(offset)
+        return read_segment(path, offset)
+    monkeypatch.setattr(spool, 'read_segment', recording_read_segment)
+    db = Database(str(tmp_path / 'spool.db'))
+    exp = spool_experiment(tmp_path / 'spool', 0.1)
+    exp.experiment_start()
+    exp.experiment_over({'acc': 0.5})
+    ingest_spools(db, [str(tmp_path / 'spool')])
+    # the setting events are before the offset, the next experiment still gets the setting
+    size = os.path.getsize(exp._spool.path)
+    exp.experiment_start()
+    exp.experiment_over({'acc': 0.7})
+    exp.close()
+    assert list(ingest_spools(db, [str(tmp_path / 'spool')]).values()) == [3]
+    assert offsets == [0, size]
+    assert db['experiment_list'].select('method', 'method_id', 'data', 'data_id', 'task', 'status', other='ORDER BY id') == [('method', 1, 'data', 1, 't', 'finished')] * 2
+    assert db['result_t'].select('experiment_id', 'acc', other='ORDER BY experiment_id') == [(1, 0.5), (2, 0.7)]
+    db.close()
+
+def test_ingest_progress_without_setting(tmp_path):
+    # a progress saved by a former version, without the setting, replays the segment from the beginning once
+    db = Database(str(tmp_path / 'spool.db'))
+    exp = spool_experiment(tmp_path / 'spool', 0.1)
+    exp.experiment_start()
+    exp.experiment_over({'acc': 0.5})
+    ingest_spools(db, [exp._spool.path])
+    db.cursor.execute("UPDATE spool_segments SET setting = NULL")
+    db.commit()
+    exp.experiment_start()
+    exp.experiment_over({'acc': 0.7})
+    exp.close()
+    assert list(ingest_spools(db, [exp._spool.path]).values()) == [3]
+    assert db['result_t'].select('experiment_id', 'acc', other='ORDER BY experiment_id') == [(1, 0.5), (2, 0.7)]
+    assert db.cursor.execute("SELECT setting IS NOT NULL FROM spool_segments").fetchone() == (1,)
+    db.close()
+
+def test_ingest_remaps_ids_and_is_idempotent(tmp_path):
+    db_path = str(tmp_path / 'spool.db')
+    with Experiment(db_path) as exp:
+        exp.task_init('t')
+        exp.data_init('data', {'size': 1})
+        exp.method_init('method', {'lr': 0.1})
+        exp.experiment_start()
+        exp.experiment_over({'acc': 0.1})
+    # two nodes, the local IDs of both segments start at 1
+    nodes = []
+    for lr in (0.1, 0.2):
+        exp = spool_experiment(tmp_path / 'spool', lr)
+        exp.detail_init(flush_rows=1)
+        exp.experiment_start()
+        exp.detail_update({'loss': lr})
+        nodes.append(exp)
+    db = Database(db_path)
+    assert sum(ingest_spools(db, [str(tmp_path / 'spool')]).values()) == 10
+    for exp, acc in zip(nodes, (0.5, 0.6)):
+        exp.experiment_over({'acc': acc})
+        exp.close()
+    assert sum(ingest_spools(db, [str(tmp_path / 'spool')]).values()) == 4
+    rows = db.cursor.execute("SELECT COUNT(*) FROM experiment_list").fetchone(), db.cursor.execute("SELECT COUNT(*) FROM detail_records").fetchone()
+    # nothing new, nothing loaded again
+    assert sum(ingest_spools(db, [str(tmp_path / 'spool')]).values()) == 0
+    assert (db.cursor.execute("SELECT COUNT(*) FROM experiment_list").fetchone(), db.cursor.execute("SELECT COUNT(*) FROM detail_records").fetchone()) == rows
+    experiments = db.cursor.execute("""SELECT e.id, e.method_id, e.status, r.acc, d.value FROM experiment_list AS e 
+        INNER JOIN result_t AS r ON r.experiment_id = e.id LEFT JOIN detail_records AS d ON d.experiment_id = e.id ORDER BY r.acc""").fetchall()
+    assert experiments[0] == (1, 1, 'finished', 0.1, None)
+    # new IDs after the ones of the database, the setting of the first node is the one already there
+    assert sorted(row[0] for row in experiments[1:]) == [2, 3]
+    assert [row[1:] for row in experiments[1:]] == [(1, 'finished', 0.5, 0.1), (2, 'finished', 0.6, 0.2)]
+    db.close()
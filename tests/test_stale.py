@@ -0,0 +1,80 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import time
+
+from pyerm.database.dbbase import Database
+from pyerm.database.experiment import Experiment
+from pyerm.database.tables import ExperimentTable
+from pyerm.database.utils import delete_failed_experiments
+
+def start(table, start_time, heartbeat=None):
+    return table.experiment_start(None, 'method', -1, 'data', -1, 't', start_time=start_time, heartbeat=heartbeat)
+
+def test_stale_experiments(tmp_path):
+    db = Database(str(tmp_path / 'stale.db'))
+    table = ExperimentTable(db)
+    now = time.time()
+    lost = start(table, now - 1000, heartbeat=now - 1000)
+    alive = start(table, now - 1000, heartbeat=now - 10)
+    # without heartbeats, e.g. recorded by a former version
+    old = start(table, now - 2 * 86400)
+    recent = start(table, now - 1000)
+    finished = start(table, now - 1000, heartbeat=now - 1000)
+    table.experiment_over(finished)
+    table.heartbeat([alive, finished], now)
+    assert table.select('last_heartbeat', where=f'id={finished}')[0][0] == now - 1000
+
+    assert table.stale_experiments(timeout=300) == [lost, old]
+    assert table.stale_experiments(timeout=300, max_age=None) == [lost]
+    assert table.stale_experiments(timeout=2000) == [old]
+    assert table.mark_stale_experiments(timeout=300) == [lost, old]
+    rows = table.select('id', 'status', 'end_time', 'failed_reason', where="status='failed'", other='ORDER BY id')
+    assert [row[:2] for row in rows] == [(lost, 'failed'), (old, 'failed')]
+    # the end time of a lost run is its last heartbeat
+    assert rows[0][2] == time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now - 1000))
+    assert rows[1][2] is None
+    assert rows[0][3].startswith('Stale: no heartbeat') and rows[1][3].startswith('Stale: still running')
+    assert table.stale_experiments(timeout=300) == []
+    assert [row[0] for row in table.select('id', where="status='running'", other='ORDER BY id')] == [alive, recent]
+    db.close()
+
+def test_heartbeat_keeps_a_run_alive(tmp_path):
+    db_path = str(tmp_path / 'stale.db')
+    exp = Experiment(db_path, heartbeat_interval=0.05)
+    exp.task_init('t')
+    exp.data_init('data')
+    exp.method_init('method')
+    experiment_id = exp.experiment_start()
+    time.sleep(0.3)
+    db = Database(db_path)
+    heartbeat = db.cursor.execute("SELECT last_heartbeat FROM experiment_list WHERE id=?", (experiment_id,)).fetchone()[0]
+    assert heartbeat is not None and time.time() - heartbeat < 1
+    assert delete_failed_experiments(db, timeout=5) == 0
+    exp.experiment_over({'acc': 1.0})
+    exp.close()
+    # a run whose process is gone
+    start(ExperimentTable(db), time.time() - 10, heartbeat=time.time() - 10)
+    assert delete_failed_experiments(db, timeout=5) == 1
+    assert db.cursor.execute("SELECT id, status FROM experiment_list").fetchall() == [(experiment_id, 'finished')]
+    db.close()
@@ -0,0 +1,65 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import numpy as np
+import pytest
+
+from pyerm.database.dbbase import Database
+from pyerm.database.experiment import Experiment
+from pyerm.database.utils import get_result_statistics
+
+def test_result_statistics_match_numpy(tmp_path):
+    db_path = str(tmp_path / 'statistics.db')
+    random = np.random.default_rng(0)
+    acc = random.normal(size=11)
+    loss = random.uniform(size=11)
+    with Experiment(db_path) as exp:
+        exp.task_init('t')
+        exp.data_init('data', {'size': 10})
+        exp.method_init('method', {'lr': 0.1})
+        for i in range(11):
+            exp.experiment_start()
+            # a missing score, after the first result so the column is REAL
+            exp.experiment_over({'acc': float(acc[i]), 'loss': None if i == 3 else float(loss[i])})
+        # another setting is not counted
+        exp.method_init('method', {'lr': 0.2})
+        exp.experiment_start()
+        exp.experiment_over({'acc': 100.0, 'loss': 100.0})
+    db = Database(db_path)
+    statistics, ids = get_result_statistics(db, 't', 'method', 1, 'data', 1, quantiles=[0.25, 0.9])
+    db.close()
+
+    assert sorted(int(i) for i in ids) == list(range(1, 12))
+    assert list(statistics.index) == ['Max', 'Min', 'Avg', 'Std', 'Median', 'Q0.25', 'Q0.9']
+    for col, scores in [('acc', acc), ('loss', np.delete(loss, 3))]:
+        # the population standard deviation, NULLs ignored
+        expected = [scores.max(), scores.min(), scores.mean(), scores.std(), np.median(scores), *np.quantile(scores, [0.25, 0.9])]
+        assert list(statistics[col]) == pytest.approx(expected)
+
+def test_result_statistics_without_runs(tmp_path):
+    db_path = str(tmp_path / 'statistics.db')
+    with Experiment(db_path) as exp:
+        exp.task_init('t')
+    db = Database(db_path)
+    assert get_result_statistics(db, 't', 'method', 1, 'data', 1) == (None, [])
+    db.close()
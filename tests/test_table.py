@@ -0,0 +1,73 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import pytest
+
+from pyerm.database.dbbase import Database, Table, View
+from pyerm.database.tables import ExperimentTable
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / 'table.db'))
+    table = Table(db, 't', {'id': 'INTEGER PRIMARY KEY', 'name': 'TEXT', 'score': 'REAL'})
+    table.insert_many(['name', 'score'], [(f'n{i % 4}', float((i * 7) % 10)) for i in range(10)])
+    # an index the plan of the view may scan, in another order than the rows
+    db.write("CREATE INDEX index_t_score ON t (score, name)")
+    yield db
+    db.close()
+
+@pytest.mark.parametrize('index', [slice(None), slice(2, 5), slice(-3, None), slice(None, None, 3), slice(8, 1, -2), slice(5, 5)])
+def test_slices_match_iteration(db, index):
+    table = db['t']
+    view = View(db, 'v', 'SELECT name, score FROM t WHERE score > 1')
+    assert table[index] == list(table)[index]
+    assert view[index] == list(view)[index]
+
+def test_index_matches_iteration(db):
+    view = View(db, 'v', 'SELECT score, name FROM t')
+    rows = list(view)
+    assert rows == sorted(rows)
+    assert [view[i] for i in range(len(view))] == rows
+    assert view[-1] == rows[-1]
+    with pytest.raises(IndexError):
+        view[len(rows)]
+
+def test_experiment_indexes_checked_once_per_schema_version(tmp_path, monkeypatch):
+    db = Database(str(tmp_path / 'experiments.db'))
+    ExperimentTable(db)
+    assert set(ExperimentTable.INDEXES) <= set(db.index_names)
+    checks = []
+    create_indexes = ExperimentTable.create_indexes
+    def counting_create_indexes(self):
+        checks.append(1)
+        return create_indexes(self)
+    monkeypatch.setattr(ExperimentTable, 'create_indexes', counting_create_indexes)
+    for _ in range(3):
+        ExperimentTable(Database(str(tmp_path / 'experiments.db')))
+    assert checks == []
+    db.write("DROP INDEX index_experiment_list_start_time")
+    ExperimentTable(db)
+    ExperimentTable(db)
+    assert checks == [1]
+    assert 'index_experiment_list_start_time' in db.index_names
+    db.close()
@@ -0,0 +1,55 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import sqlite3
+import threading
+import time
+
+from pyerm.database.dbbase import Database, Table
+
+def test_commit_locked_by_reader_is_rolled_back(tmp_path):
+    # in rollback journal mode a reader holding its read transaction makes the COMMIT fail with "database is locked",
+    # the retried transaction must start again from BEGIN IMMEDIATE and not run on top of the writes never committed
+    db_path = str(tmp_path / 'locked.db')
+    db = Database(db_path, busy_timeout=50)
+    table = Table(db, 't', {'id': 'INTEGER PRIMARY KEY AUTOINCREMENT', 'v': 'INTEGER'})
+    assert db.conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    reading = threading.Event()
+
+    def reader():
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.execute('BEGIN')
+        conn.execute('SELECT COUNT(*) FROM t').fetchone()
+        reading.set()
+        time.sleep(0.3)
+        conn.execute('COMMIT')
+        conn.close()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    reading.wait()
+    db.run_transaction(table.insert, v=1)
+    thread.join()
+    assert db.cursor.execute('SELECT v FROM t').fetchall() == [(1,)]
+    assert not db.conn.in_transaction
+    db.close()
@@ -0,0 +1,101 @@
+# MIT License
+
+# Copyright (c) 2024 Yuxuan Shao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Version: 0.3.9
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from pyerm.database.dbbase import Database, Table
+from pyerm.database.writer import AsyncWriter
+
+def setup(db_path, **kwargs):
+    db = Database(db_path, **kwargs)
+    table = Table(db, 't', {'id': 'INTEGER PRIMARY KEY AUTOINCREMENT', 'v': 'INTEGER UNIQUE'})
+    return db, table, AsyncWriter(db, max_queue=8, max_batch=4)
+
+def insert(table, v):
+    return table.insert(v=v)
+
+def values(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = [row[0] for row in conn.execute('SELECT v FROM t ORDER BY id')]
+    conn.close()
+    return rows
+
+def test_flush_commits_queued_writes_in_order(tmp_path):
+    db_path = str(tmp_path / 'writer.db')
+    db, table, writer = setup(db_path)
+    # more writes than the queue holds, the caller waits for room
+    futures = [writer.submit(insert, table, None, prepare=lambda table, _, i=i: (table, i)) for i in range(50)]
+    writer.flush()
+    assert values(db_path) == list(range(50))
+    assert [future.result() for future in futures] == list(range(1, 51))
+    assert writer.call(insert, table, 50) == 51
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.submit(insert, table, 50)
+    db.close()
+
+def test_failed_write_is_raised_once(tmp_path, capsys):
+    db_path = str(tmp_path / 'writer.db')
+    db, table, writer = setup(db_path)
+    # the duplicate fails in the batch, the others are committed one by one
+    for v in [1, 2, 1, 3]:
+        writer.submit(insert, table, v)
+    with pytest.raises(sqlite3.IntegrityError):
+        writer.flush()
+    assert values(db_path) == [1, 2, 3]
+    assert 'a queued write failed' in capsys.readouterr().err
+    writer.flush()
+    # the error of a call is raised to its caller only
+    with pytest.raises(sqlite3.IntegrityError):
+        writer.call(insert, table, 2)
+    writer.close()
+    db.close()
+
+def test_locked_batch_is_retried(tmp_path):
+    db_path = str(tmp_path / 'writer.db')
+    db, table, writer = setup(db_path, busy_timeout=20)
+    locked = threading.Event()
+
+    def other_process():
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.execute('BEGIN IMMEDIATE')
+        locked.set()
+        time.sleep(0.2)
+        conn.execute('COMMIT')
+        conn.close()
+
+    thread = threading.Thread(target=other_process)
+    thread.start()
+    locked.wait()
+    for v in range(3):
+        writer.submit(insert, table, v)
+    writer.flush()
+    thread.join()
+    assert values(db_path) == [0, 1, 2]
+    assert db.lock_stats.as_dict()['retries'] > 0
+    writer.close()
+    db.close()